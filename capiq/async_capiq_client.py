@@ -0,0 +1,162 @@
+import asyncio
+import json
+
+from capiq.capiq_client import CapIQClient
+from capiq.deadlines import get_request_deadline
+from capiq.scheduler import NORMAL_PRIORITY, get_request_priority
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+# asyncio version of CapIQClient. The gds* methods are inherited from CapIQClient and return the coroutine of
+# make_request, so they are awaited exactly like the sync methods are called:
+#
+#   async with AsyncCapIQClient("username", "password") as ciq_client:
+#       return_value = await ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+#
+# Request building, response parsing, caching and the return key mapping are shared with CapIQClient, only the
+# transport differs. At most max_workers batches are in flight at once across all calls on a client.
+#
+# Coalescing (coalesce_window), stream_request and BatchingQueue rely on threads blocking on a fetch and are
+# not supported, concurrent calls on one event loop are already batched by asyncio.gather.
+class AsyncCapIQClient(CapIQClient):
+    _session_settings = None
+    _semaphore = None
+
+    def build_coalescer(self, coalesce_window):
+        raise TypeError("AsyncCapIQClient does not support coalesce_window")
+
+    def build_session(self, pool_connections, pool_maxsize, keep_alive, max_retries):
+        # aiohttp sessions have to be created on the event loop that uses them, see get_session
+        self._session_settings = {"pool_maxsize": pool_maxsize, "keep_alive": keep_alive}
+        return None
+
+    def get_session(self):
+        if aiohttp is None:
+            raise ImportError("AsyncCapIQClient requires aiohttp, install it with pip install aiohttp")
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self._session_settings["pool_maxsize"],
+                                             force_close=not self._session_settings["keep_alive"],
+                                             ssl=None if self._verify else False)
+            self._session = aiohttp.ClientSession(connector=connector, headers=self._headers,
+                                                  auth=aiohttp.BasicAuth(self._username, self._password))
+        return self._session
+
+    def __enter__(self):
+        raise TypeError("Use 'async with' with AsyncCapIQClient")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self.cache_request_count()
+
+    async def make_request(self, identifiers, mnemonics, return_keys, properties, api_function_identifier,
+                           multiple_results_expected, columnar=False, as_frame=False, compact=False):
+        if self._identifier_index is not None:
+            await self.resolve_identifiers(identifiers)
+        request = self.prepare_request(identifiers, mnemonics, return_keys, properties, api_function_identifier,
+                                       multiple_results_expected, columnar, as_frame, compact)
+        return self.complete_request(request, await self.send_batches(request.batches, request.priority,
+                                                                      request.deadline))
+
+    def stream_request(self, identifiers, mnemonics, return_keys, properties, api_function_identifier,
+                       multiple_results_expected, columnar=False):
+        raise TypeError("AsyncCapIQClient does not support stream_request, use CapIQClient")
+
+    async def fetch_input_requests(self, input_requests, api_function_identifier, priority=NORMAL_PRIORITY,
+                                   deadline=None):
+        response_entries, misses, cache_keys = self.get_cached_entries(input_requests)
+        if misses:
+            fetched = await self.send_input_requests([input_requests[i] for i in misses], priority, deadline)
+            self.add_fetched_entries(response_entries, misses, cache_keys, fetched, api_function_identifier)
+        return response_entries
+
+    async def send_input_requests(self, input_requests, priority=NORMAL_PRIORITY, deadline=None):
+        responses = await self.send_batches(self.chunk_input_requests(input_requests), priority, deadline)
+        return [ret for response_entries in responses for ret in response_entries]
+
+    async def resolve_identifiers(self, identifiers):
+        input_requests = self.prepare_resolution(identifiers)
+        if input_requests:
+            self.complete_resolution(input_requests, await self.fetch_input_requests(
+                input_requests, "GDSP", get_request_priority(), get_request_deadline()))
+
+    async def send_batches(self, batches, priority=NORMAL_PRIORITY, deadline=None):
+        return await asyncio.gather(*[self.send_batch(batch, priority, deadline) for batch in batches])
+
+    async def send_batch(self, req_array, priority=NORMAL_PRIORITY, deadline=None):
+        if self._retry_policy is None:
+            return await self.post_batch(req_array, priority, deadline)
+        response_entries = None
+        retry_indices = list(range(len(req_array)))
+        attempt = 0
+        while True:
+            try:
+                entries = await self.post_batch([req_array[i] for i in retry_indices], priority, deadline)
+            except Exception as e:
+                backoff = self.get_retry_backoff(attempt, deadline)
+                if backoff is None or not self._retry_policy.is_retryable_exception(e):
+                    return self.end_retries(response_entries, retry_indices, e)
+            else:
+                response_entries, retry_indices = self.merge_retried_entries(response_entries, retry_indices, entries)
+                backoff = self.get_retry_backoff(attempt, deadline) if retry_indices else None
+                if backoff is None:
+                    return response_entries
+            if self._metrics is not None:
+                self._metrics.increment("retries")
+            await asyncio.sleep(backoff)
+            attempt += 1
+
+    async def post_batch(self, req_array, priority=NORMAL_PRIORITY, deadline=None):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_workers)
+        async with self._semaphore:
+            if deadline is not None:
+                deadline.check()
+            if self._scheduler is not None:
+                # the scheduler blocks while a batch waits for admission, so wait on a thread
+                await asyncio.to_thread(self.acquire_quota, req_array, priority, deadline)
+            try:
+                self.before_post()
+                response_json = await self.post({"inputRequests": req_array}, self.get_client_timeout(deadline))
+            except Exception as e:
+                self.release_quota(req_array)
+                self.after_post(e)
+                self.check_deadline(e, deadline)
+                raise
+            self.after_post()
+        return self.handle_response(req_array, response_json)
+
+    # Converts the requests style timeout to an aiohttp one, with the whole POST bound by the deadline
+    def get_client_timeout(self, deadline):
+        timeout = self.get_timeout(deadline)
+        if timeout is None:
+            return None
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        return aiohttp.ClientTimeout(total=None if deadline is None else deadline.remaining(), connect=connect,
+                                     sock_read=read)
+
+    async def post(self, req, timeout=None):
+        kwargs = {} if timeout is None else {"timeout": timeout}
+        with self.time_phase("serialize"):
+            data = json.dumps(req)
+        with self.time_phase("network"):
+            async with self.get_session().post(self._endpoint, data=data, **kwargs) as response:
+                if response.status >= 500:
+                    response.raise_for_status()
+                body = await response.read()
+        with self.time_phase("decode"):
+            response_json = json.loads(body)
+        if self._metrics is not None:
+            self.observe_batch(len(req["inputRequests"]), len(data), body)
+        return response_json
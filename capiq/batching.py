@@ -0,0 +1,115 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from capiq.async_capiq_client import AsyncCapIQClient
+from capiq.capiq_client import CapIQClient
+from capiq.exceptions import CiqServiceException
+from capiq.scheduler import get_request_priority
+
+
+# Collects single identifier/mnemonic lookups from many callers and sends them to GDS together.
+#
+# submit returns a Future of the value, the same value a gds* call would return for it. A background thread
+# flushes the queue once max_batch_size lookups are waiting or the oldest lookup has waited max_latency
+# seconds. Lookups are matched to the response entries by position, so every future gets the value of its
+# own identifier even when Cap IQ echoes it back differently. Lookups with an ErrMsg fail with a
+# CiqServiceException.
+#
+#   with BatchingQueue(ciq_client) as queue:
+#       future = queue.submit("TRIP", "IQ_CLOSEPRICE")
+#       close_price = future.result()
+class BatchingQueue:
+    def __init__(self, client, max_batch_size=None, max_latency=0.01):
+        assert max_batch_size is None or max_batch_size > 0
+        assert max_latency >= 0
+        if isinstance(client, AsyncCapIQClient):
+            raise TypeError("BatchingQueue needs a CapIQClient, AsyncCapIQClient calls are batched by asyncio.gather")
+        self._client = client
+        self._max_batch_size = max_batch_size or client._max_batch_size
+        self._max_latency = max_latency
+        self._condition = threading.Condition()
+        self._pending = []  # (input request, multiple results expected, priority, future, deadline)
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=client._max_workers)
+        self._thread = threading.Thread(target=self.run, name="capiq-batching-queue", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, identifier, mnemonic, properties=None, api_function_identifier="GDSP",
+               multiple_results_expected=False):
+        input_request = CapIQClient.build_input_requests([identifier], [mnemonic], [properties or {}],
+                                                         api_function_identifier)[0]
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("BatchingQueue has been closed")
+            self._pending.append((input_request, multiple_results_expected, get_request_priority(), future,
+                                  time.monotonic() + self._max_latency))
+            if len(self._pending) == 1 or len(self._pending) >= self._max_batch_size:
+                self._condition.notify()
+        return future
+
+    # Sends everything that is queued without waiting for the size or latency thresholds
+    def flush(self):
+        with self._condition:
+            pending = self._pending
+            self._pending = []
+        self.send(pending)
+
+    # Sends what is still queued and waits for every lookup to be answered
+    def close(self):
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    def run(self):
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if len(self._pending) >= self._max_batch_size:
+                        break
+                    if self._pending:
+                        wait = self._pending[0][4] - time.monotonic()
+                        if wait <= 0:
+                            break
+                    else:
+                        wait = None
+                    self._condition.wait(wait)
+                pending = self._pending[:self._max_batch_size]
+                self._pending = self._pending[self._max_batch_size:]
+                if not pending and self._closed:
+                    return
+            self._executor.submit(self.send, pending)
+
+    def send(self, pending):
+        groups = {}
+        for input_request, multiple_results_expected, priority, future, deadline in pending:
+            groups.setdefault((input_request["function"], multiple_results_expected), []).append(
+                (input_request, priority, future))
+        for (api_function_identifier, multiple_results_expected), items in groups.items():
+            try:
+                response_entries = self._client.fetch_input_requests(
+                    [input_request for input_request, priority, future in items], api_function_identifier,
+                    min(priority for input_request, priority, future in items))
+                if len(response_entries) != len(items):
+                    raise CiqServiceException("Cap IQ returned {} entries for {} input requests".format(
+                        len(response_entries), len(items)))
+            except Exception as e:
+                for input_request, priority, future in items:
+                    future.set_exception(e)
+                continue
+            for (input_request, priority, future), ret in zip(items, response_entries):
+                if ret.get("ErrMsg"):
+                    future.set_exception(CiqServiceException(ret["ErrMsg"]))
+                else:
+                    future.set_result(CapIQClient.parse_response_entry(ret, multiple_results_expected))
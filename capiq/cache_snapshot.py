@@ -0,0 +1,159 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+import time
+
+# A snapshot file is a header, the key, identifier and JSON value of every datapoint back to back in key order,
+# and an index of one fixed size record per datapoint: where its bytes start, the three lengths and the time it
+# expires at. Lookups binary search the index of the memory-mapped file, so opening a snapshot reads nothing
+# and every process that mounts the same file shares its pages.
+_magic = b"CIQSNAP1"
+_header = struct.Struct("<8sQQ")  # magic, datapoints, offset of the index
+_record = struct.Struct("<QIIId")  # offset, key, identifier and value lengths, expires
+
+
+# Writes every datapoint of a DatapointCache, or of the store of a TieredCache, that has not expired to an
+# immutable snapshot at path. The file is written next to path and renamed over it, so a snapshot being read is
+# never seen half written.
+def export_snapshot(cache, path):
+    return write_snapshot(path, cache.iter_rows())
+
+
+# rows is an iterable of (key, identifier, JSON encoded value, expires), returns the number of datapoints written
+def write_snapshot(path, rows):
+    rows = sorted((key.encode("utf-8"), identifier.encode("utf-8"), value.encode("utf-8"), expires)
+                  for key, identifier, value, expires in rows)
+    records = []
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(_header.pack(_magic, 0, 0))
+        offset = _header.size
+        for key, identifier, value, expires in rows:
+            f.write(key)
+            f.write(identifier)
+            f.write(value)
+            records.append(_record.pack(offset, len(key), len(identifier), len(value), expires))
+            offset += len(key) + len(identifier) + len(value)
+        f.write(b"".join(records))
+        f.seek(0)
+        f.write(_header.pack(_magic, len(records), offset))
+    os.replace(temporary_path, path)
+    return len(records)
+
+
+# A read-only, memory-mapped snapshot written by export_snapshot. Datapoints expire when they would have in the
+# cache they were exported from.
+class CacheSnapshot:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, self._index_offset = _header.unpack_from(self._mmap, 0)
+        if magic != _magic:
+            self._mmap.close()
+            raise ValueError("{} is not a capiq cache snapshot".format(path))
+        self._keys = _SnapshotKeys(self)
+
+    def __len__(self):
+        return self._count
+
+    def get_record(self, position):
+        return _record.unpack_from(self._mmap, self._index_offset + position * _record.size)
+
+    def get_key(self, position):
+        offset, key_length = self.get_record(position)[:2]
+        return self._mmap[offset:offset + key_length]
+
+    def find(self, key):
+        key = key.encode("utf-8")
+        position = bisect.bisect_left(self._keys, key)
+        if position < self._count and self.get_key(position) == key:
+            return position
+        return None
+
+    # Same as DatapointCache.get_many
+    def get_many(self, keys):
+        return {key: (identifier, value) for key, (identifier, value, expires) in self.get_entries(keys).items()}
+
+    # Same as DatapointCache.get_entries
+    def get_entries(self, keys):
+        found = {}
+        now = time.time()
+        for key in keys:
+            position = self.find(key)
+            if position is None:
+                continue
+            offset, key_length, identifier_length, value_length, expires = self.get_record(position)
+            if expires <= now:
+                continue
+            offset += key_length
+            identifier = self._mmap[offset:offset + identifier_length].decode("utf-8")
+            offset += identifier_length
+            found[key] = (identifier, json.loads(self._mmap[offset:offset + value_length]), expires)
+        return found
+
+    def close(self):
+        self._mmap.close()
+
+
+# The keys of a snapshot as a sequence of bytes, read from the file only for the positions bisect looks at
+class _SnapshotKeys:
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    def __getitem__(self, position):
+        return self._snapshot.get_key(position)
+
+
+# Mounts snapshots in front of the cache of a client. Reads go through the snapshots in the order they were
+# given and only the datapoints none of them hold are read from store. Writes only go to store, snapshots are
+# never changed, and without a store datapoints fetched from Cap IQ are not cached at all.
+#
+# snapshots are CacheSnapshot objects or the paths of snapshot files.
+class MountedSnapshots:
+    def __init__(self, snapshots, store=None):
+        self.snapshots = [snapshot if isinstance(snapshot, CacheSnapshot) else CacheSnapshot(snapshot)
+                          for snapshot in snapshots]
+        self._store = store
+        self.hits = 0
+
+    def get_many(self, keys):
+        return {key: (identifier, value) for key, (identifier, value, expires) in self.get_entries(keys).items()}
+
+    def get_entries(self, keys):
+        keys = list(keys)
+        found = {}
+        for snapshot in self.snapshots:
+            missing = [key for key in keys if key not in found]
+            if not missing:
+                break
+            found.update(snapshot.get_entries(missing))
+        self.hits += len(found)
+        missing = [key for key in keys if key not in found]
+        if missing and self._store is not None:
+            found.update(self._store.get_entries(missing))
+        return found
+
+    def set_many(self, items):
+        if self._store is not None:
+            self._store.set_many(items)
+
+    def get_expire_after(self, api_function_identifier, mnemonic, cache_expiry_time=None):
+        if self._store is None:
+            return 0
+        return self._store.get_expire_after(api_function_identifier, mnemonic, cache_expiry_time)
+
+    def clear(self):
+        if self._store is not None:
+            self._store.clear()
+
+    def close(self):
+        for snapshot in self.snapshots:
+            snapshot.close()
+        if self._store is not None:
+            self._store.close()
@@ -1,16 +1,101 @@
-import datetime
-import os
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 import json
 import logging
-import requests_cache
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
+from requests.packages.urllib3.util.retry import Retry
 
+from capiq.cache_snapshot import MountedSnapshots
+from capiq.coalescing import RequestCoalescer
+from capiq.columnar import entry_to_columns, rows_to_columns
+from capiq.datapoint_cache import DatapointCache
+from capiq.deadlines import get_request_deadline
+from capiq.exceptions import CiqServiceException
+from capiq.frames import to_long_frame, to_wide_frame
+from capiq.identifiers import IdentifierIndex
+from capiq.metrics import no_timing
+from capiq.planning import RequestPlan
+from capiq.records import CompactResult
+from capiq.request_counter import FileRequestCounter
+from capiq.retry import CircuitOpenException
+from capiq.scheduler import NORMAL_PRIORITY, get_request_priority
+from capiq.streaming import iter_response_entries
+from capiq.time_series_store import TimeSeriesStore
+
+logger = logging.getLogger("capiq")
+
+
+# A make_request call after it has been turned into GDS inputRequests. Holds everything that is needed to
+# map the responses back into the nested result dictionary, independently of how the batches are sent.
+class GDSRequest:
+    def __init__(self, api_function_identifier, input_requests, return_keys, mnemonic_return_keys,
+                 multiple_results_expected, columnar=False, as_frame=False, compact=False):
+        self.api_function_identifier = api_function_identifier
+        self.input_requests = input_requests
+        self.return_keys = return_keys  # the return key of every input request
+        self.mnemonic_return_keys = mnemonic_return_keys
+        self.multiple_results_expected = multiple_results_expected
+        self.columnar = columnar or (as_frame and multiple_results_expected)
+        self.as_frame = as_frame
+        # frames are compact already
+        self.compact = compact and not as_frame
+        self.priority = get_request_priority()
+        self.deadline = get_request_deadline()
+        self.batches = []
+        self.batch_cache_keys = []
+        self.returnee = CompactResult() if self.compact else {}
+        # the RequestPlan of the input requests that were not cached, and their indices in input_requests
+        self.plan = None
+        self.plan_indices = []
+        # CIQ ID -> the identifiers the caller passed for it, when identifiers are resolved, see IdentifierIndex
+        self.aliases = None
+        # set for incremental GDST/GDSHE requests, see prepare_time_series_request
+        self.series = None
+        self.batch_gaps = []
+
+
+# Maps the mnemonic and properties Cap IQ echoes back in every GDSSDKResponse entry to the return key the
+# caller asked for. Properties are canonicalized once, when the index is built, so that resolving an entry is
+# a dictionary lookup instead of a scan over every return key of the mnemonic.
+class ReturnKeyIndex:
+    def __init__(self, mnemonics, return_keys, properties):
+        self._candidates = {}  # mnemonic to [(canonical properties, return key)] in request order
+        self._index = {}  # (mnemonic, canonical properties) to return key
+        for index, mnemonic in enumerate(mnemonics):
+            canonical = self.canonicalize(properties[index] if properties else {})
+            self._candidates.setdefault(mnemonic.upper(), []).append((canonical, return_keys[index]))
+            self._index.setdefault((mnemonic.upper(), canonical), return_keys[index])
+
+    # Cap IQ does not care about the case of property names and echoes spaces in values back as "+"
+    @staticmethod
+    def canonicalize(properties):
+        return frozenset((str(name).upper(), str(value).replace(" ", "+")) for name, value in properties.items())
+
+    def get_return_key(self, mnemonic, properties):
+        mnemonic = mnemonic.upper()
+        candidates = self._candidates[mnemonic]
+        if len(candidates) == 1:
+            return candidates[0][1]
+        key = (mnemonic, self.canonicalize(properties))
+        if key in self._index:
+            return self._index[key]
+        # Cap IQ does not always echo every requested property, so fall back to the first return key whose
+        # properties include all of the returned ones and remember the answer for the next entry
+        for canonical, return_key in candidates:
+            if key[1] <= canonical:
+                self._index[key] = return_key
+                return return_key
+        return None
+
+    def __repr__(self):
+        return repr(self._candidates)
 
-class CiqServiceException(Exception):
-    pass
 
 class CapIQClient:
     _endpoint = 'https://api-ciq.marketintelligence.spglobal.com/gdsapi/rest/v3/clientservice.json'
@@ -20,42 +105,137 @@ class CapIQClient:
     _password = None
     _debug = False
     _request_caching_enabled = False
+    _max_batch_size = 500  # inputRequests accepted by GDS in a single call
+    _max_workers = 4  # batches in flight at once when a request has to be split
     request_count = 0
+    datapoints_saved = 0  # duplicate input requests that were not sent, see capiq.planning
+
+    _session = None
+    _cache = None
+    _time_series_store = None
+    _scheduler = None
+    _scheduler_counts = False  # the scheduler adds admitted datapoints to the request counter itself
+    _request_counter = None
+    _coalescer = None
+    _retry_policy = None
+    _circuit_breaker = None
+    _timeout = (10, 300)  # (connect, read) seconds of every POST
+    _metrics = None
+    _identifier_index = None
 
-    def __init__(self, username, password, verify=True, debug=False):
+    def __init__(self, username, password, verify=True, debug=False, max_batch_size=500, max_workers=4,
+                 pool_connections=1, pool_maxsize=None, keep_alive=True, max_retries=0, cache=None,
+                 time_series_store=None, scheduler=None, request_counter=None, coalesce_window=None,
+                 retry_policy=None, circuit_breaker=None, timeout=(10, 300), metrics=None, identifier_index=None,
+                 snapshots=None):
         assert username is not None
         assert password is not None
         assert verify is not None
         assert debug is not None
+        assert max_batch_size > 0
+        assert max_workers > 0
+        assert pool_connections > 0
+        assert pool_maxsize is None or pool_maxsize > 0
         self._username = username
         self._password = password
         self._verify = verify
         self._debug = debug
-        if self._request_caching_enabled:
+        self._max_batch_size = max_batch_size
+        self._max_workers = max_workers
+        self._request_count_lock = threading.Lock()
+        if request_counter is None and self._request_caching_enabled:
+            request_counter = FileRequestCounter('./request_count_cache')
+        self._request_counter = request_counter
+        if self._request_counter is not None:
             self.request_count = self.get_cached_request_count()
         if not self._verify:
             requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
         if self._debug:
             self.enable_request_debugging()
-        else:
-            self.enable_error_logging()
-        # cache requests for 24 hours
-        if self._request_caching_enabled:
-            requests_cache.install_cache('capiq_cache', backend='sqlite', expire_after=86400, allowable_methods=('POST',))
+        # cache datapoints for 24 hours
+        if cache is not None:
+            self._cache = cache
+        elif self._request_caching_enabled:
+            self._cache = DatapointCache('capiq_cache.sqlite', expire_after=86400)
+        # read-only cache snapshots, see capiq.cache_snapshot, answer before the cache and the network
+        if snapshots:
+            self._cache = MountedSnapshots(snapshots, self._cache)
+        self._time_series_store = time_series_store
+        # datapoints already counted today by earlier processes come out of the scheduler's budget, unless the
+        # scheduler shares a counter with them
+        if scheduler is not None and not scheduler.has_counter():
+            scheduler.add_used(self.request_count)
+        self._scheduler = scheduler
+        self._scheduler_counts = scheduler is not None and scheduler.shares_counter(request_counter)
+        self._retry_policy = retry_policy
+        self._circuit_breaker = circuit_breaker
+        # a requests style timeout, seconds or (connect, read) seconds, for every POST. None waits forever.
+        self._timeout = timeout
+        self._metrics = metrics
+        # send, deduplicate and cache requests on the CIQ ID of every identifier
+        self._identifier_index = identifier_index
+        # share fetches of the same datapoints between threads, merging those that arrive within the window
+        if coalesce_window is not None:
+            self._coalescer = self.build_coalescer(coalesce_window)
+        # one pooled session per client so that every gds* call reuses the same keep-alive connections.
+        # pool_maxsize defaults to max_workers so concurrent batches never wait on a connection.
+        self._session = self.build_session(pool_connections, pool_maxsize or max_workers, keep_alive, max_retries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        self.cache_request_count()
+
+    def build_coalescer(self, coalesce_window):
+        return RequestCoalescer(self.send_input_requests, self.build_cache_key, coalesce_window)
+
+    def build_session(self, pool_connections, pool_maxsize, keep_alive, max_retries):
+        session = requests.Session()
+        session.auth = HTTPBasicAuth(self._username, self._password)
+        session.verify = self._verify
+        session.headers.update(self._headers)
+        session.headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+        if not isinstance(max_retries, Retry):
+            # GDS calls are read only, so it is safe to retry the POST on connection errors and 5xx responses
+            max_retries = Retry(total=max_retries, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                                allowed_methods=frozenset(['POST']), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=max_retries)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
 
     # This function retrieves a single data point for a point in time value for a mnemonic either current or
     # historical. Default inputs include a Mnemonic and a Security/Entity Identifier
     #
     # Returns a nested dictionary, where the primary key is the identifier and the secondary key is the mnemonic.
     # In case of an error, a None value is returned for that mnemonic and Cap IQ's error is logged
-    def gdsp(self, identifiers, mnemonics, return_keys, properties=None):
-        return self.make_request(identifiers, mnemonics, return_keys, properties, "GDSP", False)
+    #
+    # With as_frame=True a pandas DataFrame is returned instead. gdsp, gdspv, gdshv and gdsg return one row per
+    # identifier and one column per return key, gdst and gdshe a long frame indexed by identifier, return key
+    # and date, see capiq.frames.
+    #
+    # With compact=True a capiq.records.CompactResult is returned. It reads like the nested dictionary, but keeps
+    # every datapoint in a slotted record with numbers converted to floats and text interned, which takes a
+    # fraction of the memory for large results.
+    def gdsp(self, identifiers, mnemonics, return_keys, properties=None, as_frame=False, compact=False):
+        return self.make_request(identifiers, mnemonics, return_keys, properties, "GDSP", False, as_frame=as_frame,
+                                 compact=compact)
 
-    def gdspv(self, identifiers, mnemonics, return_keys, properties=None):
-        return self.make_request(identifiers, mnemonics, return_keys, properties, "GDSPV", False)
+    def gdspv(self, identifiers, mnemonics, return_keys, properties=None, as_frame=False, compact=False):
+        return self.make_request(identifiers, mnemonics, return_keys, properties, "GDSPV", False, as_frame=as_frame,
+                                 compact=compact)
 
+    # gdst and gdshe return a list of rows per identifier and return key. With columnar=True every list of rows is
+    # replaced by a dictionary of header to numpy array, see capiq.columnar.
     def gdst(self, identifiers, mnemonics, return_keys, start_date=None, end_date=None, frequency=None,
-             properties=None):
+             properties=None, columnar=False, as_frame=False, compact=False):
         # properties or the start_date and frequency must be set
         if not properties:
             properties = []
@@ -68,9 +248,11 @@ class CapIQClient:
                 p["STARTDATE"] = start_date
             if end_date:
                 p["ENDDATE"] = end_date
-        return self.make_request(identifiers, mnemonics, return_keys, properties, "GDST", True)
+        return self.make_request(identifiers, mnemonics, return_keys, properties, "GDST", True, columnar, as_frame,
+                                 compact)
 
-    def gdshe(self, identifiers, mnemonics, return_keys, start_date=None, end_date=None, properties=None):
+    def gdshe(self, identifiers, mnemonics, return_keys, start_date=None, end_date=None, properties=None,
+              columnar=False, as_frame=False, compact=False):
         if not properties:
             properties = []
             for i in range(0, len(mnemonics)):
@@ -81,9 +263,11 @@ class CapIQClient:
             if end_date:
                 p["ENDDATE"] = end_date
 
-        return self.make_request(identifiers, mnemonics, return_keys, properties, "GDSHE", True)
+        return self.make_request(identifiers, mnemonics, return_keys, properties, "GDSHE", True, columnar,
+                                 as_frame, compact)
 
-    def gdshv(self, identifiers, mnemonics, return_keys, start_date=None, end_date=None, properties=None):
+    def gdshv(self, identifiers, mnemonics, return_keys, start_date=None, end_date=None, properties=None,
+              as_frame=False, compact=False):
         if not properties:
             properties = []
             for i in range(0, len(mnemonics)):
@@ -93,129 +277,709 @@ class CapIQClient:
                 p["STARTDATE"] = start_date
             if end_date:
                 p["ENDDATE"] = end_date
-        return self.make_request(identifiers, mnemonics, return_keys, properties, "GDSHV", False)
+        return self.make_request(identifiers, mnemonics, return_keys, properties, "GDSHV", False, as_frame=as_frame,
+                                 compact=compact)
 
-    def gdsg(self, identifiers, group_mnemonics, return_keys, properties=None):
-        return self.make_request(identifiers, group_mnemonics, return_keys, properties, "GDSG", False)
+    def gdsg(self, identifiers, group_mnemonics, return_keys, properties=None, as_frame=False, compact=False):
+        return self.make_request(identifiers, group_mnemonics, return_keys, properties, "GDSG", False,
+                                 as_frame=as_frame, compact=compact)
 
     def get_request_count(self):
         return self.request_count
 
+    def get_datapoints_saved(self):
+        return self.datapoints_saved
+
+    # writes counts the request counter holds locally to its backend
     def cache_request_count(self):
-        # write the request_count to a file with todays date
-        cache_file = open("./request_count_cache", "w")
-        cache_file.write("{date},{request_count}".format(
-            date=datetime.datetime.now().date(),
-            request_count=self.request_count
-        ))
-        cache_file.close()
+        if self._request_counter is not None:
+            self._request_counter.flush()
 
+    # returns todays count from the request counter, which every process sharing its backend adds to
     def get_cached_request_count(self):
-        # check for the cache file
-        #   if present check if the date is today
-        #       if the date is today then get the count and return it
-        #       if the date is not today then overwrite the file with todays date and a count of zero and return 0
-        # if the file is not present then create one with todays date and a count of 0
-        if os.path.isfile("./request_count_cache"):
-            cache_file = open("./request_count_cache", "r")
-            cache_line = cache_file.readline()
-            cache_data = cache_line.split(",")
-            if cache_data[0] == str(datetime.datetime.now().date()):
-                return int(cache_data[1])
-            else:
-                cache_file.close()
-                self.request_count = 0
-                self.cache_request_count()
-                return self.request_count
-        else:
-            self.request_count = 0
-            self.cache_request_count()
+        if self._request_counter is None:
             return self.request_count
+        return self._request_counter.get()
 
-    def make_request(self, identifiers, mnemonics, return_keys, properties, api_function_identifier, multiple_results_expected):
-        req_array = []
+    def make_request(self, identifiers, mnemonics, return_keys, properties, api_function_identifier,
+                     multiple_results_expected, columnar=False, as_frame=False, compact=False):
+        if self._identifier_index is not None:
+            self.resolve_identifiers(identifiers)
+        request = self.prepare_request(identifiers, mnemonics, return_keys, properties, api_function_identifier,
+                                       multiple_results_expected, columnar, as_frame, compact)
+        if self._coalescer is not None and request.series is None:
+            return self.complete_request(request, self.fetch_coalesced(request))
+        return self.complete_request(request, self.send_batches(request.batches, request.priority, request.deadline))
+
+    # Fetches the batches of the request through the coalescer and splits the response entries back into batches
+    def fetch_coalesced(self, request):
+        response_entries = self._coalescer.fetch([req for batch in request.batches for req in batch],
+                                                 request.priority, request.deadline)
+        responses = []
+        for batch in request.batches:
+            responses.append(response_entries[:len(batch)])
+            response_entries = response_entries[len(batch):]
+        return responses
+
+    # Returns one response entry per input request of a single function, answering what it can from the cache
+    # and fetching the rest like make_request does
+    def fetch_input_requests(self, input_requests, api_function_identifier, priority=NORMAL_PRIORITY,
+                             deadline=None):
+        response_entries, misses, cache_keys = self.get_cached_entries(input_requests)
+        if misses:
+            miss_requests = [input_requests[i] for i in misses]
+            if self._coalescer is not None:
+                fetched = self._coalescer.fetch(miss_requests, priority, deadline)
+            else:
+                fetched = self.send_input_requests(miss_requests, priority, deadline)
+            self.add_fetched_entries(response_entries, misses, cache_keys, fetched, api_function_identifier)
+        return response_entries
+
+    # Returns (response entries, misses, cache keys): the cached response entry of every input request, None
+    # for those that are not cached, and the indices of the latter
+    def get_cached_entries(self, input_requests):
+        response_entries = [None] * len(input_requests)
+        if self._cache is None:
+            return response_entries, list(range(len(input_requests))), []
+        cache_keys = [self.build_cache_key(input_request) for input_request in input_requests]
+        cached = self._cache.get_many(cache_keys)
+        self.count_cache_lookups(len(cached), len(cache_keys) - len(cached))
+        misses = []
+        for i, cache_key in enumerate(cache_keys):
+            if cache_key in cached:
+                identifier, cached_entry = cached[cache_key]
+                response_entries[i] = dict(cached_entry, Identifier=identifier)
+            else:
+                misses.append(i)
+        return response_entries, misses, cache_keys
+
+    # Caches the response entries fetched for the misses of get_cached_entries and fills them in
+    def add_fetched_entries(self, response_entries, misses, cache_keys, fetched, api_function_identifier):
+        if self._cache is not None:
+            self.cache_response([cache_keys[i] for i in misses], fetched, api_function_identifier)
+        for i, ret in zip(misses, fetched):
+            response_entries[i] = ret
+
+    # Sends input requests in batches and returns one response entry per input request
+    def send_input_requests(self, input_requests, priority=NORMAL_PRIORITY, deadline=None):
+        responses = self.send_batches(self.chunk_input_requests(input_requests), priority, deadline)
+        return [ret for response_entries in responses for ret in response_entries]
+
+    # Streaming version of make_request. Yields (identifier, return_key, value) for every datapoint as soon as it
+    # has been decoded instead of building the whole result. Batches are sent one after another and each
+    # response body is decoded incrementally, so memory use stays flat however large the request is.
+    # Cached datapoints are yielded first. Requests served from the time series store are not streamed.
+    def stream_request(self, identifiers, mnemonics, return_keys, properties, api_function_identifier,
+                       multiple_results_expected, columnar=False):
+        if self._identifier_index is not None:
+            self.resolve_identifiers(identifiers)
+        request = self.prepare_request(identifiers, mnemonics, return_keys, properties, api_function_identifier,
+                                       multiple_results_expected, columnar)
+        if request.series is not None:
+            request.returnee = self.complete_request(request, self.send_batches(request.batches, request.priority,
+                                                                                request.deadline))
+        for identifier, values in request.returnee.items():
+            for return_key, value in values.items():
+                if request.series is None:
+                    yield from self.rekey_record(request, (identifier, return_key, value))
+                else:
+                    yield identifier, return_key, value
+        if request.series is not None:
+            return
+        duplicates = request.plan.get_duplicates_by_wire_index()
+        for i, batch in enumerate(request.batches):
+            cache_keys = request.batch_cache_keys[i] if self._cache is not None else []
+            cache_items = []
+            for j, ret in enumerate(self.stream_batch(batch, request.priority, request.deadline)):
+                record = self.parse_response_record(ret, request.mnemonic_return_keys, multiple_results_expected,
+                                                    request.columnar)
+                if cache_keys and j < len(cache_keys) and not ret['ErrMsg'] and \
+                        ret['Mnemonic'].upper() == batch[j]['mnemonic'].upper():
+                    cache_items.append((cache_keys[j], ret))
+                    if len(cache_items) >= 100:
+                        self.cache_response_entries(cache_items, api_function_identifier)
+                        cache_items = []
+                if record is not None:
+                    yield from self.rekey_record(request, record)
+                wire_index = i * self._max_batch_size + j
+                if wire_index in duplicates and j < len(batch) and \
+                        ret['Mnemonic'].upper() == batch[j]['mnemonic'].upper():
+                    for input_request, identifier, return_key, value in self.expand_duplicate(
+                            request, duplicates[wire_index], ret, wire_index):
+                        yield from self.rekey_record(request, (identifier, return_key, value))
+            if cache_items:
+                self.cache_response_entries(cache_items, api_function_identifier)
+
+    # Asks Cap IQ for the trading item CIQ ID of every identifier the identifier index does not know yet
+    def resolve_identifiers(self, identifiers):
+        input_requests = self.prepare_resolution(identifiers)
+        if input_requests:
+            self.complete_resolution(input_requests, self.fetch_input_requests(
+                input_requests, "GDSP", get_request_priority(), get_request_deadline()))
+
+    def prepare_resolution(self, identifiers):
+        return self.build_input_requests(self._identifier_index.get_unknown(identifiers),
+                                         [self._identifier_index.resolve_mnemonic], None, "GDSP")
+
+    def complete_resolution(self, input_requests, response_entries):
+        resolved = []
+        unresolved = []
+        for input_request, ret in zip(input_requests, response_entries):
+            value = self.parse_response_entry(ret, False)
+            if value:
+                resolved.append((input_request['identifier'], value))
+            else:
+                # an error, or no data at all
+                unresolved.append(input_request['identifier'])
+        self._identifier_index.add_many(resolved)
+        self._identifier_index.add_unresolved(unresolved)
+
+    # Replaces every identifier the identifier index knows by its CIQ ID and remembers which identifiers the
+    # caller passed for each identifier that is sent, resolved or not, so that the results can be keyed on them
+    # again
+    def resolve_aliases(self, identifiers):
+        ciq_ids = self._identifier_index.get_many(identifiers)
+        aliases = {}
+        for identifier in identifiers:
+            sent_as = IdentifierIndex.build_alias(ciq_ids.get(identifier, identifier))
+            if identifier not in aliases.get(sent_as, []):
+                aliases.setdefault(sent_as, []).append(identifier)
+        return [ciq_ids.get(identifier, identifier) for identifier in identifiers], aliases
+
+    # The identifiers the caller passed for an identifier Cap IQ returned
+    @staticmethod
+    def get_aliases(request, identifier):
+        if not request.aliases:
+            return [identifier]
+        return request.aliases.get(IdentifierIndex.build_alias(identifier)) or [identifier]
+
+    def rekey_record(self, request, record):
+        identifier, return_key, value = record
+        for alias in self.get_aliases(request, identifier):
+            yield alias, return_key, value
+
+    # Keys the result on the identifiers the caller passed instead of the CIQ IDs that were requested
+    def rekey_result(self, request):
+        if not request.aliases:
+            return
+        if request.compact:
+            request.returnee.rekey(lambda identifier: self.get_aliases(request, identifier))
+            return
         returnee = {}
-        mnemonic_return_keys = self.build_mnemonic_return_key_index(mnemonics, return_keys, properties)
-        tmp_request_count = 0
+        for identifier, values in request.returnee.items():
+            for i, alias in enumerate(self.get_aliases(request, identifier)):
+                returnee[alias] = values if i == 0 else dict(values)
+        request.returnee = returnee
+
+    def stream_batch(self, req_array, priority=NORMAL_PRIORITY, deadline=None):
+        req = {"inputRequests": req_array}
+        assert self._session is not None, "CapIQClient has been closed"
+        if deadline is not None:
+            deadline.check()
+        self.acquire_quota(req_array, priority, deadline)
+        try:
+            self.before_post()
+            with self.time_phase("serialize"):
+                data = json.dumps(req)
+            with self.time_phase("network"):
+                response = self._session.post(self._endpoint, data=data, stream=True,
+                                              timeout=self.get_timeout(deadline))
+            self.check_status(response)
+        except Exception as e:
+            self.release_quota(req_array)
+            self.after_post(e)
+            self.check_deadline(e, deadline)
+            raise
+        self.after_post()
+        if self._metrics is not None:
+            self.observe_batch(len(req_array), len(data))
+        with response:
+            self.count_requests(len(req_array))
+            for index, ret in enumerate(iter_response_entries(response.iter_content(chunk_size=65536))):
+                if index == 0:
+                    self.check_service_error(ret)
+                yield ret
+
+    # prepare_request and complete_request hold all of the request logic that does not depend on the transport,
+    # so the sync and async clients only differ in how the batches are sent.
+    def prepare_request(self, identifiers, mnemonics, return_keys, properties, api_function_identifier,
+                        multiple_results_expected, columnar=False, as_frame=False, compact=False):
+        aliases = None
+        if self._identifier_index is not None:
+            identifiers, aliases = self.resolve_aliases(identifiers)
+        request = GDSRequest(
+            api_function_identifier,
+            self.build_input_requests(identifiers, mnemonics, properties, api_function_identifier),
+            [return_keys[i] for identifier in identifiers for i in range(len(mnemonics))],
+            self.build_mnemonic_return_key_index(mnemonics, return_keys, properties),
+            multiple_results_expected,
+            columnar,
+            as_frame,
+            compact
+        )
+        request.aliases = aliases
+        if self._time_series_store is not None and multiple_results_expected and properties and \
+                all(TimeSeriesStore.split_date_range(p) is not None for p in properties):
+            return self.prepare_time_series_request(request, identifiers, mnemonics, return_keys, properties)
+        input_requests = request.input_requests
+        misses = list(range(len(input_requests)))
+        cache_keys = []
+        if self._cache is not None:
+            # answer whatever we can from the cache and only send the misses to GDS
+            cache_keys = [self.build_cache_key(input_request) for input_request in input_requests]
+            cached = self._cache.get_many(cache_keys)
+            self.count_cache_lookups(len(cached), len(cache_keys) - len(cached))
+            misses = []
+            for i, cache_key in enumerate(cache_keys):
+                if cache_key in cached:
+                    identifier, cached_entry = cached[cache_key]
+                    if not cached_entry["Headers"]:
+                        # no data, left out of the result like parse_response_record leaves out live entries
+                        self.add_identifier(request, identifier)
+                        continue
+                    self.add_result(request, identifier, input_requests[i]['mnemonic'], request.return_keys[i],
+                                    self.parse_response_entry(cached_entry, multiple_results_expected,
+                                                              request.columnar), cached_entry["Headers"])
+                else:
+                    misses.append(i)
+        # every datapoint is sent once, however many return keys and identifier spellings ask for it
+        request.plan = RequestPlan([input_requests[i] for i in misses])
+        request.plan_indices = misses
+        self.count_saved(request.plan.saved)
+        request.batches = self.chunk_input_requests(request.plan.wire_requests)
+        if cache_keys:
+            request.batch_cache_keys = self.chunk_input_requests(
+                [cache_keys[misses[i]] for i in request.plan.wire_indices])
+        return request
+
+    def complete_request(self, request, responses):
+        if request.series is not None:
+            return self.complete_time_series_request(request, responses)
+        for i, response_entries in enumerate(responses):
+            with self.time_phase("map"):
+                self.parse_response(response_entries, request.mnemonic_return_keys, request.multiple_results_expected,
+                                    request.returnee, request.columnar, request.compact)
+            if self._cache is not None:
+                self.cache_response(request.batch_cache_keys[i], response_entries, request.api_function_identifier)
+        if request.plan is not None and request.plan.duplicates:
+            self.complete_duplicates(request, [ret for response_entries in responses for ret in response_entries])
+        self.rekey_result(request)
+        return self.build_result(request)
+
+    # Gives every duplicate input request of the plan the value of the response entry its datapoint was sent as
+    def complete_duplicates(self, request, response_entries):
+        plan = request.plan
+        if len(response_entries) != len(plan.wire_requests):
+            logger.error('Cap IQ returned %d entries for %d requests, %d duplicate requests are left out',
+                         len(response_entries), len(plan.wire_requests), plan.saved)
+            return
+        cache_items = {}
+        for index, wire_index in plan.duplicates:
+            for input_request, identifier, return_key, value in self.expand_duplicate(
+                    request, [index], response_entries[wire_index], wire_index):
+                self.add_result(request, identifier, input_request['mnemonic'], return_key, value,
+                                response_entries[wire_index]['Headers'])
+                ret = response_entries[wire_index]
+                if self._cache is None or ret['ErrMsg'] or identifier == ret['Identifier']:
+                    continue
+                # spellings that only differ in case share the cache key of the request that was sent, which
+                # keeps the identifier Cap IQ returned
+                cache_key = self.build_cache_key(input_request)
+                if cache_key != self.build_cache_key(plan.wire_requests[wire_index]):
+                    cache_items.setdefault(cache_key, dict(ret, Identifier=identifier))
+        if cache_items:
+            self.cache_response_entries(list(cache_items.items()), request.api_function_identifier)
+
+    # Yields (input request, identifier, return key, value) for the duplicates at indices (into the plan) of the
+    # wire request ret answers. Duplicates that spell the identifier differently are keyed on their own spelling,
+    # the others on the identifier Cap IQ returned. Exact repeats of the wire request add nothing and are skipped.
+    def expand_duplicate(self, request, indices, ret, wire_index):
+        if not ret['ErrMsg'] and not ret['Headers']:
+            return
+        wire_request = request.plan.wire_requests[wire_index]
+        wire_return_key = request.return_keys[request.plan_indices[request.plan.wire_indices[wire_index]]]
+        value = self.parse_response_entry(ret, request.multiple_results_expected, request.columnar)
+        for index in indices:
+            request_index = request.plan_indices[index]
+            input_request = request.input_requests[request_index]
+            return_key = request.return_keys[request_index]
+            identifier = ret['Identifier']
+            if input_request['identifier'] != wire_request['identifier']:
+                identifier = input_request['identifier']
+            elif return_key == wire_return_key:
+                continue
+            yield input_request, identifier, return_key, value
+
+    # Sets one value of the result, whether it is a dictionary or a CompactResult
+    @staticmethod
+    def add_result(request, identifier, mnemonic, return_key, value, headers=()):
+        if request.compact:
+            request.returnee.add(identifier, mnemonic, return_key, value, headers)
+        else:
+            request.returnee.setdefault(identifier, {})[return_key] = value
+
+    @staticmethod
+    def add_identifier(request, identifier):
+        if request.compact:
+            request.returnee.add_identifier(identifier)
+        else:
+            request.returnee.setdefault(identifier, {})
 
+    @staticmethod
+    def build_result(request):
+        if not request.as_frame:
+            return request.returnee
+        if request.multiple_results_expected:
+            return to_long_frame(request.returnee)
+        return to_wide_frame(request.returnee, request.return_keys)
+
+    # Rewrites a GDST/GDSHE request so that every identifier/mnemonic only asks for the date ranges that are not
+    # in the time series store yet
+    def prepare_time_series_request(self, request, identifiers, mnemonics, return_keys, properties):
+        store = self._time_series_store
+        request.series = []
+        input_requests = []
+        gaps = []
+        for identifier in identifiers:
+            for i, mnemonic in enumerate(mnemonics):
+                start_date, end_date, series_properties = TimeSeriesStore.split_date_range(properties[i])
+                series_key = store.build_series_key(request.api_function_identifier, identifier, mnemonic,
+                                                    series_properties)
+                request.series.append((series_key, identifier, mnemonic, return_keys[i], start_date, end_date))
+                for gap_start, gap_end in store.get_missing_ranges(series_key, start_date, end_date):
+                    gap_properties = dict(series_properties)
+                    gap_properties["STARTDATE"] = TimeSeriesStore.format_date(gap_start)
+                    gap_properties["ENDDATE"] = TimeSeriesStore.format_date(gap_end)
+                    input_requests.append({"function": request.api_function_identifier, "identifier": identifier,
+                                           "mnemonic": mnemonic, "properties": gap_properties})
+                    gaps.append((len(request.series) - 1, gap_start, gap_end))
+        request.batches = self.chunk_input_requests(input_requests)
+        request.batch_gaps = self.chunk_input_requests(gaps)
+        return request
+
+    def complete_time_series_request(self, request, responses):
+        store = self._time_series_store
+        failed = set()
+        unindexed = {}
+        for batch_gaps, response_entries in zip(request.batch_gaps, responses):
+            if len(batch_gaps) != len(response_entries):
+                logger.error('Cap IQ returned %d entries for %d time series requests', len(response_entries),
+                             len(batch_gaps))
+                failed.update(series_index for series_index, gap_start, gap_end in batch_gaps)
+                continue
+            for (series_index, gap_start, gap_end), ret in zip(batch_gaps, response_entries):
+                if ret['ErrMsg']:
+                    logger.error('Cap IQ error for %s + %s query: %s', ret['Identifier'], ret['Mnemonic'],
+                                 ret['ErrMsg'])
+                    failed.add(series_index)
+                    continue
+                rows = self.parse_response_entry(ret, True)
+                if not store.add(request.series[series_index][0], ret['Identifier'], ret['Headers'], rows,
+                                 gap_start, gap_end):
+                    # no date column to store the rows by, hand them back as they are
+                    unindexed[series_index] = (ret['Identifier'], ret['Headers'], rows)
+        for series_index, (series_key, identifier, mnemonic, return_key, start_date, end_date) in \
+                enumerate(request.series):
+            if series_index in unindexed:
+                identifier, headers, rows = unindexed[series_index]
+                if request.columnar and rows is not None:
+                    rows = rows_to_columns(headers, rows)
+            elif request.columnar:
+                # straight from the store, without going through row strings
+                stored_identifier, headers, rows = store.get_columns(series_key, start_date, end_date)
+                identifier = stored_identifier or identifier
+                if rows is None and headers is not None and series_index not in failed:
+                    rows = rows_to_columns(headers, [])
+            else:
+                stored_identifier, headers, rows = store.get(series_key, start_date, end_date)
+                identifier = stored_identifier or identifier
+                if series_index in failed and not rows:
+                    rows = None
+            self.add_result(request, identifier, mnemonic, return_key, rows, headers)
+        self.rekey_result(request)
+        return self.build_result(request)
+
+    @staticmethod
+    def build_cache_key(input_request):
+        return DatapointCache.build_key(input_request["function"], input_request["identifier"],
+                                        input_request["mnemonic"], input_request["properties"])
+
+    def cache_response(self, cache_keys, response_entries, api_function_identifier):
+        # GDS answers inputRequests in order, anything else can not be matched back to a cache key safely.
+        # Errors are not cached so that they are retried on the next request.
+        if len(cache_keys) != len(response_entries):
+            return
+        self.cache_response_entries(
+            [(cache_key, ret) for cache_key, ret in zip(cache_keys, response_entries) if not ret['ErrMsg']],
+            api_function_identifier
+        )
+
+    # items is a list of (cache_key, GDSSDKResponse entry)
+    def cache_response_entries(self, items, api_function_identifier):
+        # the Headers and Rows of the entry are cached so that hits go through parse_response_entry like responses do
+        self._cache.set_many(
+            (cache_key, ret['Identifier'], {"Headers": ret["Headers"], "Rows": ret["Rows"], "ErrMsg": None},
+             self._cache.get_expire_after(api_function_identifier, ret['Mnemonic'], ret.get('CacheExpiryTime')))
+            for cache_key, ret in items
+        )
+
+    @staticmethod
+    def build_input_requests(identifiers, mnemonics, properties, api_function_identifier):
+        req_array = []
         for identifier in identifiers:
             for i, mnemonic in enumerate(mnemonics):
                 req_array.append({"function": api_function_identifier, "identifier": identifier, "mnemonic": mnemonic,
                                   "properties": properties[i] if properties else {}})
-                tmp_request_count += 1
+        return req_array
+
+    def chunk_input_requests(self, req_array):
+        return [req_array[i:i + self._max_batch_size] for i in range(0, len(req_array), self._max_batch_size)]
+
+    # Sends every batch and returns their GDSSDKResponse lists in the same order as the batches.
+    # Split requests are sent concurrently on a pool of at most _max_workers threads.
+    # Batches that have not been sent yet when the deadline passes or is cancelled are skipped.
+    def send_batches(self, batches, priority=NORMAL_PRIORITY, deadline=None):
+        if len(batches) <= 1:
+            return [self.send_batch(batch, priority, deadline) for batch in batches]
+        with ThreadPoolExecutor(max_workers=min(self._max_workers, len(batches))) as executor:
+            return list(executor.map(functools.partial(self.send_batch, priority=priority, deadline=deadline),
+                                     batches))
+
+    # Sends a batch, retrying it as the retry policy allows. Only the entries that failed with a transient ErrMsg
+    # are sent again, the rest of the batch is kept from the earlier attempts.
+    def send_batch(self, req_array, priority=NORMAL_PRIORITY, deadline=None):
+        if self._retry_policy is None:
+            return self.post_batch(req_array, priority, deadline)
+        response_entries = None
+        retry_indices = list(range(len(req_array)))
+        attempt = 0
+        while True:
+            try:
+                entries = self.post_batch([req_array[i] for i in retry_indices], priority, deadline)
+            except Exception as e:
+                backoff = self.get_retry_backoff(attempt, deadline)
+                if backoff is None or not self._retry_policy.is_retryable_exception(e):
+                    return self.end_retries(response_entries, retry_indices, e)
+            else:
+                response_entries, retry_indices = self.merge_retried_entries(response_entries, retry_indices, entries)
+                backoff = self.get_retry_backoff(attempt, deadline) if retry_indices else None
+                if backoff is None:
+                    return response_entries
+            if self._metrics is not None:
+                self._metrics.increment("retries")
+            self._retry_policy.sleep(backoff)
+            attempt += 1
+
+    def post_batch(self, req_array, priority=NORMAL_PRIORITY, deadline=None):
         req = {"inputRequests": req_array}
-        response = requests.post(self._endpoint, headers=self._headers, data=json.dumps(req),
-                                 auth=HTTPBasicAuth(self._username, self._password), verify=self._verify)
+        assert self._session is not None, "CapIQClient has been closed"
+        if deadline is not None:
+            deadline.check()
+        self.acquire_quota(req_array, priority, deadline)
+        try:
+            self.before_post()
+            with self.time_phase("serialize"):
+                data = json.dumps(req)
+            with self.time_phase("network"):
+                response = self._session.post(self._endpoint, data=data, timeout=self.get_timeout(deadline))
+            self.check_status(response)
+        except Exception as e:
+            self.release_quota(req_array)
+            self.after_post(e)
+            self.check_deadline(e, deadline)
+            raise
+        self.after_post()
+        with self.time_phase("decode"):
+            response_json = response.json()
+        if self._metrics is not None:
+            self.observe_batch(len(req_array), len(data), getattr(response, "content", None))
+        return self.handle_response(req_array, response_json)
+
+    # Returns the seconds to wait before sending a batch again, or None if it may not be retried
+    def get_retry_backoff(self, attempt, deadline):
+        if not self._retry_policy.can_retry(attempt):
+            return None
+        backoff = self._retry_policy.get_backoff(attempt)
+        remaining = None if deadline is None else deadline.remaining()
+        if remaining is not None and backoff >= remaining:
+            return None
+        return backoff
+
+    # Times a phase of the request for the metrics, or does nothing when there are none
+    def time_phase(self, phase):
+        if self._metrics is None:
+            return no_timing
+        return self._metrics.time(phase)
+
+    def observe_batch(self, batch_size, request_bytes, response_body=None):
+        self._metrics.observe("batch_size", batch_size)
+        self._metrics.observe("request_bytes", request_bytes)
+        if isinstance(response_body, bytes):
+            self._metrics.observe("response_bytes", len(response_body))
+
+    def count_cache_lookups(self, hits, misses):
+        if self._metrics is not None:
+            self._metrics.increment("cache_hits", hits)
+            self._metrics.increment("cache_misses", misses)
+
+    def get_timeout(self, deadline):
+        if deadline is None:
+            return self._timeout
+        return deadline.get_timeout(self._timeout)
+
+    # A POST that timed out because the deadline ran out fails with a DeadlineExceededException
+    @staticmethod
+    def check_deadline(exception, deadline):
+        if deadline is not None and isinstance(exception, (requests.exceptions.Timeout, asyncio.TimeoutError)):
+            deadline.check()
+
+    # Gives up on a batch after the resubmission of its transient entries failed with exception. The entries that
+    # already succeeded are returned, their datapoints have been paid for, and the ones at retry_indices keep
+    # the error of their last response. Nothing has succeeded on the first attempt, so that raises.
+    @staticmethod
+    def end_retries(response_entries, retry_indices, exception):
+        if response_entries is None:
+            raise exception
+        logger.error('Gave up retrying %d entries of a batch: %s', len(retry_indices), exception)
+        return response_entries
+
+    # Puts the entries of an attempt into the response of the batch, and returns the response with the indices
+    # of the entries that failed with a transient error
+    def merge_retried_entries(self, response_entries, retry_indices, entries):
+        if len(entries) != len(retry_indices):
+            # entries can only be matched to input requests by position
+            return (entries if response_entries is None else response_entries), []
+        if response_entries is None:
+            response_entries = list(entries)
+        else:
+            for i, ret in zip(retry_indices, entries):
+                response_entries[i] = ret
+        return response_entries, [i for i in retry_indices
+                                  if self._retry_policy.is_transient_error(response_entries[i].get('ErrMsg'))]
+
+    @staticmethod
+    def check_status(response):
+        if response.status_code >= 500:
+            raise requests.exceptions.HTTPError("{} Server Error".format(response.status_code), response=response)
+
+    def before_post(self):
+        if self._circuit_breaker is not None:
+            self._circuit_breaker.before_request()
+
+    # Tells the circuit breaker and the metrics whether the endpoint answered
+    def after_post(self, exception=None):
+        if self._metrics is not None:
+            if exception is None:
+                self._metrics.increment("posts")
+            else:
+                self._metrics.increment("batch_errors", error=type(exception).__name__)
+        if self._circuit_breaker is None or isinstance(exception, CircuitOpenException):
+            return
+        if exception is None:
+            self._circuit_breaker.record_success()
+        else:
+            self._circuit_breaker.record_failure()
+
+    # Waits for the scheduler, if there is one, to admit the batch at the priority of its request
+    def acquire_quota(self, req_array, priority, deadline=None):
+        if self._scheduler is not None:
+            self._scheduler.acquire(len(req_array), priority, None if deadline is None else deadline.remaining())
+
+    def release_quota(self, req_array):
+        if self._scheduler is not None:
+            self._scheduler.release(len(req_array))
+
+    # Request accounting and service level error checks for one batch, shared by the sync and async clients
+    def handle_response(self, req_array, response_json):
         if self._debug:
-            logging.info("Cap IQ response")
-            logging.info(response.json())
-            logging.info("reponse from cache: {}".format(response.from_cache))
-        if self._request_caching_enabled and not response.from_cache:
-            self.request_count += tmp_request_count
-            self.cache_request_count()
-
-        if len(response.json()['GDSSDKResponse']) == 1 and \
-                        len(response.json()['GDSSDKResponse'][0]) == 1 and \
-                        "ErrMsg" in response.json()['GDSSDKResponse'][0].keys():
+            logger.debug("Cap IQ response: %s", response_json)
+        self.count_requests(len(req_array))
+        if len(response_json['GDSSDKResponse']) == 1:
+            self.check_service_error(response_json['GDSSDKResponse'][0])
+        return response_json['GDSSDKResponse']
+
+    def count_saved(self, count):
+        if not count:
+            return
+        if self._metrics is not None:
+            self._metrics.increment("datapoints_saved", count)
+        with self._request_count_lock:
+            self.datapoints_saved += count
+
+    def count_requests(self, count):
+        if self._metrics is not None:
+            self._metrics.increment("datapoints", count)
+        if self._request_counter is not None:
+            with self._request_count_lock:
+                if self._scheduler_counts:
+                    # already added when the scheduler admitted the batch
+                    self.request_count = self._request_counter.get()
+                else:
+                    self.request_count = self._request_counter.increment(count)
+
+    @staticmethod
+    def check_service_error(ret):
+        if len(ret) == 1 and "ErrMsg" in ret.keys():
             # for catching service level issues such as request limit
             # this is an example of what we can catch:
             # {'GDSSDKResponse': [{'ErrMsg': 'Daily Request Limit of 10000 Exceeded'}]}
-            raise CiqServiceException(response.json()['GDSSDKResponse'][0]["ErrMsg"])
-        for return_index, ret in enumerate(response.json()['GDSSDKResponse']):
-            identifier = ret['Identifier']
-            if identifier not in returnee:
-                returnee[identifier] = {}
-            returned_properties = {}
-            if "Properties" in ret:
-                returned_properties = ret['Properties']
-            if ret['ErrMsg']:
-                logging.error(
-                    'Cap IQ error for ' + identifier + ' + ' + ret['Mnemonic'] + ' query: ' + ret['ErrMsg'])
-                returnee[identifier][
-                    self.get_return_key(ret['Mnemonic'], returned_properties, mnemonic_return_keys)] = None
-            else:
-                for i_m, h_m in enumerate(ret["Headers"]):
-                    if multiple_results_expected:
-                        returnee[identifier][
-                            self.get_return_key(ret['Mnemonic'], returned_properties, mnemonic_return_keys)] = []
-                        for row in ret["Rows"]:
-                            returnee[identifier][
-                                self.get_return_key(ret['Mnemonic'], returned_properties, mnemonic_return_keys)
-                            ].append(row['Row'])
-                    else:
-                        returnee[identifier][
-                            self.get_return_key(ret['Mnemonic'], returned_properties, mnemonic_return_keys)
-                        ] = ret['Rows'][i_m]['Row'][0]
+            raise CiqServiceException(ret["ErrMsg"])
+
+    def parse_response(self, response_entries, mnemonic_return_keys, multiple_results_expected, returnee,
+                       columnar=False, compact=False):
+        for ret in response_entries:
+            record = self.parse_response_record(ret, mnemonic_return_keys, multiple_results_expected, columnar)
+            if compact:
+                returnee.add_identifier(ret['Identifier'])
+                if record is not None:
+                    identifier, return_key, value = record
+                    returnee.add(identifier, ret['Mnemonic'], return_key, value, ret['Headers'])
+                continue
+            if ret['Identifier'] not in returnee:
+                returnee[ret['Identifier']] = {}
+            if record is not None:
+                identifier, return_key, value = record
+                returnee[identifier][return_key] = value
         return returnee
 
+    # Returns (identifier, return_key, value) for one GDSSDKResponse entry, or None for entries without data
+    def parse_response_record(self, ret, mnemonic_return_keys, multiple_results_expected, columnar=False):
+        identifier = ret['Identifier']
+        if ret['ErrMsg']:
+            logger.error('Cap IQ error for %s + %s query: %s', identifier, ret['Mnemonic'], ret['ErrMsg'])
+            if self._metrics is not None:
+                self._metrics.increment("entry_errors", mnemonic=ret['Mnemonic'])
+        elif not ret["Headers"]:
+            return None
+        returned_properties = {}
+        if "Properties" in ret:
+            returned_properties = ret['Properties']
+        return (identifier, self.get_return_key(ret['Mnemonic'], returned_properties, mnemonic_return_keys),
+                self.parse_response_entry(ret, multiple_results_expected, columnar))
+
+    # The value of a single GDSSDKResponse entry: None for errors, the list of rows (or columns) for multi row
+    # functions and otherwise the first column of the row for the last header.
     @staticmethod
-    def build_mnemonic_return_key_index(mnemonics, return_keys, properties):
-        mnemonic_return_keys = {}
-        for index, mnemonic in enumerate(mnemonics):
-            if mnemonic in mnemonic_return_keys:
-                mnemonic_return_keys[mnemonic].append({"key": return_keys[index], "properties": properties[index]})
+    def parse_response_entry(ret, multiple_results_expected, columnar=False):
+        if ret['ErrMsg'] or not ret["Headers"]:
+            return None
+        if multiple_results_expected and columnar:
+            return entry_to_columns(ret)
+        if multiple_results_expected:
+            return [row['Row'] for row in ret["Rows"]]
+        return ret['Rows'][len(ret["Headers"]) - 1]['Row'][0]
 
-            else:
-                mnemonic_return_keys[mnemonic] = [{"key": return_keys[index], "properties": properties[index]}]
-        return mnemonic_return_keys
+    @staticmethod
+    def build_mnemonic_return_key_index(mnemonics, return_keys, properties):
+        return ReturnKeyIndex(mnemonics, return_keys, properties)
 
     @staticmethod
     def get_return_key(mnemonic, properties, mnemonics_to_return_key_index):
-        logging.info("mnemonics_to_return_key_index")
-        logging.info(mnemonics_to_return_key_index)
-        if len(mnemonics_to_return_key_index[mnemonic]) == 1:
-            return mnemonics_to_return_key_index[mnemonic][0]["key"]
-        else:
-            for index, return_key in enumerate(mnemonics_to_return_key_index[mnemonic]):
-                match = True
-                logging.info(properties)
-                for property_name, property_value in properties.items():
-                    if not (property_name.upper() in return_key["properties"] and \
-                                        return_key["properties"][property_name.upper()] == property_value.replace(" ", "+")):
-                        match = False
-                if match:
-                    return return_key["key"]
+        return mnemonics_to_return_key_index.get_return_key(mnemonic, properties)
 
+    # Logs every request and response of the client, and the HTTP traffic of urllib3, at DEBUG level. Only the
+    # capiq and urllib3 loggers are changed. They get a stream handler of their own when logging has not been
+    # configured by the application.
     @staticmethod
     def enable_request_debugging():
         # Enabling debugging at http.client level (requests->urllib3->http.client)
@@ -226,14 +990,13 @@ class CapIQClient:
         except ImportError:
             from requests.packages.urllib3.connectionpool import HTTPConnection
         HTTPConnection.debuglevel = 1
+        for name in ("capiq", "urllib3"):
+            debug_logger = logging.getLogger(name)
+            debug_logger.setLevel(logging.DEBUG)
+            if not logging.getLogger().handlers and not debug_logger.handlers:
+                debug_logger.addHandler(logging.StreamHandler())
 
-        logging.basicConfig()  # you need to initialize logging, otherwise you will not see anything from requests
-        logging.getLogger().setLevel(logging.DEBUG)
-        requests_log = logging.getLogger("requests.packages.urllib3")
-        requests_log.setLevel(logging.DEBUG)
-        requests_log.propagate = True
-
+    # Only logs errors of the client
     @staticmethod
     def enable_error_logging():
-        logging.basicConfig()  # you need to initialize logging, otherwise you will not see anything from requests
-        logging.getLogger().setLevel(logging.ERROR)
+        logger.setLevel(logging.ERROR)
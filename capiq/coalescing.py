@@ -0,0 +1,87 @@
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from capiq.exceptions import CiqServiceException
+
+
+# Shares GDS fetches between threads that ask for the same datapoints at about the same time.
+#
+# Input requests are keyed on their function, identifier, mnemonic and properties. A key that is already
+# being fetched for another thread is not requested again, the caller waits for that fetch instead. Keys
+# that are not in flight are queued for window seconds, so that requests arriving within the window are
+# merged and sent together by send(input_requests, priority), which returns one response entry per input
+# request in the same order. The merged requests are sent at the most important priority among them.
+#
+# A caller with a deadline stops waiting for shared fetches when it passes or is cancelled. The merged
+# fetch itself is not bound to any one caller's deadline, since other callers may still be waiting for it.
+class RequestCoalescer:
+    def __init__(self, send, build_key, window=0.005):
+        assert window >= 0
+        self._send = send
+        self._build_key = build_key
+        self._window = window
+        self._lock = threading.Lock()
+        self._in_flight = {}  # key -> Future of the response entry
+        self._pending = []  # (key, input request, priority, future) waiting for the window to close
+        self._collecting = False
+
+    # Returns the response entries of the input requests, in the same order
+    def fetch(self, input_requests, priority, deadline=None):
+        futures = []
+        lead = False
+        with self._lock:
+            for input_request in input_requests:
+                key = self._build_key(input_request)
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = Future()
+                    self._in_flight[key] = future
+                    self._pending.append((key, input_request, priority, future))
+                futures.append(future)
+            if self._pending and not self._collecting:
+                # the first caller of the window sends everything queued during it
+                self._collecting = True
+                lead = True
+        if lead:
+            self.send_pending()
+        return [self.wait_for(future, deadline) for future in futures]
+
+    @staticmethod
+    def wait_for(future, deadline, poll_interval=0.05):
+        if deadline is None:
+            return future.result()
+        while True:
+            deadline.check()
+            remaining = deadline.remaining()
+            try:
+                return future.result(timeout=poll_interval if remaining is None else min(poll_interval, remaining))
+            except FutureTimeoutError:
+                pass
+
+    def send_pending(self):
+        if self._window:
+            time.sleep(self._window)
+        with self._lock:
+            pending = self._pending
+            self._pending = []
+            self._collecting = False
+        try:
+            response_entries = self._send([input_request for key, input_request, priority, future in pending],
+                                          min(priority for key, input_request, priority, future in pending))
+            if len(response_entries) != len(pending):
+                raise CiqServiceException("Cap IQ returned {} entries for {} input requests".format(
+                    len(response_entries), len(pending)))
+        except Exception as e:
+            # every caller waiting on the fetch gets the error
+            response_entries = None
+            error = e
+        with self._lock:
+            for key, input_request, priority, future in pending:
+                del self._in_flight[key]
+        for i, (key, input_request, priority, future) in enumerate(pending):
+            if response_entries is None:
+                future.set_exception(error)
+            else:
+                future.set_result(response_entries[i])
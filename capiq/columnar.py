@@ -0,0 +1,61 @@
+import array
+import datetime
+
+from capiq.time_series_store import TimeSeriesStore
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_epoch_ordinal = datetime.date(1970, 1, 1).toordinal()
+_nat = -2 ** 63  # the int64 value of NaT
+_day_numbers = {}  # Cap IQ date string to days since the epoch, the same dates repeat for every identifier
+
+
+# Converts the rows of a multi row GDSSDKResponse entry into typed columns: a dictionary of header to numpy
+# array, with the date header as datetime64[D] and every other header as float64. Values that can not be
+# converted become NaN/NaT. The rows are read in a single pass into typed C buffers that numpy then wraps
+# without copying, so no per row Python lists are kept.
+def rows_to_columns(headers, rows):
+    if numpy is None:
+        raise ImportError("columnar results require numpy, install it with pip install numpy")
+    date_index = TimeSeriesStore.get_date_index(headers)
+    buffers = [array.array('q' if index == date_index else 'd') for index in range(len(headers))]
+    converters = [to_day_number if index == date_index else to_float for index in range(len(headers))]
+    appenders = [buffer.append for buffer in buffers]
+    columns = list(zip(appenders, converters))
+    for row in rows:
+        for (append, convert), value in zip(columns, row):
+            append(convert(value))
+    result = {}
+    for index, header in enumerate(headers):
+        if index == date_index:
+            result[header] = numpy.frombuffer(buffers[index], dtype=numpy.int64).view('datetime64[D]')
+        else:
+            result[header] = numpy.frombuffer(buffers[index], dtype=numpy.float64)
+    return result
+
+
+def entry_to_columns(ret):
+    return rows_to_columns(ret["Headers"], (row['Row'] for row in ret["Rows"]))
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def to_day_number(value):
+    day_number = _day_numbers.get(value)
+    if day_number is None:
+        # Cap IQ dates are M/D/YYYY without zero padding
+        try:
+            month, day, year = value.split("/")
+            day_number = datetime.date(int(year), int(month), int(day)).toordinal() - _epoch_ordinal
+        except (AttributeError, TypeError, ValueError):
+            return _nat
+        _day_numbers[value] = day_number
+    return day_number
@@ -0,0 +1,181 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+# Caches single GDS datapoints instead of whole responses, so that overlapping requests only fetch the
+# identifier/mnemonic pairs that have not been seen yet. Entries are keyed on the function, identifier,
+# mnemonic and normalized properties and are stored in SQLite.
+#
+# The lifetime of every datapoint is, in order of precedence, the mnemonic_expire_after override for its
+# mnemonic, the function_expire_after override for its function, the CacheExpiryTime Cap IQ sent with it
+# (multiplied by server_expiry_unit to get seconds) and finally expire_after.
+#
+# With max_entries set the cache holds at most about that many datapoints: once it grows past them the expired
+# and then the least recently read datapoints are evicted. compact() removes expired datapoints, evicts and
+# gives the freed pages back to the file system, every compact_interval seconds on a background thread if set.
+class DatapointCache:
+    _sqlite_max_variables = 500
+
+    def __init__(self, path='capiq_cache.sqlite', expire_after=86400, function_expire_after=None,
+                 mnemonic_expire_after=None, server_expiry_unit=1, max_entries=None, compact_interval=None):
+        assert expire_after is not None
+        assert server_expiry_unit > 0
+        assert max_entries is None or max_entries > 0
+        assert compact_interval is None or compact_interval > 0
+        self._expire_after = expire_after
+        self._function_expire_after = dict((k.upper(), v) for k, v in (function_expire_after or {}).items())
+        self._mnemonic_expire_after = dict((k.upper(), v) for k, v in (mnemonic_expire_after or {}).items())
+        self._server_expiry_unit = server_expiry_unit
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS datapoints "
+            "(key TEXT PRIMARY KEY, identifier TEXT, value TEXT, expires REAL, accessed REAL)"
+        )
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(datapoints)")]
+        if "accessed" not in columns:
+            # caches written before eviction existed
+            self._connection.execute("ALTER TABLE datapoints ADD COLUMN accessed REAL")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS datapoints_accessed ON datapoints (accessed)")
+        self._connection.commit()
+        self._size = self._connection.execute("SELECT COUNT(*) FROM datapoints").fetchone()[0] if max_entries else 0
+        self.hits = 0
+        self.misses = 0
+        self._closed = threading.Event()
+        if compact_interval is not None:
+            threading.Thread(target=self.run_compaction, args=(compact_interval,), daemon=True).start()
+
+    @staticmethod
+    def build_key(api_function_identifier, identifier, mnemonic, properties):
+        # Cap IQ does not care about case in identifiers, mnemonics or property names and echoes spaces in
+        # property values back as "+", so all of those normalize to the same key
+        normalized_properties = sorted(
+            (str(name).upper(), str(value).replace(" ", "+")) for name, value in (properties or {}).items()
+        )
+        return json.dumps([api_function_identifier.upper(), str(identifier).upper(), mnemonic.upper(),
+                           normalized_properties])
+
+    # Returns a dictionary of key to (identifier, value) for every key that is cached and has not expired.
+    # The identifier is the one Cap IQ returned for the datapoint, which is what results are keyed on.
+    def get_many(self, keys):
+        return {key: (identifier, value) for key, (identifier, value, expires) in self.get_entries(keys).items()}
+
+    # Like get_many, with the time every datapoint expires at as the third element
+    def get_entries(self, keys):
+        found = {}
+        now = time.time()
+        keys = list(keys)
+        with self._lock:
+            for i in range(0, len(keys), self._sqlite_max_variables):
+                chunk = keys[i:i + self._sqlite_max_variables]
+                rows = self._connection.execute(
+                    "SELECT key, identifier, value, expires FROM datapoints WHERE expires > ? AND key IN ({})".format(
+                        ",".join("?" * len(chunk))),
+                    [now] + chunk
+                )
+                for key, identifier, value, expires in rows:
+                    found[key] = (identifier, json.loads(value), expires)
+            if found and self._max_entries is not None:
+                # only needed to pick what to evict
+                self._connection.executemany("UPDATE datapoints SET accessed = ? WHERE key = ?",
+                                             [(now, key) for key in found])
+                self._connection.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    # Seconds a datapoint should be cached for. cache_expiry_time is the CacheExpiryTime of the GDSSDKResponse
+    # entry, missing, empty, zero or unparsable values mean Cap IQ gave no hint.
+    def get_expire_after(self, api_function_identifier, mnemonic, cache_expiry_time=None):
+        if mnemonic.upper() in self._mnemonic_expire_after:
+            return self._mnemonic_expire_after[mnemonic.upper()]
+        if api_function_identifier.upper() in self._function_expire_after:
+            return self._function_expire_after[api_function_identifier.upper()]
+        try:
+            server_expire_after = float(cache_expiry_time) * self._server_expiry_unit
+        except (TypeError, ValueError):
+            server_expire_after = 0
+        if server_expire_after > 0:
+            return server_expire_after
+        return self._expire_after
+
+    # items is an iterable of (key, identifier, value, expire_after), expire_after is in seconds
+    def set_many(self, items):
+        now = time.time()
+        rows = [(key, identifier, json.dumps(value), now + expire_after, now)
+                for key, identifier, value, expire_after in items]
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO datapoints (key, identifier, value, expires, accessed) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._connection.commit()
+            # replaced rows are counted too, so the size is only an upper bound until evict() counts again
+            self._size += len(rows)
+            if self._max_entries is not None and self._size > self._max_entries:
+                self.evict(now)
+
+    # Deletes expired datapoints and, above max_entries, the least recently read ones. Called with the lock held.
+    def evict(self, now):
+        self._connection.execute("DELETE FROM datapoints WHERE expires <= ?", (now,))
+        self._size = self._connection.execute("SELECT COUNT(*) FROM datapoints").fetchone()[0]
+        if self._max_entries is not None and self._size > self._max_entries:
+            # evict down to 90% so that the next eviction is some writes away
+            excess = self._size - int(self._max_entries * 0.9)
+            self._connection.execute(
+                "DELETE FROM datapoints WHERE key IN (SELECT key FROM datapoints ORDER BY accessed LIMIT ?)",
+                (excess,)
+            )
+            self._size -= excess
+        self._connection.commit()
+
+    def compact(self):
+        with self._lock:
+            self.evict(time.time())
+            self._connection.execute("VACUUM")
+
+    def run_compaction(self, interval):
+        while not self._closed.wait(interval):
+            try:
+                self.compact()
+            except sqlite3.Error:
+                # closed underneath us, or busy: try again on the next interval
+                if self._closed.is_set():
+                    return
+
+    # (key, identifier, JSON encoded value, expires) of every datapoint that has not expired, see
+    # capiq.cache_snapshot.export_snapshot
+    def iter_rows(self):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT key, identifier, value, expires FROM datapoints WHERE expires > ?", (time.time(),)
+            ).fetchall()
+        return iter(rows)
+
+    def get_size(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM datapoints").fetchone()[0]
+
+    def get_stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "hit_ratio": get_hit_ratio(self.hits, self.misses)}
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM datapoints")
+            self._connection.commit()
+            self._size = 0
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            self._connection.close()
+
+
+def get_hit_ratio(hits, misses):
+    if not hits + misses:
+        return None
+    return hits / (hits + misses)
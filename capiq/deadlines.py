@@ -0,0 +1,80 @@
+import contextlib
+import contextvars
+import threading
+import time
+
+from capiq.exceptions import CiqServiceException
+
+_deadline = contextvars.ContextVar("capiq_request_deadline", default=None)
+
+
+class DeadlineExceededException(CiqServiceException):
+    pass
+
+
+class RequestCancelledException(CiqServiceException):
+    pass
+
+
+# Cancels the requests of every Deadline it is given to, from any thread
+class CancellationToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def is_cancelled(self):
+        return self._event.is_set()
+
+
+# The time a request, with all of its batches and retries, has to finish in, and the token that cancels it.
+# Batches that have not been sent when the deadline passes or the token is cancelled are not sent, and the
+# request fails with a DeadlineExceededException or RequestCancelledException.
+class Deadline:
+    def __init__(self, timeout=None, cancellation=None, clock=time.monotonic):
+        assert timeout is None or timeout >= 0
+        self._timeout = timeout
+        self._expires_at = None if timeout is None else clock() + timeout
+        self._cancellation = cancellation
+        self._clock = clock
+
+    # Seconds left before the deadline, or None if the request has no time limit
+    def remaining(self):
+        if self._expires_at is None:
+            return None
+        return max(0.0, self._expires_at - self._clock())
+
+    def check(self):
+        if self._cancellation is not None and self._cancellation.is_cancelled():
+            raise RequestCancelledException("Cap IQ request was cancelled")
+        if self._expires_at is not None and self._clock() >= self._expires_at:
+            raise DeadlineExceededException("Cap IQ request did not finish within {}s".format(self._timeout))
+
+    # Narrows a requests style (connect, read) timeout so that no single wait runs past the deadline
+    def get_timeout(self, timeout):
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        return (remaining if connect is None else min(connect, remaining),
+                remaining if read is None else min(read, remaining))
+
+
+# Sets the deadline of every request made in the block:
+#
+#   token = CancellationToken()
+#   with request_deadline(5, token):
+#       ciq_client.gdsp(...)
+@contextlib.contextmanager
+def request_deadline(timeout=None, cancellation=None):
+    deadline = Deadline(timeout, cancellation)
+    reset_token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(reset_token)
+
+
+def get_request_deadline():
+    return _deadline.get()
@@ -0,0 +1,2 @@
+class CiqServiceException(Exception):
+    pass
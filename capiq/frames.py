@@ -0,0 +1,73 @@
+from capiq.records import is_number
+from capiq.time_series_store import TimeSeriesStore
+
+try:
+    import numpy
+    import pandas
+except ImportError:
+    numpy = None
+    pandas = None
+
+
+def check_pandas():
+    if pandas is None:
+        raise ImportError("as_frame=True requires pandas, install it with pip install pandas")
+
+
+# Builds one identifiers x return keys DataFrame from a point in time result, with a row for every identifier
+# even when Cap IQ had no data for it. Columns that hold only plain decimal numbers (and None for errors) are
+# converted to floats, everything else, zero-padded codes such as CUSIPs included, stays as strings, like
+# capiq.records.compact_value does.
+def to_wide_frame(returnee, return_keys):
+    check_pandas()
+    frame = pandas.DataFrame.from_dict(returnee, orient='index')
+    frame = frame.reindex(index=list(returnee), columns=list(dict.fromkeys(return_keys)))
+    frame.index.name = "identifier"
+    for column in frame.columns:
+        if all(isinstance(value, str) and is_number(value) for value in frame[column] if pandas.notnull(value)):
+            frame[column] = pandas.to_numeric(frame[column])
+    return frame
+
+
+# Builds a long DataFrame indexed by (identifier, return_key, date) from a columnar time series result, see
+# capiq.columnar. Entries with a single value column put it in "value", otherwise the Cap IQ headers are kept.
+# The arrays of every identifier are concatenated once, nothing is built cell by cell.
+def to_long_frame(returnee):
+    check_pandas()
+    identifiers = []
+    return_keys = []
+    lengths = []
+    dates = []
+    values = {}
+    total = 0
+    for identifier, series in returnee.items():
+        for return_key, columns in series.items():
+            if columns is None:
+                continue
+            headers = list(columns.keys())
+            date_index = TimeSeriesStore.get_date_index(headers)
+            value_headers = [header for index, header in enumerate(headers) if index != date_index]
+            length = len(columns[headers[0]]) if headers else 0
+            identifiers.append(identifier)
+            return_keys.append(return_key)
+            lengths.append(length)
+            if date_index is None:
+                dates.append(numpy.full(length, numpy.datetime64('NaT'), dtype='datetime64[D]'))
+            else:
+                dates.append(columns[headers[date_index]])
+            for header in value_headers:
+                name = "value" if len(value_headers) == 1 else header
+                values.setdefault(name, []).append((total, columns[header]))
+            total += length
+    index = pandas.MultiIndex.from_arrays([
+        numpy.repeat(numpy.array(identifiers, dtype=object), lengths),
+        numpy.repeat(numpy.array(return_keys, dtype=object), lengths),
+        numpy.concatenate(dates) if dates else numpy.array([], dtype='datetime64[D]')
+    ], names=["identifier", "return_key", "date"])
+    data = {}
+    for name, parts in values.items():
+        column = numpy.full(total, numpy.nan)
+        for offset, part in parts:
+            column[offset:offset + len(part)] = part
+        data[name] = column
+    return pandas.DataFrame(data, index=index)
@@ -0,0 +1,346 @@
+import array
+import bisect
+import datetime
+import json
+import math
+import mmap
+import os
+import re
+import sqlite3
+import threading
+
+from capiq.columnar import to_day_number
+from capiq.time_series_store import TimeSeriesStore
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_epoch_ordinal = datetime.date(1970, 1, 1).toordinal()
+_decimal = re.compile(r"-?\d+(?:\.(\d+))?\Z")
+_nat = -2 ** 63  # what to_day_number returns for dates it can not read
+
+
+# A TimeSeriesStore that keeps GDST/GDSHE rows in columns on disk instead of as JSON rows in SQLite, for years
+# of history over thousands of securities. Every add() appends a segment: the dates of its rows, sorted, to
+# days.i8 as days since the epoch and every other column, one after the other, to values.f8 as float64. SQLite
+# (index.sqlite) only holds where each segment starts, the dates it spans, the series it belongs to, its
+# identifier and mnemonic, and the few values that can not be rebuilt from their float exactly (text,
+# inconsistent decimals). Nothing is ever rewritten, a later segment wins for dates it repeats.
+#
+# Both files are read through read-only memory maps, so the pages are shared by every process that opens the
+# same directory and get_columns() returns numpy arrays over them without copying when the range lies in one
+# segment. Those arrays are read-only. get() rebuilds the row strings Cap IQ sent, which is what the client
+# returns without columnar=True.
+class HistoryStore(TimeSeriesStore):
+    _sqlite_max_variables = 500
+
+    def __init__(self, path='capiq_history'):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._maps = {}  # file name -> mmap of the file, remapped once segments reach past its end
+        self._connection = sqlite3.connect(os.path.join(path, "index.sqlite"), check_same_thread=False,
+                                           isolation_level=None)
+        self._connection.executescript(
+            "CREATE TABLE IF NOT EXISTS series "
+            "(series_key TEXT PRIMARY KEY, identifier TEXT, mnemonic TEXT, headers TEXT);"
+            "CREATE INDEX IF NOT EXISTS series_identifier_mnemonic ON series (identifier, mnemonic);"
+            "CREATE TABLE IF NOT EXISTS coverage (series_key TEXT, start_date TEXT, end_date TEXT);"
+            "CREATE INDEX IF NOT EXISTS coverage_series ON coverage (series_key);"
+            "CREATE TABLE IF NOT EXISTS segments (id INTEGER PRIMARY KEY AUTOINCREMENT, series_key TEXT, "
+            "headers TEXT, first_day INTEGER, last_day INTEGER, row_offset INTEGER, rows INTEGER, "
+            "value_offset INTEGER, decimals TEXT);"
+            "CREATE INDEX IF NOT EXISTS segments_series_days ON segments (series_key, first_day, last_day);"
+            "CREATE TABLE IF NOT EXISTS texts (segment INTEGER, row INTEGER, col INTEGER, text TEXT, "
+            "PRIMARY KEY (segment, row, col));"
+        )
+
+    # Appends the rows of one GDSSDKResponse entry as a segment and marks start_date to end_date as covered, see
+    # TimeSeriesStore.add
+    def add(self, series_key, identifier, headers, rows, start_date, end_date):
+        date_index = self.get_date_index(headers)
+        if date_index is None:
+            return False
+        by_day = {}
+        for row in rows:
+            day = to_day_number(row[date_index])
+            if day != _nat:
+                by_day[day] = row
+        days = sorted(by_day)
+        rows = [by_day[day] for day in days]
+        texts = []
+        decimals = []
+        values = array.array('d')
+        for col in range(len(headers)):
+            if col == date_index:
+                for row_index, row in enumerate(rows):
+                    if row[col] != self.format_day(days[row_index]):
+                        texts.append((row_index, col, row[col]))
+                continue
+            column_decimals = None
+            for row_index, row in enumerate(rows):
+                value, column_decimals, exact = self.parse_value(row[col] if col < len(row) else None,
+                                                                 column_decimals)
+                values.append(value)
+                if not exact:
+                    texts.append((row_index, col, row[col] if col < len(row) else None))
+            decimals.append(column_decimals)
+        end_date = min(end_date, datetime.date.today() - datetime.timedelta(days=1))
+        headers_json = json.dumps(headers)
+        with self._lock:
+            # the write lock of the index also serializes appends to the column files and updates of the coverage
+            # between processes
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                if days:
+                    row_offset = self.append("days.i8", array.array('q', days))
+                    value_offset = self.append("values.f8", values)
+                    segment = self._connection.execute(
+                        "INSERT INTO segments (series_key, headers, first_day, last_day, row_offset, rows, "
+                        "value_offset, decimals) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (series_key, headers_json, days[0], days[-1], row_offset, len(days), value_offset,
+                         json.dumps(decimals))
+                    ).lastrowid
+                    self._connection.executemany(
+                        "INSERT INTO texts (segment, row, col, text) VALUES (?, ?, ?, ?)",
+                        [(segment, row_index, col, text) for row_index, col, text in texts]
+                    )
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO series (series_key, identifier, mnemonic, headers) VALUES (?, ?, ?, ?)",
+                    (series_key, identifier, self.get_mnemonic(series_key), headers_json)
+                )
+                self.add_coverage(series_key, start_date, end_date)
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return True
+
+    # Appends the items of an array to a column file and returns the index of the first one. Bytes left behind
+    # by a write that was rolled back are never referenced by a segment.
+    def append(self, name, items):
+        with open(os.path.join(self.path, name), "ab") as f:
+            offset = f.tell()
+            if offset % items.itemsize:
+                # a write that was cut short, realign
+                f.write(b"\0" * (items.itemsize - offset % items.itemsize))
+                offset = f.tell()
+            f.write(items.tobytes())
+        return offset // items.itemsize
+
+    # Returns (float, decimals, exact): the value as a float, the decimals of the column so far and whether
+    # the value comes back as the same string from the float and those decimals
+    @staticmethod
+    def parse_value(value, column_decimals):
+        if value is None:
+            return math.nan, column_decimals, True
+        match = _decimal.match(value)
+        if match is None:
+            try:
+                return float(value), column_decimals, False
+            except ValueError:
+                return math.nan, column_decimals, False
+        value_decimals = len(match.group(1) or "")
+        if column_decimals is None:
+            column_decimals = value_decimals
+        number = float(value)
+        return number, column_decimals, value_decimals == column_decimals and \
+            "{:.{}f}".format(number, column_decimals) == value
+
+    # Series keys are built by build_series_key, [function, identifier, mnemonic, properties] in JSON
+    @staticmethod
+    def get_mnemonic(series_key):
+        try:
+            return json.loads(series_key)[2]
+        except (ValueError, IndexError, TypeError):
+            return None
+
+    # Cap IQ dates are M/D/YYYY without zero padding
+    @staticmethod
+    def format_day(day):
+        date = datetime.date.fromordinal(day + _epoch_ordinal)
+        return "{d.month}/{d.day}/{d.year}".format(d=date)
+
+    def get_buffer(self, name, size):
+        buffer = self._maps.get(name)
+        if buffer is None or len(buffer) < size:
+            # the file grew, or was appended to by another process, since it was mapped. Arrays over the old map
+            # keep it alive until they are gone.
+            with open(os.path.join(self.path, name), "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[name] = buffer
+        return buffer
+
+
+    # Every segment of the series keys that holds dates between start_date and end_date, as series key ->
+    # [(segment id, row offset, rows, value offset, decimals, first row, end row)] in the order they were
+    # written. Rows are indices in days.i8, first row to end row are the ones in the range.
+    def get_segments(self, series_keys, start_date, end_date):
+        start_day = start_date.toordinal() - _epoch_ordinal
+        end_day = end_date.toordinal() - _epoch_ordinal
+        series_keys = list(series_keys)
+        found = []
+        with self._lock:
+            for i in range(0, len(series_keys), self._sqlite_max_variables):
+                chunk = series_keys[i:i + self._sqlite_max_variables]
+                found.extend(self._connection.execute(
+                    "SELECT segments.series_key, id, row_offset, rows, value_offset, decimals FROM segments "
+                    "JOIN series ON segments.series_key = series.series_key AND segments.headers = series.headers "
+                    "WHERE segments.series_key IN ({}) AND last_day >= ? AND first_day <= ? ORDER BY id".format(
+                        ",".join("?" * len(chunk))),
+                    chunk + [start_day, end_day]
+                ))
+            if not found:
+                return {}
+            self.get_buffer("days.i8", 8 * max(row[2] + row[3] for row in found))
+            days = self.get_days()
+            self.get_buffer("values.f8", 8 * max(row[4] + row[3] * len(json.loads(row[5])) for row in found))
+        segments = {}
+        for series_key, segment_id, row_offset, rows, value_offset, decimals in found:
+            first = bisect.bisect_left(days, start_day, row_offset, row_offset + rows)
+            end = bisect.bisect_right(days, end_day, row_offset, row_offset + rows)
+            if first < end:
+                segments.setdefault(series_key, []).append(
+                    (segment_id, row_offset, rows, value_offset, json.loads(decimals), first, end))
+        days.release()
+        return segments
+
+    def get_days(self):
+        return memoryview(self._maps["days.i8"]).cast('q')
+
+    def get_values(self):
+        return memoryview(self._maps["values.f8"]).cast('d')
+
+    # (segment, row) of every date in the segments in date order, later segments winning for the same date
+    @staticmethod
+    def merge_segments(segments, days):
+        if all(days[segments[i - 1][6] - 1] < days[segments[i][5]] for i in range(1, len(segments))):
+            return [(segment, row) for segment in segments for row in range(segment[5], segment[6])]
+        by_day = {}
+        for segment in segments:
+            for row in range(segment[5], segment[6]):
+                by_day[days[row]] = (segment, row)
+        return [by_day[day] for day in sorted(by_day)]
+
+    def get_series(self, series_keys):
+        series_keys = list(series_keys)
+        series = {}
+        with self._lock:
+            for i in range(0, len(series_keys), self._sqlite_max_variables):
+                chunk = series_keys[i:i + self._sqlite_max_variables]
+                for series_key, identifier, headers in self._connection.execute(
+                        "SELECT series_key, identifier, headers FROM series WHERE series_key IN ({})".format(
+                            ",".join("?" * len(chunk))), chunk):
+                    series[series_key] = (identifier, json.loads(headers))
+        return series
+
+    # (segment id, row in segment, column) -> text of the values that are kept as text
+    def get_texts(self, segment_ids):
+        segment_ids = list(segment_ids)
+        texts = {}
+        with self._lock:
+            for i in range(0, len(segment_ids), self._sqlite_max_variables):
+                chunk = segment_ids[i:i + self._sqlite_max_variables]
+                for segment_id, row, col, text in self._connection.execute(
+                        "SELECT segment, row, col, text FROM texts WHERE segment IN ({})".format(
+                            ",".join("?" * len(chunk))), chunk):
+                    texts[(segment_id, row, col)] = text
+        return texts
+
+    # Same as TimeSeriesStore.get, the rows are rebuilt as the strings Cap IQ sent
+    def get(self, series_key, start_date, end_date):
+        series = self.get_series([series_key]).get(series_key)
+        if series is None:
+            return None, None, []
+        identifier, headers = series
+        segments = self.get_segments([series_key], start_date, end_date).get(series_key)
+        if not segments:
+            return identifier, headers, []
+        date_index = self.get_date_index(headers)
+        value_columns = [col for col in range(len(headers)) if col != date_index]
+        texts = self.get_texts(segment[0] for segment in segments)
+        days = self.get_days()
+        values = self.get_values()
+        rows = []
+        for (segment_id, row_offset, segment_rows, value_offset, decimals, first, end), row in \
+                self.merge_segments(segments, days):
+            row_in_segment = row - row_offset
+            rebuilt = [None] * len(headers)
+            rebuilt[date_index] = self.format_day(days[row])
+            for value_col, col in enumerate(value_columns):
+                value = values[value_offset + value_col * segment_rows + row_in_segment]
+                if value == value:
+                    rebuilt[col] = "{:.{}f}".format(value, decimals[value_col] or 0)
+            for col in range(len(headers)):
+                if (segment_id, row_in_segment, col) in texts:
+                    rebuilt[col] = texts[(segment_id, row_in_segment, col)]
+            rows.append(rebuilt)
+        days.release()
+        values.release()
+        return identifier, headers, rows
+
+    # Same as TimeSeriesStore.get_columns. The arrays are read-only views of the column files when the range
+    # lies in a single segment and copies otherwise.
+    def get_columns(self, series_key, start_date, end_date):
+        return self.get_columns_many([series_key], start_date, end_date).get(series_key, (None, None, None))
+
+    # series key -> (identifier, headers, columns) of every series that was stored, see get_columns
+    def get_columns_many(self, series_keys, start_date, end_date):
+        if numpy is None:
+            raise ImportError("columnar results require numpy, install it with pip install numpy")
+        series_keys = list(series_keys)
+        series = self.get_series(series_keys)
+        segments = self.get_segments(series, start_date, end_date)
+        result = {}
+        if segments:
+            days = numpy.frombuffer(self._maps["days.i8"], dtype=numpy.int64)
+            values = numpy.frombuffer(self._maps["values.f8"], dtype=numpy.float64)
+        for series_key, (identifier, headers) in series.items():
+            if series_key not in segments:
+                result[series_key] = (identifier, headers, None)
+                continue
+            date_index = self.get_date_index(headers)
+            series_segments = segments[series_key]
+            if len(series_segments) == 1:
+                segment_id, row_offset, segment_rows, value_offset, decimals, first, end = series_segments[0]
+                day_slice = days[first:end]
+                value_slices = [values[start:start + end - first] for start in
+                                range(value_offset + first - row_offset, value_offset + segment_rows * len(decimals),
+                                      segment_rows)]
+            else:
+                merged = self.merge_segments(series_segments, days)
+                day_slice = days[[row for segment, row in merged]]
+                value_slices = [values[[segment[3] + value_col * segment[2] + row - segment[1]
+                                        for segment, row in merged]]
+                                for value_col in range(len(headers) - 1)]
+            columns = {}
+            value_slices = iter(value_slices)
+            for col, header in enumerate(headers):
+                if col == date_index:
+                    columns[header] = day_slice.view('datetime64[D]')
+                else:
+                    columns[header] = next(value_slices)
+            result[series_key] = (identifier, headers, columns)
+        return result
+
+    # Columns of one mnemonic for many identifiers at once, as identifier -> columns for every identifier that
+    # has rows between start_date and end_date. properties are those of the request without the date range,
+    # {"FREQUENCY": "D"} for a daily GDST for example.
+    def query(self, api_function_identifier, identifiers, mnemonic, start_date, end_date, properties=None):
+        series_keys = dict((self.build_series_key(api_function_identifier, identifier, mnemonic, properties or {}),
+                            identifier) for identifier in identifiers)
+        return dict((series_keys[series_key], columns) for series_key, (stored_identifier, headers, columns) in
+                    self.get_columns_many(series_keys, start_date, end_date).items() if columns is not None)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+            for buffer in self._maps.values():
+                try:
+                    buffer.close()
+                except BufferError:
+                    # still read by arrays handed out, closed once they are gone
+                    pass
+            self._maps = {}
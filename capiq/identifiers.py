@@ -0,0 +1,116 @@
+import re
+import sqlite3
+import threading
+
+from capiq.planning import canonicalize_identifier
+
+_ciq_id = re.compile(r"IQT?\d+\Z")
+
+
+# Maps every identifier a security is known by (tickers in either exchange order, CUSIP, ISIN, SEDOL...) to the
+# S&P Capital IQ ID of its trading item, IQT<number>, so that requests can be sent, deduplicated and cached on
+# one identifier per security. Trading items and not companies, since every listing, share class and bond of a
+# company shares its IQ_COMPANY_ID but not its prices. Aliases are stored canonicalized, see
+# capiq.planning.canonicalize_identifier, in SQLite and in memory once they have been read.
+#
+# The client fills the index itself by asking Cap IQ for the resolve_mnemonic of identifiers it has not seen
+# yet. Identifiers without a trading item, such as companies or most bonds, stay unresolved and are sent as
+# they are.
+class IdentifierIndex:
+    resolve_mnemonic = "IQ_TRADING_ITEM_CIQID"
+
+    def __init__(self, path='capiq_identifiers.sqlite'):
+        self._lock = threading.Lock()
+        self._known = {}  # canonical alias -> CIQ ID, for aliases read or written by this process
+        self._unresolved = set()  # canonical aliases Cap IQ had no CIQ ID for
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS identifiers (alias TEXT PRIMARY KEY, ciq_id TEXT)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS identifiers_ciq_id ON identifiers (ciq_id)")
+        # aliases resolved to their company by earlier versions would merge distinct securities
+        self._connection.execute("DELETE FROM identifiers WHERE ciq_id NOT LIKE 'IQT%'")
+        self._connection.commit()
+
+    @staticmethod
+    def build_alias(identifier):
+        return canonicalize_identifier(identifier)
+
+    # Cap IQ may answer with the bare number, trading item IDs are written IQT<number>
+    @staticmethod
+    def format_ciq_id(value):
+        value = str(value).strip().upper()
+        if value.isdigit():
+            return "IQT" + value
+        return value
+
+    @staticmethod
+    def is_ciq_id(identifier):
+        return _ciq_id.match(canonicalize_identifier(identifier)) is not None
+
+    # Returns a dictionary of identifier to CIQ ID for every identifier that is a CIQ ID or a known alias
+    def get_many(self, identifiers):
+        found = {}
+        missing = {}  # canonical alias -> [identifier]
+        with self._lock:
+            for identifier in identifiers:
+                alias = self.build_alias(identifier)
+                if _ciq_id.match(alias):
+                    found[identifier] = alias
+                elif alias in self._known:
+                    found[identifier] = self._known[alias]
+                else:
+                    missing.setdefault(alias, []).append(identifier)
+            aliases = list(missing)
+            for i in range(0, len(aliases), 500):
+                chunk = aliases[i:i + 500]
+                rows = self._connection.execute(
+                    "SELECT alias, ciq_id FROM identifiers WHERE alias IN ({})".format(",".join("?" * len(chunk))),
+                    chunk
+                )
+                for alias, ciq_id in rows:
+                    self._known[alias] = ciq_id
+                    for identifier in missing[alias]:
+                        found[identifier] = ciq_id
+        return found
+
+    # Identifiers that are neither known nor known to be unresolvable, one per alias
+    def get_unknown(self, identifiers):
+        found = self.get_many(identifiers)
+        unknown = {}  # canonical alias -> the first identifier passed for it
+        with self._lock:
+            for identifier in identifiers:
+                alias = self.build_alias(identifier)
+                if identifier not in found and alias not in self._unresolved:
+                    unknown.setdefault(alias, identifier)
+        return list(unknown.values())
+
+    # items is an iterable of (identifier, CIQ ID)
+    def add_many(self, items):
+        rows = [(self.build_alias(identifier), self.format_ciq_id(ciq_id)) for identifier, ciq_id in items]
+        with self._lock:
+            self._connection.executemany("INSERT OR REPLACE INTO identifiers (alias, ciq_id) VALUES (?, ?)", rows)
+            self._connection.commit()
+            self._known.update(rows)
+
+    # Remembers, for the life of the index, identifiers Cap IQ could not resolve so that they are not asked for
+    # again on every request
+    def add_unresolved(self, identifiers):
+        with self._lock:
+            self._unresolved.update(self.build_alias(identifier) for identifier in identifiers)
+
+    # Every alias known for a CIQ ID
+    def get_aliases(self, ciq_id):
+        with self._lock:
+            rows = self._connection.execute("SELECT alias FROM identifiers WHERE ciq_id = ? ORDER BY alias",
+                                            (self.format_ciq_id(ciq_id),))
+            return [alias for alias, in rows]
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM identifiers")
+            self._connection.commit()
+            self._known = {}
+            self._unresolved = set()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
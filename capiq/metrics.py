@@ -0,0 +1,124 @@
+import bisect
+import contextlib
+import threading
+import time
+
+# Shared by every client without metrics, so that timing a phase costs one attribute check when disabled
+no_timing = contextlib.nullcontext()
+
+_default_buckets = {
+    "phase_seconds": (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    "batch_size": (1, 5, 10, 25, 50, 100, 250, 500),
+    "request_bytes": (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    "response_bytes": (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+}
+
+
+# The hooks the client calls while it works. Subclass it to forward the measurements to statsd, Prometheus
+# or any other metrics system.
+#
+# Counters the client increments:
+#   posts              batches POSTed to GDS
+#   datapoints         input requests sent, the quota consumed
+#   datapoints_saved   duplicate input requests that were answered from another one instead of being sent
+#   cache_hits         datapoints answered from the datapoint cache
+#   cache_misses       datapoints the cache did not have
+#   entry_errors       response entries with an ErrMsg, labelled with the mnemonic
+#   batch_errors       batches that failed, labelled with the exception type
+#   retries            batches sent again by the retry policy
+#
+# Values the client observes:
+#   phase_seconds      labelled with the phase: serialize (json.dumps), network (the POST), decode
+#                      (response.json()) and map (matching entries to return keys)
+#   batch_size         input requests per batch
+#   request_bytes      size of the POSTed body
+#   response_bytes     size of the response body, when the transport exposes it
+class ClientMetrics:
+    def increment(self, name, amount=1, **labels):
+        pass
+
+    def observe(self, name, value, **labels):
+        pass
+
+    @contextlib.contextmanager
+    def time(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("phase_seconds", time.perf_counter() - start, phase=phase)
+
+
+# Keeps counters and fixed bucket histograms in memory. snapshot() returns them as plain dictionaries and
+# to_prometheus() in the Prometheus text format.
+class InMemoryMetrics(ClientMetrics):
+    def __init__(self, buckets=None):
+        self._buckets = dict(_default_buckets)
+        self._buckets.update(buckets or {})
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> count
+        self._histograms = {}  # (name, labels) -> [bucket counts..., count of values above the last bucket, sum]
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        buckets = self._buckets.get(name, ())
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(buckets) + 2)
+            histogram[bisect.bisect_left(buckets, value)] += 1
+            histogram[-1] += value
+
+    def get_counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+
+    # Returns {"counters": [...], "histograms": [...]} where every histogram has cumulative bucket counts like
+    # Prometheus histograms do, with float("inf") as the last bucket
+    def snapshot(self):
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = []
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                bounds = list(self._buckets.get(name, ())) + [float("inf")]
+                cumulative = []
+                total = 0
+                for count in histogram[:-1]:
+                    total += count
+                    cumulative.append(total)
+                histograms.append({"name": name, "labels": dict(labels), "buckets": list(zip(bounds, cumulative)),
+                                   "count": total, "sum": histogram[-1]})
+        return {"counters": counters, "histograms": histograms}
+
+    def to_prometheus(self, prefix="capiq_"):
+        snapshot = self.snapshot()
+        lines = []
+        for counter in snapshot["counters"]:
+            lines.append("{}{}_total{} {}".format(prefix, counter["name"], format_labels(counter["labels"]),
+                                                   counter["value"]))
+        for histogram in snapshot["histograms"]:
+            name = prefix + histogram["name"]
+            for bound, count in histogram["buckets"]:
+                labels = dict(histogram["labels"], le="+Inf" if bound == float("inf") else repr(bound))
+                lines.append("{}_bucket{} {}".format(name, format_labels(labels), count))
+            lines.append("{}_count{} {}".format(name, format_labels(histogram["labels"]), histogram["count"]))
+            lines.append("{}_sum{} {}".format(name, format_labels(histogram["labels"]), histogram["sum"]))
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(name, str(value).replace('"', '\\"'))
+                          for name, value in sorted(labels.items())) + "}"
@@ -0,0 +1,61 @@
+from capiq.datapoint_cache import DatapointCache
+
+# Exchange codes Cap IQ uses in tickers. An identifier written EXCHANGE:TICKER with one of these in front is the
+# same security as TICKER:EXCHANGE.
+EXCHANGES = frozenset([
+    "AIM", "AMEX", "ARCA", "ASX", "ATSE", "BATS", "BIT", "BME", "BOVESPA", "BMV", "BSE", "CATS", "CBOE", "CPSE",
+    "DB", "ENXTAM", "ENXTBR", "ENXTLS", "ENXTPA", "HLSE", "HOSE", "IDX", "ISE", "JSE", "KLSE", "KOSDAQ", "KOSE",
+    "LSE", "NASDAQ", "NASDAQCM", "NASDAQGM", "NASDAQGS", "NSEI", "NYSE", "NYSEAM", "NYSEARCA", "NZSE", "OB", "OM",
+    "OTCPK", "SASE", "SEHK", "SET", "SGX", "SHSE", "SWX", "SZSE", "TASE", "TSE", "TSX", "TSXV", "TWSE", "WBAG",
+    "WSE", "XTRA",
+])
+
+
+# Identifiers are not case sensitive, Cap IQ echoes tickers without an exchange back as "TICKER:" and
+# EXCHANGE:TICKER is turned around into TICKER:EXCHANGE
+def canonicalize_identifier(identifier):
+    identifier = str(identifier).strip().upper().rstrip(":")
+    first, separator, second = identifier.partition(":")
+    if separator and first in EXCHANGES and second and second not in EXCHANGES:
+        return second + ":" + first
+    return identifier
+
+
+# The key two input requests for the same datapoint share, whatever case, exchange order or property
+# spelling they use
+def build_plan_key(input_request):
+    return DatapointCache.build_key(input_request["function"], canonicalize_identifier(input_request["identifier"]),
+                                    input_request["mnemonic"], input_request["properties"])
+
+
+# Collapses the input requests of a make_request call into the requests that have to go over the wire. The
+# first input request of every datapoint is sent, every later one is a duplicate that gets a copy of its
+# response entry, under its own return key and, when it spelled the identifier differently, under its own
+# identifier.
+class RequestPlan:
+    def __init__(self, input_requests):
+        self.wire_requests = []
+        self.wire_indices = []  # the index in input_requests of every wire request
+        self.duplicates = []  # (index in input_requests, index in wire_requests) of every duplicate
+        wire_index_of = {}
+        for index, input_request in enumerate(input_requests):
+            key = build_plan_key(input_request)
+            wire_index = wire_index_of.get(key)
+            if wire_index is None:
+                wire_index_of[key] = len(self.wire_requests)
+                self.wire_requests.append(input_request)
+                self.wire_indices.append(index)
+            else:
+                self.duplicates.append((index, wire_index))
+
+    # Datapoints the plan does not send
+    @property
+    def saved(self):
+        return len(self.duplicates)
+
+    # wire index -> [index in input_requests of every duplicate]
+    def get_duplicates_by_wire_index(self):
+        duplicates = {}
+        for index, wire_index in self.duplicates:
+            duplicates.setdefault(wire_index, []).append(index)
+        return duplicates
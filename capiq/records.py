@@ -0,0 +1,217 @@
+import array
+import copy
+import re
+import sys
+from collections.abc import Mapping, Sequence
+
+# Cap IQ sends every value as a string. Only plain decimal numbers are converted, so that identifiers, names and
+# values such as "NaN" or "1_000" that float() would also accept stay text. Digits with a leading zero are codes
+# (CUSIPs, SIC and postal codes...) rather than numbers, and stay text too.
+_number = re.compile(r"[+-]?(?:(?:0|[1-9]\d*)(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?\Z")
+_nan = float('nan')
+
+
+# Converts a Cap IQ value once: numbers become floats, text is interned so that repeated values (currencies,
+# dates, company names) share one string, and missing values become None.
+def compact_value(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        if _number.match(value):
+            return float(value)
+        return sys.intern(value)
+    return value
+
+
+# Whether a Cap IQ value is a plain decimal number, see _number
+def is_number(value):
+    return _number.match(value) is not None
+
+
+# The rows of a GDST/GDSHE entry stored by column. Columns where most values are numbers are kept in a float
+# array, the few values that are not numbers in a {row index: text} dictionary next to it, every other column
+# is a tuple of interned strings. Reads like the list of rows it replaces, with the values converted.
+class SeriesRows(Sequence):
+    __slots__ = ("headers", "_columns", "_text")
+
+    def __init__(self, headers, rows):
+        self.headers = tuple(sys.intern(header) for header in headers)
+        rows = list(rows)
+        self._columns = []
+        self._text = []
+        for index in range(len(self.headers)):
+            values = [compact_value(row[index]) if index < len(row) else None for row in rows]
+            text = {i: value for i, value in enumerate(values) if isinstance(value, str)}
+            if len(text) * 2 < len(values):
+                self._columns.append(array.array('d', (_nan if value is None or i in text else value
+                                                       for i, value in enumerate(values))))
+                self._text.append(text or None)
+            else:
+                self._columns.append(tuple(values))
+                self._text.append(None)
+
+    # The values of one header, as a float array or a tuple. Rows without a number are NaN in a float array.
+    def column(self, header):
+        return self._columns[self.headers.index(header)]
+
+    def __len__(self):
+        return len(self._columns[0]) if self._columns else 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        row = []
+        for column, text in zip(self._columns, self._text):
+            value = column[index]
+            if text is not None and index in text:
+                value = text[index]
+            elif value != value:
+                value = None
+            row.append(value)
+        return row
+
+    def __eq__(self, other):
+        if isinstance(other, (SeriesRows, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return "SeriesRows({!r}, {} rows)".format(list(self.headers), len(self))
+
+
+# One returned datapoint. value is a number, interned text or None for point in time functions, SeriesRows for
+# GDST/GDSHE, or the dictionary of numpy arrays with columnar=True.
+class Datapoint:
+    __slots__ = ("identifier", "mnemonic", "return_key", "value")
+
+    def __init__(self, identifier, mnemonic, return_key, value):
+        self.identifier = identifier
+        self.mnemonic = mnemonic
+        self.return_key = return_key
+        self.value = value
+
+    def __repr__(self):
+        return "Datapoint({!r}, {!r}, {!r}, {!r})".format(self.identifier, self.mnemonic, self.return_key,
+                                                          self.value)
+
+
+# The datapoints of one identifier. fields is a tuple of (mnemonic, return key) that is shared by every identifier
+# of a request, and data a float array as long as every value is a number or None (NaN), a list otherwise.
+# Reads like the {return_key: value} dictionary it replaces.
+class IdentifierRecords(Mapping):
+    __slots__ = ("identifier", "fields", "data")
+
+    def __init__(self, identifier):
+        self.identifier = identifier
+        self.fields = ()
+        self.data = array.array('d')
+
+    def find(self, return_key):
+        for index, (mnemonic, key) in enumerate(self.fields):
+            if key == return_key:
+                return index
+        return None
+
+    def get_value(self, index):
+        value = self.data[index]
+        if isinstance(self.data, array.array) and value != value:
+            return None
+        return value
+
+    def set_value(self, index, value):
+        if isinstance(self.data, array.array):
+            if value is None:
+                value = _nan
+            elif not isinstance(value, float):
+                self.data = [self.get_value(i) for i in range(len(self.data))]
+        if index == len(self.data):
+            self.data.append(value)
+        else:
+            self.data[index] = value
+
+    def datapoints(self):
+        for index, (mnemonic, return_key) in enumerate(self.fields):
+            yield Datapoint(self.identifier, mnemonic, return_key, self.get_value(index))
+
+    def __getitem__(self, return_key):
+        index = self.find(return_key)
+        if index is None:
+            raise KeyError(return_key)
+        return self.get_value(index)
+
+    def __iter__(self):
+        return (return_key for mnemonic, return_key in self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+# The result of make_request with compact=True. It reads like the usual {identifier: {return_key: value}}
+# dictionary, so existing callers keep working, but holds one IdentifierRecords per identifier instead of a
+# dictionary and a string per datapoint. datapoints() yields every value as a Datapoint and to_dict() builds the
+# nested dictionary.
+class CompactResult(Mapping):
+    def __init__(self):
+        self._records = {}  # identifier to IdentifierRecords
+        self._fields = {}  # every fields tuple once, so that identifiers with the same fields share it
+
+    def add_identifier(self, identifier):
+        records = self._records.get(identifier)
+        if records is None:
+            identifier = sys.intern(identifier)
+            records = self._records[identifier] = IdentifierRecords(identifier)
+        return records
+
+    # headers are the Cap IQ headers of value when it is a list of rows
+    def add(self, identifier, mnemonic, return_key, value, headers=()):
+        records = self.add_identifier(identifier)
+        if isinstance(value, list):
+            value = SeriesRows(headers or (), value)
+        elif not isinstance(value, (dict, SeriesRows)):
+            value = compact_value(value)
+        index = records.find(return_key)
+        if index is None:
+            if isinstance(return_key, str):
+                return_key = sys.intern(return_key)
+            fields = records.fields + ((sys.intern(mnemonic), return_key),)
+            records.fields = self._fields.setdefault(fields, fields)
+            index = len(fields) - 1
+        records.set_value(index, value)
+
+    # Keys every identifier on the identifiers get_identifiers(identifier) returns instead, in the same order
+    def rekey(self, get_identifiers):
+        records = {}
+        for identifier, identifier_records in self._records.items():
+            for i, new_identifier in enumerate(get_identifiers(identifier)):
+                new_identifier = sys.intern(new_identifier)
+                new_records = records[new_identifier] = IdentifierRecords(new_identifier)
+                new_records.fields = identifier_records.fields
+                new_records.data = identifier_records.data if i == 0 else copy.copy(identifier_records.data)
+        self._records = records
+
+    # Every Datapoint, identifier by identifier
+    def datapoints(self):
+        for records in self._records.values():
+            yield from records.datapoints()
+
+    def to_dict(self):
+        return {identifier: {return_key: list(value) if isinstance(value, SeriesRows) else value
+                             for return_key, value in records.items()}
+                for identifier, records in self._records.items()}
+
+    def __getitem__(self, identifier):
+        return self._records[identifier]
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __repr__(self):
+        return "CompactResult({!r})".format(self.to_dict())
@@ -0,0 +1,174 @@
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+# Counters of the datapoints requested today, shared by every client, process or host that uses the same
+# backend. increment atomically adds to today's count and returns the new total, get returns today's total.
+# Counts start again from zero every day.
+class RequestCounter:
+    def increment(self, count):
+        raise NotImplementedError
+
+    def get(self):
+        return self.increment(0)
+
+    # Writes counts that are only held locally, for counters that buffer their increments
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def today():
+        return str(datetime.datetime.now().date())
+
+
+# Keeps the count in the "date,count" file the client has always used, locked with flock so that
+# processes on one host can share it. Without fcntl (Windows) it is only safe between threads.
+class FileRequestCounter(RequestCounter):
+    def __init__(self, path='./request_count_cache'):
+        self._path = os.path.abspath(path)
+        self._lock = threading.Lock()
+
+    def increment(self, count):
+        with self._lock, open(self._path, "a+") as cache_file:
+            if fcntl is not None:
+                fcntl.flock(cache_file, fcntl.LOCK_EX)
+            cache_file.seek(0)
+            cache_data = cache_file.readline().split(",")
+            today = self.today()
+            total = count
+            if cache_data[0] == today and len(cache_data) > 1:
+                total += int(cache_data[1])
+            if count or cache_data[0] != today:
+                cache_file.seek(0)
+                cache_file.truncate()
+                cache_file.write("{date},{request_count}".format(date=today, request_count=total))
+                cache_file.flush()
+            return total
+
+
+# Keeps one row per day in SQLite. Increments run in an immediate transaction, so processes on one host
+# can share the database file.
+class SQLiteRequestCounter(RequestCounter):
+    def __init__(self, path='capiq_request_count.sqlite', timeout=30):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS request_counts (day TEXT PRIMARY KEY, count INTEGER)")
+
+    def increment(self, count):
+        today = self.today()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.execute("INSERT OR IGNORE INTO request_counts (day, count) VALUES (?, 0)", (today,))
+                self._connection.execute("UPDATE request_counts SET count = count + ? WHERE day = ?", (count, today))
+                total = self._connection.execute("SELECT count FROM request_counts WHERE day = ?",
+                                                 (today,)).fetchone()[0]
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+        return total
+
+    def get(self):
+        with self._lock:
+            row = self._connection.execute("SELECT count FROM request_counts WHERE day = ?",
+                                           (self.today(),)).fetchone()
+        return row[0] if row else 0
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+# Keeps the count in a networked key/value store shared by several hosts. store is any client with
+# atomic incrby(key, amount) and get(key) methods, such as a redis.Redis client. Counts are kept under
+# one key per day, and expire after two days when the store has an expire(key, seconds) method.
+class RemoteRequestCounter(RequestCounter):
+    _expire_after = 2 * 86400
+
+    def __init__(self, store, key_prefix='capiq:request_count'):
+        self._store = store
+        self._key_prefix = key_prefix
+
+    def build_key(self):
+        return "{}:{}".format(self._key_prefix, self.today())
+
+    def increment(self, count):
+        key = self.build_key()
+        total = int(self._store.incrby(key, count))
+        if total == count and hasattr(self._store, "expire"):
+            # first increment of the day
+            self._store.expire(key, self._expire_after)
+        return total
+
+    def get(self):
+        return int(self._store.get(self.build_key()) or 0)
+
+
+# A store with the incrby/get/expire interface RemoteRequestCounter uses, kept in memory. Stands in for
+# the networked store in tests and single process setups.
+class LocalCounterStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def incrby(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+            return self._values[key]
+
+    def get(self, key):
+        with self._lock:
+            return self._values.get(key)
+
+    def expire(self, key, seconds):
+        pass
+
+
+# Adds up increments locally and sends them to the backend counter once flush_every datapoints are
+# pending or flush_interval seconds have passed, so that busy workers do not make a round trip to the
+# shared store for every batch. Totals are the last total read from the backend plus the pending count,
+# so they can lag behind other workers by up to one flush each.
+class BufferedRequestCounter(RequestCounter):
+    def __init__(self, counter, flush_every=100, flush_interval=1.0, clock=time.monotonic):
+        assert flush_every > 0
+        self._counter = counter
+        self._flush_every = flush_every
+        self._flush_interval = flush_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._total = None
+        self._last_flush = clock()
+
+    def increment(self, count):
+        with self._lock:
+            self._pending += count
+            if (self._total is None or abs(self._pending) >= self._flush_every or
+                    self._clock() - self._last_flush >= self._flush_interval):
+                self._flush()
+            return self._total + self._pending
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._total = self._counter.increment(self._pending)
+        self._pending = 0
+        self._last_flush = self._clock()
+
+    def close(self):
+        self.flush()
+        self._counter.close()
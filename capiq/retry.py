@@ -0,0 +1,117 @@
+import asyncio
+import random
+import threading
+import time
+
+import requests
+
+from capiq.deadlines import DeadlineExceededException, RequestCancelledException
+from capiq.exceptions import CiqServiceException
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+_retry_exceptions = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                     requests.exceptions.ChunkedEncodingError, ConnectionError, TimeoutError, asyncio.TimeoutError)
+if aiohttp is not None:
+    _retry_exceptions += (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+
+
+class CircuitOpenException(CiqServiceException):
+    pass
+
+
+# Decides which failures of a batch are retried and how long to wait before each retry.
+#
+# Batches that fail with a connection error, a timeout or one of retry_statuses are sent again. Entries of a
+# response whose ErrMsg contains one of transient_errors (case insensitive) are sent again on their own, so
+# the entries that succeeded are not requested twice. A batch is sent at most max_attempts times. Waits
+# grow exponentially from backoff up to max_backoff seconds, with full jitter so that clients retrying the
+# same outage spread out.
+class RetryPolicy:
+    def __init__(self, max_attempts=3, backoff=0.5, max_backoff=30, jitter=True, retry_statuses=(500, 502, 503, 504),
+                 transient_errors=("timeout", "timed out", "temporarily unavailable", "try again"),
+                 sleep=time.sleep):
+        assert max_attempts >= 1
+        assert backoff >= 0
+        self._max_attempts = max_attempts
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._jitter = jitter
+        self._retry_statuses = frozenset(retry_statuses)
+        self._transient_errors = tuple(error.lower() for error in transient_errors)
+        self._sleep = sleep
+
+    # attempt counts from 0 for the first send
+    def can_retry(self, attempt):
+        return attempt + 1 < self._max_attempts
+
+    def is_transient_error(self, err_msg):
+        if not err_msg:
+            return False
+        err_msg = str(err_msg).lower()
+        return any(error in err_msg for error in self._transient_errors)
+
+    def is_retryable_exception(self, e):
+        if isinstance(e, (CircuitOpenException, DeadlineExceededException, RequestCancelledException)):
+            return False
+        if isinstance(e, CiqServiceException):
+            return self.is_transient_error(str(e))
+        # requests.HTTPError has the response, aiohttp.ClientResponseError the status
+        status = getattr(getattr(e, "response", None), "status_code", None) or getattr(e, "status", None)
+        if status is not None:
+            return status in self._retry_statuses
+        return isinstance(e, _retry_exceptions)
+
+    def get_backoff(self, attempt):
+        backoff = min(self._max_backoff, self._backoff * 2 ** attempt)
+        if self._jitter:
+            return random.uniform(0, backoff)
+        return backoff
+
+    def sleep(self, seconds):
+        self._sleep(seconds)
+
+
+# Stops sending batches while the endpoint is down. After failure_threshold consecutive transport failures
+# the circuit opens and batches fail straight away with a CircuitOpenException. After reset_timeout seconds
+# one trial batch is let through: the circuit closes again if it succeeds, and stays open for another
+# reset_timeout if it fails.
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        assert failure_threshold >= 1
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None
+
+    def before_request(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._trial_running or self._clock() - self._opened_at < self._reset_timeout:
+                raise CircuitOpenException("Cap IQ circuit is open after {} consecutive failures".format(
+                    self._failures))
+            self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self._failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_running = False
@@ -0,0 +1,179 @@
+import contextlib
+import contextvars
+import datetime
+import heapq
+import itertools
+import threading
+import time
+
+from capiq.exceptions import CiqServiceException
+
+HIGH_PRIORITY = 0
+NORMAL_PRIORITY = 5
+LOW_PRIORITY = 10
+
+_priority = contextvars.ContextVar("capiq_request_priority", default=NORMAL_PRIORITY)
+
+
+class QuotaExceededException(CiqServiceException):
+    pass
+
+
+# Sets the priority of every request made in the block, lower numbers are more important:
+#
+#   with request_priority(HIGH_PRIORITY):
+#       ciq_client.gdsp(...)
+@contextlib.contextmanager
+def request_priority(priority):
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def get_request_priority():
+    return _priority.get()
+
+
+# Admits batches before they are sent to GDS, so that the daily datapoint budget and the rate limit are
+# enforced on our side instead of by the server rejecting calls.
+#
+# Waiting batches are admitted in priority order through a token bucket of requests_per_second POSTs with
+# room for burst POSTs at once. Datapoints are taken from the daily budget when a batch is admitted. The last
+# reserve fraction of the budget is kept for batches with a priority of reserve_priority or more important,
+# less important batches are refused with a QuotaExceededException once only the reserve is left, so that
+# backfills can not starve critical requests.
+#
+# With a counter from capiq.request_counter the budget is shared by every scheduler using the same backend:
+# admitted datapoints are added to the counter, and taken back off it if the addition overshot the budget.
+class RequestScheduler:
+    def __init__(self, daily_budget=10000, requests_per_second=None, burst=1, reserve=0.1,
+                 reserve_priority=HIGH_PRIORITY, clock=time.monotonic, counter=None):
+        assert daily_budget > 0
+        assert requests_per_second is None or requests_per_second > 0
+        assert burst >= 1
+        assert 0 <= reserve < 1
+        self._daily_budget = daily_budget
+        self._requests_per_second = requests_per_second
+        self._burst = burst
+        self._reserve = int(daily_budget * reserve)
+        self._reserve_priority = reserve_priority
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._waiting = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._tokens = burst
+        self._last_refill = clock()
+        self._counter = counter
+        self._day = datetime.date.today()
+        self._used = 0
+
+    def has_counter(self):
+        return self._counter is not None
+
+    # Whether datapoints admitted by the scheduler are already added to counter
+    def shares_counter(self, counter):
+        return counter is not None and counter is self._counter
+
+    def get_used(self):
+        with self._condition:
+            self._refresh_used()
+            return self._used
+
+    def get_remaining(self):
+        with self._condition:
+            self._refresh_used()
+            return self._daily_budget - self._used
+
+    # Counts datapoints that were requested without going through acquire, such as the cached request_count
+    def add_used(self, cost):
+        with self._condition:
+            self._roll_day()
+            self._used += cost
+            if self._counter is not None:
+                self._used = self._counter.increment(cost)
+
+    # Blocks until a batch of cost datapoints may be sent. Raises QuotaExceededException if the budget does
+    # not allow it at this priority, or if it could not be admitted within timeout seconds.
+    def acquire(self, cost, priority=NORMAL_PRIORITY, timeout=None):
+        deadline = None if timeout is None else self._clock() + timeout
+        with self._condition:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    self._check_budget(cost, priority)
+                    wait = None
+                    if self._waiting[0] == ticket:
+                        wait = self._take_token()
+                        if wait == 0:
+                            self._reserve_budget(cost, priority)
+                            return
+                    if deadline is not None:
+                        remaining = deadline - self._clock()
+                        if remaining <= 0:
+                            raise QuotaExceededException("Request was not admitted within {}s".format(timeout))
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._condition.wait(wait)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+    # Gives back datapoints of a batch that was admitted but never reached GDS
+    def release(self, cost):
+        with self._condition:
+            self._used = max(0, self._used - cost)
+            if self._counter is not None:
+                self._used = self._counter.increment(-cost)
+            self._condition.notify_all()
+
+    def _reserve_budget(self, cost, priority):
+        if self._counter is None:
+            self._used += cost
+            return
+        # other processes may have used the budget since it was checked
+        self._used = self._counter.increment(cost)
+        if self._used > self._available(priority):
+            self._used = self._counter.increment(-cost)
+            raise self._budget_exceeded(cost, priority)
+
+    def _check_budget(self, cost, priority):
+        self._refresh_used()
+        if self._used + cost > self._available(priority):
+            raise self._budget_exceeded(cost, priority)
+
+    def _budget_exceeded(self, cost, priority):
+        return QuotaExceededException(
+            "Daily budget of {} datapoints would be exceeded: {} used, {} requested at priority {}".format(
+                self._daily_budget, self._used, cost, priority))
+
+    # Returns how much of the budget batches of the priority may use
+    def _available(self, priority):
+        if priority > self._reserve_priority:
+            return self._daily_budget - self._reserve
+        return self._daily_budget
+
+    # Takes a token from the bucket and returns 0, or returns the seconds until the next token
+    def _take_token(self):
+        if self._requests_per_second is None:
+            return 0
+        now = self._clock()
+        self._tokens = min(self._burst, self._tokens + (now - self._last_refill) * self._requests_per_second)
+        self._last_refill = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self._requests_per_second
+
+    def _refresh_used(self):
+        self._roll_day()
+        if self._counter is not None:
+            self._used = self._counter.get()
+
+    def _roll_day(self):
+        today = datetime.date.today()
+        if today != self._day:
+            self._day = today
+            self._used = 0
@@ -0,0 +1,94 @@
+import codecs
+import json
+import re
+
+_whitespace = " \t\n\r"
+# a whole string, a quote that opens a string the buffer does not finish, or a bracket
+_tokens = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|["{}\[\]]', re.DOTALL)
+
+
+# Incrementally decodes a {"GDSSDKResponse": [...]} body and yields the entries of the array one at a time.
+# chunks is an iterable of bytes, such as response.iter_content(). Only the entry being decoded and the
+# undecoded tail of the body are kept in memory.
+#
+# The chunks of an entry are scanned once, for the brackets that open and close it outside of strings, and
+# collected in a list. The entry is decoded once its closing bracket arrives, so the time spent stays linear in
+# the size of the entry however many chunks it spans.
+def iter_response_entries(chunks, key="GDSSDKResponse"):
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""  # text that has not been scanned: the body up to the array, or a string cut by the chunk
+    parts = []  # the scanned text of the entry being decoded
+    depth = 0  # brackets of the entry that are open
+    in_array = False
+    for chunk in chunks:
+        buffer += text_decoder.decode(chunk)
+        position = 0
+        if not in_array:
+            position = find_array_start(buffer, key)
+            if position is None:
+                continue
+            in_array = True
+        start = position
+        end = len(buffer)
+        for match in _tokens.finditer(buffer, position):
+            token = match.group()
+            if not depth:
+                if buffer[position:match.start()].strip(_whitespace + ","):
+                    raise ValueError("Unexpected Cap IQ response")
+                if token == "]":
+                    return
+                if token not in "{[":
+                    raise ValueError("Unexpected Cap IQ response")
+                start = match.start()
+            if token[0] == '"':
+                if len(token) == 1:
+                    # the string continues in the next chunk, scan it again from its start then
+                    end = match.start()
+                    break
+                continue
+            if token in "{[":
+                depth += 1
+            else:
+                depth -= 1
+                if not depth:
+                    position = match.end()
+                    parts.append(buffer[start:position])
+                    yield json.loads("".join(parts))
+                    parts = []
+        if depth:
+            parts.append(buffer[start:end])
+        elif buffer[position:end].strip(_whitespace + ","):
+            raise ValueError("Unexpected Cap IQ response")
+        buffer = buffer[end:]
+    buffer += text_decoder.decode(b"", final=True)
+    if not in_array:
+        raise ValueError("Cap IQ response has no {} array".format(key))
+    rest = "".join(parts) + buffer
+    if rest.strip(_whitespace + ","):
+        # decoding whatever is left raises the actual JSON error
+        json.loads(rest)
+    raise ValueError("Cap IQ response ended before the {} array was closed".format(key))
+
+
+# Returns the position right after the "[" that opens the key's array, or None if the buffer does not reach it yet
+def find_array_start(buffer, key):
+    key_position = buffer.find('"{}"'.format(key))
+    if key_position == -1:
+        return None
+    position = skip(buffer, key_position + len(key) + 2, _whitespace)
+    if position == len(buffer):
+        return None
+    if buffer[position] != ":":
+        raise ValueError("Unexpected Cap IQ response")
+    position = skip(buffer, position + 1, _whitespace)
+    if position == len(buffer):
+        return None
+    if buffer[position] != "[":
+        raise ValueError("Unexpected Cap IQ response")
+    return position + 1
+
+
+def skip(buffer, position, characters):
+    while position < len(buffer) and buffer[position] in characters:
+        position += 1
+    return position
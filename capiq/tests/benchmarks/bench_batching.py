@@ -0,0 +1,56 @@
+# Compares many threads making single identifier gdsp calls against the same threads submitting their lookups
+# to a BatchingQueue, reporting throughput and latency percentiles.
+#
+#   python -m capiq.tests.benchmarks.bench_batching
+import threading
+import time
+
+from capiq.batching import BatchingQueue
+from capiq.capiq_client import CapIQClient
+from capiq.tests.benchmarks.stub_server import GDSStubServer
+
+CALLERS = 64
+LOOKUPS_PER_CALLER = 50
+SERVER_LATENCY = 0.02
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run(server, name, lookup):
+    server.reset_counts()
+    latencies = [[] for i in range(CALLERS)]
+
+    def call(caller):
+        for i in range(LOOKUPS_PER_CALLER):
+            start = time.perf_counter()
+            lookup("TICKER{}".format(caller * LOOKUPS_PER_CALLER + i))
+            latencies[caller].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=call, args=(caller,)) for caller in range(CALLERS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies = [latency for caller_latencies in latencies for latency in caller_latencies]
+    print("{name}: {lookups} lookups in {elapsed:.3f}s ({throughput:.0f} lookups/s), {posts} POSTs, "
+          "latency p50 {p50:.1f}ms p99 {p99:.1f}ms max {max:.1f}ms".format(
+              name=name, lookups=len(latencies), elapsed=elapsed, throughput=len(latencies) / elapsed,
+              posts=server.request_count, p50=percentile(latencies, 0.5) * 1000,
+              p99=percentile(latencies, 0.99) * 1000, max=max(latencies) * 1000))
+
+
+if __name__ == '__main__':
+    with GDSStubServer(latency=SERVER_LATENCY) as stub_server:
+        with CapIQClient("username", "password", max_workers=8) as ciq_client:
+            ciq_client._endpoint = stub_server.url
+            run(stub_server, "one call per lookup",
+                lambda identifier: ciq_client.gdsp([identifier], ["IQ_CLOSEPRICE"], ["close_price"], [{}]))
+            for max_latency in (0.002, 0.01):
+                with BatchingQueue(ciq_client, max_latency=max_latency) as queue:
+                    run(stub_server, "batching queue, max_latency={}s".format(max_latency),
+                        lambda identifier: queue.submit(identifier, "IQ_CLOSEPRICE").result())
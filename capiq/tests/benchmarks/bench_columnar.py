@@ -0,0 +1,64 @@
+# Compares the memory held by the default list of rows results against columnar=True results for a large
+# GDSHE response, after the decoded response itself has been released. Only the parsing is measured, the
+# response is generated in memory.
+#
+#   python -m capiq.tests.benchmarks.bench_columnar
+import datetime
+import gc
+import time
+import tracemalloc
+
+from capiq.capiq_client import CapIQClient
+
+IDENTIFIERS = 1000
+ROWS = 2500  # about ten years of daily history
+
+
+def build_response_entries():
+    start_date = datetime.date(2010, 1, 1)
+    dates = []
+    for i in range(ROWS):
+        date = start_date + datetime.timedelta(days=i)
+        dates.append("{d.month}/{d.day}/{d.year}".format(d=date))
+    response_entries = []
+    for identifier in range(IDENTIFIERS):
+        response_entries.append({
+            "Headers": ["IQ_CLOSEPRICE", "AsOfDate"],
+            "Rows": [{"Row": ["{:.6f}".format(100 + i * 0.01), date]} for i, date in enumerate(dates)],
+            "Mnemonic": "IQ_CLOSEPRICE",
+            "Function": "GDSHE",
+            "ErrMsg": "",
+            "Properties": {},
+            "CacheExpiryTime": "0",
+            "Identifier": "ID{}:".format(identifier)
+        })
+    return response_entries
+
+
+def run(columnar):
+    ciq_client = CapIQClient("username", "password")
+    mnemonic_return_keys = ciq_client.build_mnemonic_return_key_index(["IQ_CLOSEPRICE"], ["close_price"], [{}])
+    response_entries = build_response_entries()
+    start = time.perf_counter()
+    ciq_client.parse_response(response_entries, mnemonic_return_keys, True, {}, columnar)
+    elapsed = time.perf_counter() - start
+    del response_entries
+    gc.collect()
+
+    # tracemalloc slows parsing down considerably, so memory is measured on a second run
+    tracemalloc.start()
+    response_entries = build_response_entries()
+    returnee = ciq_client.parse_response(response_entries, mnemonic_return_keys, True, {}, columnar)
+    del response_entries
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("columnar={columnar}: {points} points parsed in {elapsed:.2f}s, result holds {retained:.1f}MB "
+          "(peak {peak:.1f}MB)".format(columnar=columnar, points=IDENTIFIERS * ROWS, elapsed=elapsed,
+                                       retained=retained / 1e6, peak=peak / 1e6))
+    return returnee
+
+
+if __name__ == '__main__':
+    run(columnar=False)
+    run(columnar=True)
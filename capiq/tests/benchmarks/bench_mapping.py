@@ -0,0 +1,67 @@
+# Compares response mapping with the per record logging the client used to do against the current mapping
+# path, with logging at the old default ERROR level and at DEBUG.
+#
+#   python -m capiq.tests.benchmarks.bench_mapping
+import logging
+import time
+
+from capiq.capiq_client import CapIQClient
+
+IDENTIFIERS = 1000
+VARIANTS = 20
+
+
+# Formats every record it gets, like a real handler would, without writing it anywhere
+class DiscardHandler(logging.Handler):
+    def emit(self, record):
+        self.format(record)
+
+
+# The client as it was before mapping stopped logging, kept here as the baseline
+class LegacyLoggingClient(CapIQClient):
+    @staticmethod
+    def get_return_key(mnemonic, properties, mnemonics_to_return_key_index):
+        logging.info("mnemonics_to_return_key_index")
+        logging.info(mnemonics_to_return_key_index)
+        return mnemonics_to_return_key_index.get_return_key(mnemonic, properties)
+
+
+def build_response():
+    response_entries = []
+    for identifier in range(IDENTIFIERS):
+        for variant in range(VARIANTS):
+            response_entries.append({
+                "Headers": ["IQ_TOTAL_REV"],
+                "Rows": [{"Row": ["1234.5"]}],
+                "Mnemonic": "IQ_TOTAL_REV",
+                "ErrMsg": None,
+                "Properties": {"periodtype": "IQ_FQ-{}".format(variant)},
+                "Identifier": "ID{}".format(identifier)
+            })
+    return response_entries
+
+
+def run(name, ciq_client, response_entries, index):
+    start = time.perf_counter()
+    ciq_client.parse_response(response_entries, index, False, {})
+    elapsed = time.perf_counter() - start
+    print("{name}: {records} records in {elapsed:.3f}s ({throughput:.0f} records/s)".format(
+        name=name, records=len(response_entries), elapsed=elapsed, throughput=len(response_entries) / elapsed))
+    return elapsed
+
+
+if __name__ == '__main__':
+    root = logging.getLogger()
+    root.addHandler(DiscardHandler())
+    response_entries = build_response()
+    index = CapIQClient.build_mnemonic_return_key_index(
+        ["IQ_TOTAL_REV"] * VARIANTS, ["revenue_{}".format(i) for i in range(VARIANTS)],
+        [{"PERIODTYPE": "IQ_FQ-{}".format(i)} for i in range(VARIANTS)])
+    legacy_client = LegacyLoggingClient("username", "password")
+    ciq_client = CapIQClient("username", "password")
+    for level in (logging.ERROR, logging.DEBUG):
+        root.setLevel(level)
+        records = response_entries if level == logging.ERROR else response_entries[:2000]
+        before = run("before, root at {}".format(logging.getLevelName(level)), legacy_client, records, index)
+        after = run("after, root at {}".format(logging.getLevelName(level)), ciq_client, records, index)
+        print("speedup: {:.1f}x".format(before / after))
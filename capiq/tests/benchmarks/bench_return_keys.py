@@ -0,0 +1,57 @@
+# Compares return key resolution of the hashed ReturnKeyIndex against the linear scan it replaced, for one
+# mnemonic requested with many period variants.
+#
+#   python -m capiq.tests.benchmarks.bench_return_keys
+import time
+
+from capiq.capiq_client import CapIQClient
+
+VARIANTS = 120
+IDENTIFIERS = 100
+
+
+# The return key lookup as it was before ReturnKeyIndex, kept here as the baseline
+def linear_build_index(mnemonics, return_keys, properties):
+    mnemonic_return_keys = {}
+    for index, mnemonic in enumerate(mnemonics):
+        mnemonic_return_keys.setdefault(mnemonic, []).append({"key": return_keys[index],
+                                                              "properties": properties[index]})
+    return mnemonic_return_keys
+
+
+def linear_get_return_key(mnemonic, properties, mnemonics_to_return_key_index):
+    if len(mnemonics_to_return_key_index[mnemonic]) == 1:
+        return mnemonics_to_return_key_index[mnemonic][0]["key"]
+    for return_key in mnemonics_to_return_key_index[mnemonic]:
+        match = True
+        for property_name, property_value in properties.items():
+            if not (property_name.upper() in return_key["properties"] and
+                    return_key["properties"][property_name.upper()] == property_value.replace(" ", "+")):
+                match = False
+        if match:
+            return return_key["key"]
+
+
+def run(name, build_index, get_return_key, mnemonics, return_keys, properties, returned_properties):
+    start = time.perf_counter()
+    index = build_index(mnemonics, return_keys, properties)
+    for identifier in range(IDENTIFIERS):
+        for returned in returned_properties:
+            get_return_key("IQ_TOTAL_REV", returned, index)
+    elapsed = time.perf_counter() - start
+    lookups = IDENTIFIERS * len(returned_properties)
+    print("{name}: {lookups} lookups in {elapsed:.3f}s ({per_lookup:.2f}us/lookup)".format(
+        name=name, lookups=lookups, elapsed=elapsed, per_lookup=elapsed * 1e6 / lookups))
+    return elapsed
+
+
+if __name__ == '__main__':
+    mnemonics = ["IQ_TOTAL_REV"] * VARIANTS
+    return_keys = ["revenue_{}".format(i) for i in range(VARIANTS)]
+    properties = [{"PERIODTYPE": "IQ_FQ-{}".format(i), "CURRENCYID": "USD"} for i in range(VARIANTS)]
+    returned_properties = [{"periodtype": "IQ_FQ-{}".format(i), "currencyid": "USD"} for i in range(VARIANTS)]
+    linear = run("linear scan", linear_build_index, linear_get_return_key, mnemonics, return_keys, properties,
+                 returned_properties)
+    hashed = run("hashed index", CapIQClient.build_mnemonic_return_key_index, CapIQClient.get_return_key, mnemonics,
+                 return_keys, properties, returned_properties)
+    print("speedup: {:.1f}x".format(linear / hashed))
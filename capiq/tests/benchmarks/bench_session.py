@@ -0,0 +1,29 @@
+# Compares a client that opens a new connection for every call against the pooled keep-alive session.
+#
+#   python -m capiq.tests.benchmarks.bench_session
+import time
+
+from capiq.capiq_client import CapIQClient
+from capiq.tests.benchmarks.stub_server import GDSStubServer
+
+CALLS = 500
+
+
+def run(server, keep_alive):
+    server.reset_counts()
+    with CapIQClient("username", "password", keep_alive=keep_alive) as ciq_client:
+        ciq_client._endpoint = server.url
+        start = time.perf_counter()
+        for i in range(CALLS):
+            ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        elapsed = time.perf_counter() - start
+    print("keep_alive={keep_alive}: {calls} calls in {elapsed:.3f}s ({per_call:.3f}ms/call), "
+          "{connections} connections opened".format(keep_alive=keep_alive, calls=CALLS, elapsed=elapsed,
+                                                    per_call=elapsed * 1000 / CALLS,
+                                                    connections=server.connection_count))
+
+
+if __name__ == '__main__':
+    with GDSStubServer() as stub_server:
+        run(stub_server, keep_alive=False)
+        run(stub_server, keep_alive=True)
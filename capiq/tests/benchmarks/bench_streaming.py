@@ -0,0 +1,47 @@
+# Compares decoding a large response body with iter_response_entries, chunk by chunk as stream_request receives
+# it, against json.loads on the whole body. Large GDST/GDSHE entries span thousands of chunks, so this shows
+# whether streaming stays linear in the size of an entry.
+#
+#   python -m capiq.tests.benchmarks.bench_streaming
+import json
+import time
+
+from capiq.streaming import iter_response_entries
+
+CHUNK_SIZE = 8192
+
+
+def build_body(entries, rows):
+    response_entries = []
+    for identifier in range(entries):
+        response_entries.append({
+            "Headers": ["IQ_CLOSEPRICE", "AsOfDate"],
+            "Rows": [{"Row": ["{:.6f}".format(100 + i * 0.01), "1/2/2020"]} for i in range(rows)],
+            "Mnemonic": "IQ_CLOSEPRICE",
+            "Function": "GDSHE",
+            "ErrMsg": None,
+            "Properties": {},
+            "CacheExpiryTime": "0",
+            "Identifier": "ID{}:".format(identifier)
+        })
+    return json.dumps({"GDSSDKResponse": response_entries}).encode()
+
+
+def run(entries, rows):
+    body = build_body(entries, rows)
+    start = time.perf_counter()
+    json.loads(body)
+    loads_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    chunks = (body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE))
+    count = sum(1 for _ in iter_response_entries(chunks))
+    streaming_elapsed = time.perf_counter() - start
+    assert count == entries
+    print("{entries} entries x {rows} rows ({size:.1f}MB): iter_response_entries {streaming:.2f}s, "
+          "json.loads {loads:.2f}s".format(entries=entries, rows=rows, size=len(body) / 1e6,
+                                          streaming=streaming_elapsed, loads=loads_elapsed))
+
+
+if __name__ == '__main__':
+    run(1, 200000)
+    run(20, 30000)
@@ -0,0 +1,153 @@
+# Runs every gds function end to end against the local GDS stub and reports throughput, call latency percentiles,
+# peak memory and the memory the returned result keeps, as text and optionally as JSON. Pass an earlier JSON file
+# with --compare to see how a change moved the numbers; keep the options the same between the runs you compare.
+#
+#   python -m capiq.tests.benchmarks.bench_suite --output before.json
+#   python -m capiq.tests.benchmarks.bench_suite --output after.json --compare before.json
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import time
+import tracemalloc
+
+from capiq.capiq_client import CapIQClient
+from capiq.tests.benchmarks.stub_server import GDSStubServer
+
+FUNCTIONS = ("gdsp", "gdspv", "gdst", "gdshe", "gdshv", "gdsg")
+# metrics where a bigger number is better, every other one is better smaller
+HIGHER_IS_BETTER = ("datapoints_per_second", "calls_per_second")
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def make_call(ciq_client, function, identifiers, mnemonics, compact=False):
+    return_keys = [mnemonic.lower() for mnemonic in mnemonics]
+    if function in ("gdst", "gdshe", "gdshv"):
+        return lambda: getattr(ciq_client, function)(identifiers, mnemonics, return_keys, "01/04/2010",
+                                                     "12/31/2019", compact=compact)
+    return lambda: getattr(ciq_client, function)(identifiers, mnemonics, return_keys, [{} for m in mnemonics],
+                                                 compact=compact)
+
+
+def run_function(ciq_client, function, options):
+    identifiers = ["TICKER{}".format(i) for i in range(options.identifiers)]
+    mnemonics = ["IQ_MNEMONIC{}".format(i) for i in range(options.mnemonics)]
+    call = make_call(ciq_client, function, identifiers, mnemonics, options.compact)
+    call()  # warm up the connection pool
+    latencies = []
+    start = time.perf_counter()
+    for i in range(options.repeat):
+        call_start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+
+    # tracemalloc slows the calls down, so memory is measured on a call of its own
+    tracemalloc.start()
+    result = call()
+    result_memory, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    datapoints = len(identifiers) * len(mnemonics) * options.repeat
+    return {
+        "calls_per_second": options.repeat / elapsed,
+        "datapoints_per_second": datapoints / elapsed,
+        "latency_p50_ms": percentile(latencies, 0.5) * 1000,
+        "latency_p90_ms": percentile(latencies, 0.9) * 1000,
+        "latency_p99_ms": percentile(latencies, 0.99) * 1000,
+        "latency_max_ms": max(latencies) * 1000,
+        "peak_memory_bytes": peak_memory,
+        "result_memory_bytes": result_memory,
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results):
+    for function, result in results.items():
+        print("{function}: {datapoints_per_second:.0f} datapoints/s, {calls_per_second:.1f} calls/s, "
+              "latency p50 {latency_p50_ms:.1f}ms p90 {latency_p90_ms:.1f}ms p99 {latency_p99_ms:.1f}ms "
+              "max {latency_max_ms:.1f}ms, peak memory {peak_memory_kib:.0f}KiB, "
+              "result {result_memory_kib:.0f}KiB".format(
+                  function=function, peak_memory_kib=result["peak_memory_bytes"] / 1024,
+                  result_memory_kib=result["result_memory_bytes"] / 1024, **result))
+
+
+def print_comparison(results, baseline):
+    # the functions run may differ, every function is compared on its own
+    config = dict(results["config"], functions=None)
+    if dict(baseline["config"], functions=None) != config:
+        print("warning: the baseline was run with {}".format(baseline["config"]))
+    print("compared to {}:".format(baseline.get("commit") or "baseline"))
+    for function, result in results["results"].items():
+        before = baseline["results"].get(function)
+        if not before:
+            continue
+        changes = []
+        for metric, value in result.items():
+            if not before.get(metric):
+                continue
+            change = (value - before[metric]) / before[metric]
+            better = change > 0 if metric in HIGHER_IS_BETTER else change < 0
+            changes.append("{} {:+.1%}{}".format(metric, change, "" if abs(change) < 0.05 or better else " (worse)"))
+        print("{}: {}".format(function, ", ".join(changes)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--identifiers", type=int, default=100)
+    parser.add_argument("--mnemonics", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=100, help="rows of every gdst and gdshe entry")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="fraction of entries answered with ErrMsg")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds the stub takes per POST")
+    parser.add_argument("--repeat", type=int, default=20, help="timed calls per function")
+    parser.add_argument("--max-batch-size", type=int, default=500)
+    parser.add_argument("--max-workers", type=int, default=4)
+    parser.add_argument("--compact", action="store_true", help="return compact results, see capiq.records")
+    parser.add_argument("--functions", nargs="+", choices=FUNCTIONS, default=list(FUNCTIONS))
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    options = parser.parse_args(argv)
+
+    # the entries the stub fails are still logged, but not printed over the results
+    logging.getLogger("capiq").addHandler(logging.NullHandler())
+    config = {name: value for name, value in sorted(vars(options).items()) if name not in ("output", "compare")}
+    results = {}
+    with GDSStubServer(latency=options.latency, rows=options.rows, error_rate=options.error_rate) as stub_server:
+        with CapIQClient("username", "password", max_batch_size=options.max_batch_size,
+                         max_workers=options.max_workers) as ciq_client:
+            ciq_client._endpoint = stub_server.url
+            for function in options.functions:
+                results[function] = run_function(ciq_client, function, options)
+    results = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": results,
+    }
+
+    print_results(results["results"])
+    if options.output:
+        with open(options.output, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if options.compare:
+        with open(options.compare) as baseline:
+            print_comparison(results, json.load(baseline))
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import datetime
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# functions that answer with one row per date
+_multiple_row_functions = ("GDST", "GDSHE")
+_first_date = datetime.date(2010, 1, 4)
+
+
+# Builds a GDSSDKResponse entry for every inputRequest, shaped like the ones GDS returns. Multiple row functions
+# get rows rows of a value and an AsOfDate, everything else a single value. A random error_rate fraction of the
+# entries come back with an ErrMsg instead of data.
+def build_response_entries(input_requests, rows=1, error_rate=0.0, rng=random):
+    response = []
+    for input_request in input_requests:
+        function = input_request['function'].upper()
+        error = error_rate and rng.random() < error_rate
+        if error:
+            headers = []
+            data = []
+        elif function in _multiple_row_functions:
+            headers = [input_request['mnemonic'], "AsOfDate"]
+            data = [{"Row": ["{:.2f}".format(40 + (i % 500) * 0.05), format_date(_first_date +
+                                                                                datetime.timedelta(days=i))]}
+                    for i in range(rows)]
+        else:
+            headers = [input_request['mnemonic']]
+            data = [{"Row": ["46.80"]}]
+        response.append({
+            "Headers": headers,
+            "Rows": data,
+            "NumCols": len(headers),
+            "Seniority": "",
+            "Mnemonic": input_request['mnemonic'],
+            "Function": input_request['function'],
+            "ErrMsg": "Data Unavailable" if error else None,
+            "Properties": input_request['properties'],
+            "NumRows": len(data),
+            "CacheExpiryTime": "0",
+            "Identifier": input_request['identifier'],
+            "Limit": ""
+        })
+    return response
+
+
+def format_date(date):
+    return "{d.month:02d}/{d.day:02d}/{d.year}".format(d=date)
+
+
+# A local stand in for the GDS clientservice.json endpoint, so that the client code paths can be timed without
+# Cap IQ access.
+class GDSStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive unless the client asks us to close
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connection_count += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.server.lock:
+            self.server.request_count += 1
+            rng = random.Random(self.server.rng.random())
+        response = build_response_entries(json.loads(body)['inputRequests'], self.server.rows,
+                                          self.server.error_rate, rng)
+        payload = json.dumps({"GDSSDKResponse": response}).encode()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GDSStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    # latency is the time in seconds every POST takes to answer, like the round trip to Cap IQ would. rows is
+    # the number of rows of GDST and GDSHE entries and error_rate the fraction of entries that fail. Errors are
+    # drawn from a generator seeded with seed, so runs with the same requests get the same errors.
+    def __init__(self, handler=GDSStubHandler, latency=0, rows=1, error_rate=0.0, seed=0):
+        ThreadingHTTPServer.__init__(self, ('127.0.0.1', 0), handler)
+        self.latency = latency
+        self.rows = rows
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.connection_count = 0
+        self.request_count = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{port}/gdsapi/rest/v3/clientservice.json".format(port=self.server_address[1])
+
+    def reset_counts(self):
+        with self.lock:
+            self.connection_count = 0
+            self.request_count = 0
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+        self.server_close()
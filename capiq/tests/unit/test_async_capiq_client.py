@@ -0,0 +1,93 @@
+import asyncio
+import unittest
+
+from mock import mock
+
+from capiq.async_capiq_client import AsyncCapIQClient
+from capiq.batching import BatchingQueue
+from capiq.capiq_client import CiqServiceException
+
+
+def echo_response(req):
+    response = []
+    for input_request in req['inputRequests']:
+        response.append({
+            "Headers": [input_request['mnemonic']],
+            "Rows": [{"Row": [input_request['identifier'] + "-" + input_request['mnemonic']]}],
+            "NumCols": 1,
+            "Seniority": "",
+            "Mnemonic": input_request['mnemonic'],
+            "Function": input_request['function'],
+            "ErrMsg": None,
+            "Properties": {},
+            "NumRows": 1,
+            "CacheExpiryTime": "0",
+            "Identifier": input_request['identifier'] + ":",
+            "Limit": ""
+        })
+    return {"GDSSDKResponse": response}
+
+
+async def mocked_echo_post(req, timeout=None):
+    return echo_response(req)
+
+
+async def mocked_limit_post(req, timeout=None):
+    return {'GDSSDKResponse': [{'ErrMsg': 'Daily Request Limit of 10000 Exceeded'}]}
+
+
+class TestAsyncCapiqClient(unittest.TestCase):
+
+    @mock.patch('capiq.async_capiq_client.AsyncCapIQClient.post', side_effect=mocked_echo_post)
+    def test_gdsp_data(self, mocked_post):
+        ciq_client = AsyncCapIQClient("username", "password")
+        return_value = asyncio.run(ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}]))
+        self.assertEqual(return_value, {'TRIP:': {'close_price': 'TRIP-IQ_CLOSEPRICE'}})
+
+    @mock.patch('capiq.async_capiq_client.AsyncCapIQClient.post', side_effect=mocked_echo_post)
+    def test_gdst_data(self, mocked_post):
+        ciq_client = AsyncCapIQClient("username", "password")
+        return_value = asyncio.run(ciq_client.gdst(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"],
+                                                   start_date="12/19/1980", end_date="12/19/2000", frequency="M"))
+        self.assertEqual(return_value, {'TRIP:': {'close_price': [['TRIP-IQ_CLOSEPRICE']]}})
+        input_request = mocked_post.call_args[0][0]['inputRequests'][0]
+        self.assertEqual(input_request['properties'],
+                         {"FREQUENCY": "M", "STARTDATE": "12/19/1980", "ENDDATE": "12/19/2000"})
+
+    def test_concurrency_limit(self):
+        in_flight = []
+        max_in_flight = []
+
+        async def slow_post(req, timeout=None):
+            in_flight.append(req)
+            max_in_flight.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(req)
+            return echo_response(req)
+
+        ciq_client = AsyncCapIQClient("username", "password", max_batch_size=1, max_workers=2)
+        with mock.patch.object(ciq_client, 'post', side_effect=slow_post):
+            return_value = asyncio.run(ciq_client.gdsp(["TRIP", "IBM", "AAPL", "MSFT"], ["IQ_CLOSEPRICE"],
+                                                       ["close_price"], [{}]))
+        self.assertEqual(len(return_value), 4)
+        self.assertEqual(max(max_in_flight), 2)
+
+    @mock.patch('capiq.async_capiq_client.AsyncCapIQClient.post', side_effect=mocked_limit_post)
+    def test_gdsp_api_service_error(self, mocked_post):
+        ciq_client = AsyncCapIQClient("username", "password")
+        with self.assertRaises(CiqServiceException):
+            asyncio.run(ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}]))
+
+    def test_sync_context_manager_is_rejected(self):
+        with self.assertRaises(TypeError):
+            with AsyncCapIQClient("username", "password"):
+                pass
+
+    def test_unsupported_options_are_rejected(self):
+        with self.assertRaises(TypeError):
+            AsyncCapIQClient("username", "password", coalesce_window=0.01)
+        ciq_client = AsyncCapIQClient("username", "password")
+        with self.assertRaises(TypeError):
+            ciq_client.stream_request(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}], "GDSP", False)
+        with self.assertRaises(TypeError):
+            BatchingQueue(ciq_client)
@@ -47,8 +47,34 @@ class TestCapiqClient(unittest.TestCase):
             capiq_client = CapIQClient("username", "password", verify=False)
             self.assertIsInstance(capiq_client, CapIQClient)
 
-    @mock.patch('capiq.capiq_client.requests.post', side_effect=mocked_gdsp_error_response)
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_gdsp_error_response)
     def test_gdsp_api_service_error(self, mocked_post):
         ciq_client = CapIQClient("username", "password")
         with self.assertRaises(CiqServiceException):
             ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_gdsp_error_response)
+    def test_session_is_reused(self, mocked_post):
+        ciq_client = CapIQClient("username", "password")
+        session = ciq_client._session
+        for i in range(2):
+            with self.assertRaises(CiqServiceException):
+                ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertIs(ciq_client._session, session)
+        self.assertEqual(mocked_post.call_count, 2)
+
+    def test_session_configuration(self):
+        ciq_client = CapIQClient("username", "password", verify=False, max_workers=6, keep_alive=False,
+                                 max_retries=3)
+        adapter = ciq_client._session.get_adapter(ciq_client._endpoint)
+        self.assertEqual(adapter._pool_maxsize, 6)
+        self.assertEqual(adapter.max_retries.total, 3)
+        self.assertEqual(ciq_client._session.headers['Connection'], 'close')
+        self.assertEqual(ciq_client._session.verify, False)
+        self.assertEqual(ciq_client._session.auth.username, "username")
+
+    def test_context_manager_closes_session(self):
+        with CapIQClient("username", "password") as ciq_client:
+            self.assertIsNotNone(ciq_client._session)
+        self.assertIsNone(ciq_client._session)
+        ciq_client.close()
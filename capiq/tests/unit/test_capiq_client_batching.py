@@ -0,0 +1,90 @@
+import json
+import unittest
+
+from mock import mock
+
+from capiq.capiq_client import CapIQClient, CiqServiceException
+
+
+def mocked_echo_requests_post(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+    if args[0] is not None:
+        response = []
+        for input_request in json.loads(kwargs['data'])['inputRequests']:
+            response.append({
+                "Headers": [input_request['mnemonic']],
+                "Rows": [{"Row": [input_request['identifier'] + "-" + input_request['mnemonic']]}],
+                "NumCols": 1,
+                "Seniority": "",
+                "Mnemonic": input_request['mnemonic'],
+                "Function": input_request['function'],
+                "ErrMsg": None,
+                "Properties": {},
+                "NumRows": 1,
+                "CacheExpiryTime": "0",
+                "Identifier": input_request['identifier'] + ":",
+                "Limit": ""
+            })
+        return MockResponse({"GDSSDKResponse": response}, 200)
+
+
+def mocked_limit_requests_post(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+    if args[0] is not None:
+        return MockResponse({'GDSSDKResponse': [{'ErrMsg': 'Daily Request Limit of 10000 Exceeded'}]}, 200)
+
+
+class TestCapiqClientBatching(unittest.TestCase):
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_single_batch(self, mocked_post):
+        ciq_client = CapIQClient("username", "password")
+        return_value = ciq_client.gdsp(["TRIP", "IBM"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(mocked_post.call_count, 1)
+        self.assertEqual(return_value, {
+            'TRIP:': {'close_price': 'TRIP-IQ_CLOSEPRICE'},
+            'IBM:': {'close_price': 'IBM-IQ_CLOSEPRICE'}
+        })
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_split_batches_are_merged(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", max_batch_size=3, max_workers=2)
+        return_value = ciq_client.gdsp(
+            ["TRIP", "IBM", "AAPL"],
+            ["IQ_CLOSEPRICE", "IQ_VOLUME"],
+            ["close_price", "volume"],
+            [{}, {}]
+        )
+        self.assertEqual(mocked_post.call_count, 2)
+        for call in mocked_post.call_args_list:
+            self.assertLessEqual(len(json.loads(call[1]['data'])['inputRequests']), 3)
+        self.assertEqual(return_value, {
+            'TRIP:': {'close_price': 'TRIP-IQ_CLOSEPRICE', 'volume': 'TRIP-IQ_VOLUME'},
+            'IBM:': {'close_price': 'IBM-IQ_CLOSEPRICE', 'volume': 'IBM-IQ_VOLUME'},
+            'AAPL:': {'close_price': 'AAPL-IQ_CLOSEPRICE', 'volume': 'AAPL-IQ_VOLUME'}
+        })
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_limit_requests_post)
+    def test_split_batches_service_error(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", max_batch_size=1)
+        with self.assertRaises(CiqServiceException):
+            ciq_client.gdsp(["TRIP", "IBM"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+
+    def test_chunk_input_requests(self):
+        ciq_client = CapIQClient("username", "password", max_batch_size=2)
+        batches = ciq_client.chunk_input_requests(list(range(5)))
+        self.assertEqual(batches, [[0, 1], [2, 3], [4]])
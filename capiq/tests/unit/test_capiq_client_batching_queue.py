@@ -0,0 +1,115 @@
+import json
+import unittest
+
+from mock import mock
+
+from capiq.batching import BatchingQueue
+from capiq.capiq_client import CapIQClient, CiqServiceException
+from capiq.datapoint_cache import DatapointCache
+
+
+def mocked_echo_requests_post(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+    if args[0] is not None:
+        response = []
+        for input_request in json.loads(kwargs['data'])['inputRequests']:
+            response.append({
+                "Headers": [input_request['mnemonic']],
+                "Rows": [{"Row": [input_request['identifier'] + "-" + input_request['mnemonic']]}],
+                "NumCols": 1,
+                "Seniority": "",
+                "Mnemonic": input_request['mnemonic'],
+                "Function": input_request['function'],
+                "ErrMsg": "Invalid Identifier" if input_request['identifier'] == "BAD" else None,
+                "Properties": {},
+                "NumRows": 1,
+                "CacheExpiryTime": "0",
+                "Identifier": input_request['identifier'] + ":",
+                "Limit": ""
+            })
+        return MockResponse({"GDSSDKResponse": response}, 200)
+
+
+def mocked_limit_requests_post(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+    if args[0] is not None:
+        return MockResponse({'GDSSDKResponse': [{'ErrMsg': 'Daily Request Limit of 10000 Exceeded'}]}, 200)
+
+
+class TestCapiqClientBatchingQueue(unittest.TestCase):
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_lookups_are_sent_together(self, mocked_post):
+        ciq_client = CapIQClient("username", "password")
+        with BatchingQueue(ciq_client, max_latency=60) as queue:
+            futures = [queue.submit(identifier, "IQ_CLOSEPRICE") for identifier in ["TRIP", "IBM", "AAPL"]]
+            futures.append(queue.submit("IBM", "IQ_VOLUME"))
+        self.assertEqual([future.result() for future in futures],
+                         ["TRIP-IQ_CLOSEPRICE", "IBM-IQ_CLOSEPRICE", "AAPL-IQ_CLOSEPRICE", "IBM-IQ_VOLUME"])
+        self.assertEqual(mocked_post.call_count, 1)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_size_threshold(self, mocked_post):
+        ciq_client = CapIQClient("username", "password")
+        with BatchingQueue(ciq_client, max_batch_size=2, max_latency=60) as queue:
+            futures = [queue.submit(identifier, "IQ_CLOSEPRICE") for identifier in ["TRIP", "IBM"]]
+            self.assertEqual(futures[1].result(timeout=5), "IBM-IQ_CLOSEPRICE")
+            self.assertEqual(mocked_post.call_count, 1)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_latency_threshold(self, mocked_post):
+        ciq_client = CapIQClient("username", "password")
+        with BatchingQueue(ciq_client, max_latency=0.01) as queue:
+            self.assertEqual(queue.submit("TRIP", "IQ_CLOSEPRICE").result(timeout=5), "TRIP-IQ_CLOSEPRICE")
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_functions_and_cache(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", cache=DatapointCache(':memory:'))
+        with BatchingQueue(ciq_client, max_latency=60) as queue:
+            queue.submit("TRIP", "IQ_CLOSEPRICE")
+        with BatchingQueue(ciq_client, max_latency=60) as queue:
+            cached = queue.submit("TRIP", "IQ_CLOSEPRICE")
+            series = queue.submit("TRIP", "IQ_CLOSEPRICE", {"STARTDATE": "01/01/2017"}, "GDST", True)
+        self.assertEqual(cached.result(), "TRIP-IQ_CLOSEPRICE")
+        self.assertEqual(series.result(), [["TRIP-IQ_CLOSEPRICE"]])
+        self.assertEqual(mocked_post.call_count, 2)
+        self.assertEqual(json.loads(mocked_post.call_args[1]['data'])['inputRequests'][0]['function'], "GDST")
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_entry_errors(self, mocked_post):
+        ciq_client = CapIQClient("username", "password")
+        with BatchingQueue(ciq_client, max_latency=60) as queue:
+            bad = queue.submit("BAD", "IQ_CLOSEPRICE")
+            good = queue.submit("TRIP", "IQ_CLOSEPRICE")
+        self.assertEqual(good.result(), "TRIP-IQ_CLOSEPRICE")
+        with self.assertRaises(CiqServiceException):
+            bad.result()
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_limit_requests_post)
+    def test_service_errors(self, mocked_post):
+        ciq_client = CapIQClient("username", "password")
+        with BatchingQueue(ciq_client, max_latency=60) as queue:
+            futures = [queue.submit(identifier, "IQ_CLOSEPRICE") for identifier in ["TRIP", "IBM"]]
+        for future in futures:
+            with self.assertRaises(CiqServiceException):
+                future.result()
+
+    def test_closed_queue(self):
+        queue = BatchingQueue(CapIQClient("username", "password"))
+        queue.close()
+        with self.assertRaises(RuntimeError):
+            queue.submit("TRIP", "IQ_CLOSEPRICE")
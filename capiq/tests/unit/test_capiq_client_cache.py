@@ -0,0 +1,123 @@
+import json
+import unittest
+
+from mock import mock
+
+from capiq.capiq_client import CapIQClient
+from capiq.datapoint_cache import DatapointCache
+
+
+def mocked_echo_requests_post(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+    if args[0] is not None:
+        response = []
+        for input_request in json.loads(kwargs['data'])['inputRequests']:
+            if input_request['mnemonic'] == "IQ_NO_DATA":
+                response.append({"Headers": [], "Rows": [], "Mnemonic": input_request['mnemonic'], "ErrMsg": None,
+                                 "Properties": {}, "CacheExpiryTime": "0",
+                                 "Identifier": input_request['identifier'] + ":"})
+                continue
+            response.append({
+                "Headers": [input_request['mnemonic']],
+                "Rows": [{"Row": [input_request['identifier'] + "-" + input_request['mnemonic']]}],
+                "NumCols": 1,
+                "Seniority": "",
+                "Mnemonic": input_request['mnemonic'],
+                "Function": input_request['function'],
+                "ErrMsg": "SOME ERROR" if input_request['identifier'] == "BAD" else None,
+                "Properties": {},
+                "NumRows": 1,
+                "CacheExpiryTime": "0",
+                "Identifier": input_request['identifier'] + ":",
+                "Limit": ""
+            })
+        return MockResponse({"GDSSDKResponse": response}, 200)
+
+
+def sent_input_requests(mocked_post):
+    return [json.loads(call[1]['data'])['inputRequests'] for call in mocked_post.call_args_list]
+
+
+class TestCapiqClientCache(unittest.TestCase):
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_only_misses_are_requested(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", cache=DatapointCache(':memory:'))
+        ciq_client.gdsp(["TRIP", "IBM"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        return_value = ciq_client.gdsp(["TRIP", "IBM", "AAPL"], ["IQ_CLOSEPRICE"], ["price"], [{}])
+        self.assertEqual(mocked_post.call_count, 2)
+        self.assertEqual([r['identifier'] for r in sent_input_requests(mocked_post)[1]], ["AAPL"])
+        self.assertEqual(return_value, {
+            'TRIP:': {'price': 'TRIP-IQ_CLOSEPRICE'},
+            'IBM:': {'price': 'IBM-IQ_CLOSEPRICE'},
+            'AAPL:': {'price': 'AAPL-IQ_CLOSEPRICE'}
+        })
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_full_hit_sends_nothing(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", cache=DatapointCache(':memory:'))
+        ciq_client.gdst(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], properties=[{"FREQUENCY": "M"}])
+        return_value = ciq_client.gdst(["trip"], ["IQ_CLOSEPRICE"], ["close_price"], properties=[{"frequency": "M"}])
+        self.assertEqual(mocked_post.call_count, 1)
+        self.assertEqual(return_value, {'TRIP:': {'close_price': [['TRIP-IQ_CLOSEPRICE']]}})
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_properties_are_part_of_the_key(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", cache=DatapointCache(':memory:'))
+        ciq_client.gdsp(["TRIP"], ["IQ_TOTAL_REV"], ["revenue"], [{"PERIODTYPE": "IQ_FY"}])
+        ciq_client.gdsp(["TRIP"], ["IQ_TOTAL_REV"], ["revenue"], [{"PERIODTYPE": "IQ_LTM"}])
+        self.assertEqual(mocked_post.call_count, 2)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_errors_are_not_cached(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", cache=DatapointCache(':memory:'))
+        for i in range(2):
+            return_value = ciq_client.gdsp(["BAD"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+            self.assertEqual(return_value, {'BAD:': {'close_price': None}})
+        self.assertEqual(mocked_post.call_count, 2)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_entries_without_data_are_left_out_of_hits(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", cache=DatapointCache(':memory:'))
+        for compact in (False, False, True):
+            return_value = ciq_client.gdsp(["TRIP"], ["IQ_NO_DATA"], ["no_data"], [{}], compact=compact)
+            self.assertEqual(return_value, {'TRIP:': {}})
+        self.assertEqual(mocked_post.call_count, 1)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_expired_entries_are_refetched(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", cache=DatapointCache(':memory:', expire_after=-1))
+        ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(mocked_post.call_count, 2)
+
+    def test_build_key_normalization(self):
+        self.assertEqual(
+            DatapointCache.build_key("GDSP", "ibm:", "iq_total_rev", {"periodtype": "IQ FY", "CURRENCYID": "USD"}),
+            DatapointCache.build_key("GDSP", "IBM:", "IQ_TOTAL_REV", {"CURRENCYID": "USD", "PERIODTYPE": "IQ+FY"})
+        )
+
+    def test_expire_after_precedence(self):
+        cache = DatapointCache(':memory:', expire_after=86400, function_expire_after={"gdsp": 60},
+                               mnemonic_expire_after={"IQ_TOTAL_REV": 604800}, server_expiry_unit=60)
+        self.assertEqual(cache.get_expire_after("GDSP", "iq_total_rev", "5"), 604800)
+        self.assertEqual(cache.get_expire_after("GDSP", "IQ_CLOSEPRICE", "5"), 60)
+        self.assertEqual(cache.get_expire_after("GDSHE", "IQ_CLOSEPRICE", "5"), 300)
+        self.assertEqual(cache.get_expire_after("GDSHE", "IQ_CLOSEPRICE", "0"), 86400)
+        self.assertEqual(cache.get_expire_after("GDSHE", "IQ_CLOSEPRICE", ""), 86400)
+        self.assertEqual(cache.get_expire_after("GDSHE", "IQ_CLOSEPRICE", None), 86400)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_mnemonic_override_disables_caching(self, mocked_post):
+        cache = DatapointCache(':memory:', mnemonic_expire_after={"IQ_CLOSEPRICE": 0})
+        ciq_client = CapIQClient("username", "password", cache=cache)
+        ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE", "IQ_TOTAL_REV"], ["close_price", "revenue"], [{}, {}])
+        ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE", "IQ_TOTAL_REV"], ["close_price", "revenue"], [{}, {}])
+        self.assertEqual([r['mnemonic'] for r in sent_input_requests(mocked_post)[1]], ["IQ_CLOSEPRICE"])
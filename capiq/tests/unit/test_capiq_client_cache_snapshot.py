@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from mock import mock
+
+from capiq.cache_snapshot import CacheSnapshot, export_snapshot, write_snapshot
+from capiq.capiq_client import CapIQClient
+from capiq.datapoint_cache import DatapointCache
+from capiq.tiered_cache import TieredCache
+
+
+def mocked_echo_requests_post(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+    if args[0] is not None:
+        response = []
+        for input_request in json.loads(kwargs['data'])['inputRequests']:
+            response.append({
+                "Headers": [input_request['mnemonic']],
+                "Rows": [{"Row": [input_request['identifier'] + "-" + input_request['mnemonic']]}],
+                "NumCols": 1,
+                "Seniority": "",
+                "Mnemonic": input_request['mnemonic'],
+                "Function": input_request['function'],
+                "ErrMsg": None,
+                "Properties": {},
+                "NumRows": 1,
+                "CacheExpiryTime": "0",
+                "Identifier": input_request['identifier'] + ":",
+                "Limit": ""
+            })
+        return MockResponse({"GDSSDKResponse": response}, 200)
+
+
+class TestCapiqClientCacheSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def test_snapshot(self):
+        path = os.path.join(self.directory, "snapshot.ciq")
+        now = time.time()
+        rows = [("k{:03d}".format(i), "ID{}:".format(i), json.dumps({"v": i}), now + 60) for i in range(100)]
+        rows.append(("expired", "X:", "1", now - 1))
+        self.assertEqual(write_snapshot(path, reversed(rows)), 101)
+        snapshot = CacheSnapshot(path)
+        self.assertEqual(len(snapshot), 101)
+        self.assertEqual(snapshot.get_many(["k000", "k042", "k099", "k100", "expired", ""]),
+                         {"k000": ("ID0:", {"v": 0}), "k042": ("ID42:", {"v": 42}), "k099": ("ID99:", {"v": 99})})
+        snapshot.close()
+        empty_path = os.path.join(self.directory, "empty.ciq")
+        write_snapshot(empty_path, [])
+        self.assertEqual(CacheSnapshot(empty_path).get_many(["k000"]), {})
+        with open(os.path.join(self.directory, "other"), "wb") as f:
+            f.write(b"x" * 64)
+        self.assertRaises(ValueError, CacheSnapshot, os.path.join(self.directory, "other"))
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_warm_start(self, mocked_post):
+        path = os.path.join(self.directory, "snapshot.ciq")
+        cache = DatapointCache(':memory:')
+        ciq_client = CapIQClient("username", "password", cache=cache)
+        ciq_client.gdsp(["TRIP", "IBM"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(export_snapshot(cache, path), 2)
+        self.assertEqual(mocked_post.call_count, 1)
+
+        store = DatapointCache(':memory:')
+        ciq_client = CapIQClient("username", "password", cache=store, snapshots=[path])
+        return_value = ciq_client.gdsp(["TRIP", "IBM", "AAPL"], ["IQ_CLOSEPRICE"], ["close_price"], [{}],
+                                       compact=True)
+        self.assertEqual(return_value, {'TRIP:': {'close_price': 'TRIP-IQ_CLOSEPRICE'},
+                                        'IBM:': {'close_price': 'IBM-IQ_CLOSEPRICE'},
+                                        'AAPL:': {'close_price': 'AAPL-IQ_CLOSEPRICE'}})
+        self.assertEqual(json.loads(mocked_post.call_args[1]['data'])['inputRequests'],
+                         [{"function": "GDSP", "identifier": "AAPL", "mnemonic": "IQ_CLOSEPRICE", "properties": {}}])
+        # only what the snapshot did not hold is written to the store
+        self.assertEqual(store.get_size(), 1)
+
+        # without a store nothing fetched is cached
+        ciq_client = CapIQClient("username", "password", snapshots=[path])
+        ciq_client.gdsp(["AAPL"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        ciq_client.gdsp(["AAPL"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(mocked_post.call_count, 4)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_export_tiered_cache(self, mocked_post):
+        path = os.path.join(self.directory, "snapshot.ciq")
+        cache = TieredCache(DatapointCache(':memory:'))
+        CapIQClient("username", "password", cache=cache).gdsp(["TRIP", "IBM"], ["IQ_CLOSEPRICE"], ["close_price"],
+                                                               [{}])
+        self.assertEqual(export_snapshot(cache, path), 2)
+        ciq_client = CapIQClient("username", "password", snapshots=[path])
+        return_value = ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(return_value, {'TRIP:': {'close_price': 'TRIP-IQ_CLOSEPRICE'}})
+        self.assertEqual(mocked_post.call_count, 1)
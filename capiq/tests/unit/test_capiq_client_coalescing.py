@@ -0,0 +1,111 @@
+import json
+import threading
+import unittest
+
+from mock import mock
+
+from capiq.capiq_client import CapIQClient, CiqServiceException
+
+
+def mocked_echo_requests_post(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+    if args[0] is not None:
+        response = []
+        for input_request in json.loads(kwargs['data'])['inputRequests']:
+            response.append({
+                "Headers": [input_request['mnemonic']],
+                "Rows": [{"Row": [input_request['identifier'] + "-" + input_request['mnemonic']]}],
+                "NumCols": 1,
+                "Seniority": "",
+                "Mnemonic": input_request['mnemonic'],
+                "Function": input_request['function'],
+                "ErrMsg": None,
+                "Properties": {},
+                "NumRows": 1,
+                "CacheExpiryTime": "0",
+                "Identifier": input_request['identifier'] + ":",
+                "Limit": ""
+            })
+        return MockResponse({"GDSSDKResponse": response}, 200)
+
+
+def mocked_limit_requests_post(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+    if args[0] is not None:
+        return MockResponse({'GDSSDKResponse': [{'ErrMsg': 'Daily Request Limit of 10000 Exceeded'}]}, 200)
+
+
+class TestCapiqClientCoalescing(unittest.TestCase):
+
+    def run_concurrently(self, calls):
+        results = [None] * len(calls)
+        barrier = threading.Barrier(len(calls))
+
+        def run(i):
+            barrier.wait()
+            try:
+                results[i] = calls[i]()
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(len(calls))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_identical_requests_share_one_fetch(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", coalesce_window=0.1)
+        results = self.run_concurrently(
+            [lambda: ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])] * 8)
+        self.assertEqual(results, [{'TRIP:': {'close_price': 'TRIP-IQ_CLOSEPRICE'}}] * 8)
+        self.assertEqual(mocked_post.call_count, 1)
+        self.assertEqual(len(json.loads(mocked_post.call_args[1]['data'])['inputRequests']), 1)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_overlapping_requests_are_merged(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", coalesce_window=0.1)
+        results = self.run_concurrently([
+            lambda: ciq_client.gdsp(["TRIP", "IBM"], ["IQ_CLOSEPRICE"], ["close_price"], [{}]),
+            lambda: ciq_client.gdsp(["IBM", "AAPL"], ["IQ_CLOSEPRICE"], ["price"], [{}])
+        ])
+        self.assertEqual(results, [
+            {'TRIP:': {'close_price': 'TRIP-IQ_CLOSEPRICE'}, 'IBM:': {'close_price': 'IBM-IQ_CLOSEPRICE'}},
+            {'IBM:': {'price': 'IBM-IQ_CLOSEPRICE'}, 'AAPL:': {'price': 'AAPL-IQ_CLOSEPRICE'}}
+        ])
+        self.assertEqual(mocked_post.call_count, 1)
+        identifiers = [req['identifier'] for req in json.loads(mocked_post.call_args[1]['data'])['inputRequests']]
+        self.assertEqual(sorted(identifiers), ["AAPL", "IBM", "TRIP"])
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_merged_requests_are_batched(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", max_batch_size=2, coalesce_window=0)
+        return_value = ciq_client.gdsp(["TRIP", "IBM", "AAPL"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(return_value["AAPL:"], {'close_price': 'AAPL-IQ_CLOSEPRICE'})
+        self.assertEqual(mocked_post.call_count, 2)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_limit_requests_post)
+    def test_errors_reach_every_caller(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", coalesce_window=0.1)
+        results = self.run_concurrently(
+            [lambda: ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])] * 4)
+        for result in results:
+            self.assertIsInstance(result, CiqServiceException)
+        self.assertEqual(mocked_post.call_count, 1)
+        self.assertEqual(ciq_client._coalescer._in_flight, {})
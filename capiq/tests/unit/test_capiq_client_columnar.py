@@ -0,0 +1,62 @@
+import unittest
+
+import numpy
+from mock import mock
+
+from capiq.capiq_client import CapIQClient
+from capiq.columnar import rows_to_columns
+from capiq.datapoint_cache import DatapointCache
+
+
+def mocked_gdshe_multi_data_requests_post(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+    if args[0] is not None:
+        return MockResponse(
+            {'GDSSDKResponse': [{'Headers': ['IQ_VWAP', 'AsOfDate'],
+                                 'Rows': [{'Row': ['239.900000', '5/23/2017']},
+                                          {'Row': ['Data Unavailable', '5/24/2017']},
+                                          {'Row': ['241.710000', '5/25/2017']}],
+                                 'Seniority': '', 'NumCols': 2, 'Mnemonic': 'IQ_VWAP', 'NumRows': 3,
+                                 'CacheExpiryTime': '0',
+                                 'ErrMsg': '', 'Function': 'GDSHE', 'Frequency': '', 'Identifier': 'TRIP:',
+                                 'Limit': '',
+                                 'Properties': {'startdate': '05/23/2017', 'enddate': '05/25/2017'}}]}
+            , 200)
+
+
+class TestCapiqClientColumnar(unittest.TestCase):
+
+    def assertColumns(self, columns):
+        self.assertEqual(list(columns.keys()), ['IQ_VWAP', 'AsOfDate'])
+        self.assertEqual(columns['IQ_VWAP'].dtype, numpy.float64)
+        self.assertEqual(columns['AsOfDate'].dtype, numpy.dtype('datetime64[D]'))
+        numpy.testing.assert_array_equal(columns['IQ_VWAP'], [239.9, numpy.nan, 241.71])
+        numpy.testing.assert_array_equal(
+            columns['AsOfDate'], numpy.array(['2017-05-23', '2017-05-24', '2017-05-25'], dtype='datetime64[D]'))
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_gdshe_multi_data_requests_post)
+    def test_gdshe_columnar(self, mocked_post):
+        ciq_client = CapIQClient("username", "password")
+        return_value = ciq_client.gdshe(["TRIP"], ["IQ_VWAP"], ["vwap"], start_date="05/23/2017",
+                                        end_date="05/25/2017", columnar=True)
+        self.assertEqual(list(return_value.keys()), ['TRIP:'])
+        self.assertColumns(return_value['TRIP:']['vwap'])
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_gdshe_multi_data_requests_post)
+    def test_gdst_columnar_from_cache(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", cache=DatapointCache(':memory:'))
+        ciq_client.gdst(["TRIP"], ["IQ_VWAP"], ["vwap"], frequency="D")
+        return_value = ciq_client.gdst(["TRIP"], ["IQ_VWAP"], ["vwap"], frequency="D", columnar=True)
+        self.assertEqual(mocked_post.call_count, 1)
+        self.assertColumns(return_value['TRIP:']['vwap'])
+
+    def test_rows_to_columns_without_date(self):
+        columns = rows_to_columns(['IQ_CLOSEPRICE'], [['46.80'], [None]])
+        numpy.testing.assert_array_equal(columns['IQ_CLOSEPRICE'], [46.8, numpy.nan])
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import time
+import unittest
+
+import requests
+from mock import mock
+
+from capiq.async_capiq_client import AsyncCapIQClient
+from capiq.capiq_client import CapIQClient
+from capiq.deadlines import (CancellationToken, Deadline, DeadlineExceededException, RequestCancelledException,
+                             request_deadline)
+from capiq.retry import RetryPolicy
+
+
+class MockResponse:
+    def __init__(self, json_data, status_code):
+        self.json_data = json_data
+        self.status_code = status_code
+
+    def json(self):
+        return self.json_data
+
+
+def echo_response(req):
+    response = []
+    for input_request in req['inputRequests']:
+        response.append({
+            "Headers": [input_request['mnemonic']],
+            "Rows": [{"Row": [input_request['identifier'] + "-" + input_request['mnemonic']]}],
+            "NumCols": 1,
+            "Seniority": "",
+            "Mnemonic": input_request['mnemonic'],
+            "Function": input_request['function'],
+            "ErrMsg": None,
+            "Properties": {},
+            "NumRows": 1,
+            "CacheExpiryTime": "0",
+            "Identifier": input_request['identifier'] + ":",
+            "Limit": ""
+        })
+    return {"GDSSDKResponse": response}
+
+
+def mocked_echo_requests_post(*args, **kwargs):
+    if args[0] is not None:
+        return MockResponse(echo_response(json.loads(kwargs['data'])), 200)
+
+
+def mocked_slow_requests_post(*args, **kwargs):
+    time.sleep(0.05)
+    raise requests.exceptions.ReadTimeout("read timed out")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCapiqClientDeadlines(unittest.TestCase):
+
+    def test_deadline(self):
+        clock = FakeClock()
+        deadline = Deadline(10, clock=clock)
+        self.assertEqual(deadline.get_timeout(None), (10, 10))
+        self.assertEqual(deadline.get_timeout((3, 30)), (3, 10))
+        clock.now = 8
+        self.assertEqual(deadline.get_timeout(5), (2, 2))
+        deadline.check()
+        clock.now = 10
+        with self.assertRaises(DeadlineExceededException):
+            deadline.check()
+        self.assertIsNone(Deadline().remaining())
+        self.assertEqual(Deadline().get_timeout((3, 30)), (3, 30))
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_timeouts_are_passed_to_the_post(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", timeout=(3, 30))
+        ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(mocked_post.call_args[1]['timeout'], (3, 30))
+        with request_deadline(5):
+            ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        connect, read = mocked_post.call_args[1]['timeout']
+        self.assertEqual(connect, 3)
+        self.assertTrue(4 < read <= 5)
+        # every POST has a timeout unless it is turned off
+        CapIQClient("username", "password").gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(mocked_post.call_args[1]['timeout'], (10, 300))
+        CapIQClient("username", "password", timeout=None).gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertIsNone(mocked_post.call_args[1]['timeout'])
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_expired_deadline_sends_nothing(self, mocked_post):
+        ciq_client = CapIQClient("username", "password")
+        with request_deadline(0):
+            with self.assertRaises(DeadlineExceededException):
+                ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(mocked_post.call_count, 0)
+
+    def test_cancellation_stops_remaining_batches(self):
+        token = CancellationToken()
+
+        def cancelling_post(*args, **kwargs):
+            token.cancel()
+            return mocked_echo_requests_post(*args, **kwargs)
+
+        with mock.patch('capiq.capiq_client.requests.Session.post', side_effect=cancelling_post) as mocked_post:
+            ciq_client = CapIQClient("username", "password", max_batch_size=1, max_workers=1)
+            with request_deadline(cancellation=token):
+                with self.assertRaises(RequestCancelledException):
+                    ciq_client.gdsp(["TRIP", "IBM", "AAPL"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(mocked_post.call_count, 1)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_slow_requests_post)
+    def test_timeout_past_the_deadline(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", retry_policy=RetryPolicy(backoff=0.01, jitter=False))
+        with request_deadline(0.02):
+            with self.assertRaises(DeadlineExceededException):
+                ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(mocked_post.call_count, 1)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=requests.exceptions.ConnectionError("down"))
+    def test_retries_stop_at_the_deadline(self, mocked_post):
+        sleeps = []
+        ciq_client = CapIQClient("username", "password",
+                                 retry_policy=RetryPolicy(backoff=10, jitter=False, sleep=sleeps.append))
+        with request_deadline(5):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(mocked_post.call_count, 1)
+        self.assertEqual(sleeps, [])
+
+    def test_async_deadline(self):
+        timeouts = []
+
+        async def mocked_post(req, timeout=None):
+            timeouts.append(timeout)
+            return echo_response(req)
+
+        with mock.patch('capiq.async_capiq_client.AsyncCapIQClient.post', side_effect=mocked_post):
+            ciq_client = AsyncCapIQClient("username", "password", timeout=(3, 30))
+            with request_deadline(5):
+                asyncio.run(ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}]))
+            with request_deadline(0):
+                with self.assertRaises(DeadlineExceededException):
+                    asyncio.run(ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}]))
+        self.assertEqual(len(timeouts), 1)
+        self.assertEqual(timeouts[0].connect, 3)
+        self.assertTrue(4 < timeouts[0].total <= 5)
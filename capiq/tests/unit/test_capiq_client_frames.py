@@ -0,0 +1,97 @@
+import json
+import unittest
+
+import numpy
+import pandas
+from mock import mock
+
+from capiq.capiq_client import CapIQClient
+
+
+def mocked_echo_requests_post(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+    if args[0] is not None:
+        response = []
+        for input_request in json.loads(kwargs['data'])['inputRequests']:
+            if input_request['function'] in ("GDST", "GDSHE"):
+                headers = [input_request['mnemonic'], "AsOfDate"]
+                rows = [{"Row": ["1.5", "5/23/2017"]}, {"Row": ["Data Unavailable", "5/24/2017"]}]
+            elif input_request['identifier'] == "EMPTY":
+                headers = []
+                rows = []
+            elif input_request['mnemonic'] == "IQ_COMPANY_NAME":
+                headers = [input_request['mnemonic']]
+                rows = [{"Row": [input_request['identifier'] + " Inc."]}]
+            elif input_request['mnemonic'] == "IQ_CUSIP":
+                headers = [input_request['mnemonic']]
+                rows = [{"Row": ["037833100"]}]
+            else:
+                headers = [input_request['mnemonic']]
+                rows = [{"Row": ["46.80"]}]
+            response.append({
+                "Headers": headers,
+                "Rows": rows,
+                "NumCols": len(headers),
+                "Seniority": "",
+                "Mnemonic": input_request['mnemonic'],
+                "Function": input_request['function'],
+                "ErrMsg": "SOME ERROR" if input_request['identifier'] == "BAD" else None,
+                "Properties": {},
+                "NumRows": len(rows),
+                "CacheExpiryTime": "0",
+                "Identifier": input_request['identifier'] + ":",
+                "Limit": ""
+            })
+        return MockResponse({"GDSSDKResponse": response}, 200)
+
+
+class TestCapiqClientFrames(unittest.TestCase):
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_gdsp_as_frame(self, mocked_post):
+        ciq_client = CapIQClient("username", "password")
+        frame = ciq_client.gdsp(["TRIP", "BAD"], ["IQ_COMPANY_NAME", "IQ_CLOSEPRICE"], ["name", "close_price"],
+                                [{}, {}], as_frame=True)
+        self.assertEqual(list(frame.index), ["TRIP:", "BAD:"])
+        self.assertEqual(list(frame.columns), ["name", "close_price"])
+        self.assertEqual(frame.index.name, "identifier")
+        self.assertEqual(frame["close_price"].dtype, numpy.float64)
+        self.assertEqual(frame.loc["TRIP:", "close_price"], 46.8)
+        self.assertTrue(numpy.isnan(frame.loc["BAD:", "close_price"]))
+        self.assertEqual(frame.loc["TRIP:", "name"], "TRIP Inc.")
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_gdsp_as_frame_keeps_codes_and_identifiers_without_data(self, mocked_post):
+        ciq_client = CapIQClient("username", "password")
+        frame = ciq_client.gdsp(["AAPL", "EMPTY"], ["IQ_CUSIP", "IQ_CLOSEPRICE"], ["cusip", "close_price"],
+                                [{}, {}], as_frame=True)
+        self.assertEqual(list(frame.index), ["AAPL:", "EMPTY:"])
+        self.assertEqual(frame.loc["AAPL:", "cusip"], "037833100")
+        self.assertEqual(frame.loc["AAPL:", "close_price"], 46.8)
+        self.assertTrue(frame.loc["EMPTY:"].isnull().all())
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_gdsg_as_frame(self, mocked_post):
+        ciq_client = CapIQClient("username", "password")
+        frame = ciq_client.gdsg(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}], as_frame=True)
+        self.assertIsInstance(frame, pandas.DataFrame)
+        self.assertEqual(frame.shape, (1, 1))
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_gdshe_as_frame(self, mocked_post):
+        ciq_client = CapIQClient("username", "password")
+        frame = ciq_client.gdshe(["TRIP", "IBM", "BAD"], ["IQ_VWAP"], ["vwap"], start_date="05/23/2017",
+                                 end_date="05/24/2017", as_frame=True)
+        self.assertEqual(list(frame.index.names), ["identifier", "return_key", "date"])
+        self.assertEqual(list(frame.columns), ["value"])
+        self.assertEqual(frame["value"].dtype, numpy.float64)
+        self.assertEqual(len(frame), 4)
+        self.assertEqual(frame.loc[("IBM:", "vwap", pandas.Timestamp("2017-05-23")), "value"], 1.5)
+        self.assertTrue(numpy.isnan(frame.loc[("TRIP:", "vwap", pandas.Timestamp("2017-05-24")), "value"]))
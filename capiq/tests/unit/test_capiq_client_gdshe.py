@@ -100,19 +100,19 @@ def mocked_gdsg_multi_data_requests_post(*args, **kwargs):
 
 class TestCapiqClientGdshe(unittest.TestCase):
 
-    @mock.patch('capiq.capiq_client.requests.post', side_effect=mocked_gdshe_data_requests_post)
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_gdshe_data_requests_post)
     def test_gdshe_data(self, mocked_post):
         ciq_client = CapIQClient("username", "password")
         return_value = ciq_client.gdshe(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], properties=[{}])
         self.assertEqual(return_value, {'TRIP:': {'close_price': [['46.80']]}})
 
-    @mock.patch('capiq.capiq_client.requests.post', side_effect=mocked_gdshe_no_data_requests_post)
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_gdshe_no_data_requests_post)
     def test_gdshe_no_data(self, mocked_post):
         ciq_client = CapIQClient("username", "password")
         return_value = ciq_client.gdshe(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
         self.assertEqual(return_value, {'TRIP:': {'close_price': None}})
 
-    @mock.patch('capiq.capiq_client.requests.post', side_effect=mocked_gdshe_data_requests_post)
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_gdshe_data_requests_post)
     def test_gdshe_data_no_properties(self, mocked_post):
         ciq_client = CapIQClient("username", "password")
         return_value = ciq_client.gdshe(
@@ -124,7 +124,7 @@ class TestCapiqClientGdshe(unittest.TestCase):
         )
         self.assertEqual(return_value, {'TRIP:': {'close_price': [['46.80']]}})
 
-    @mock.patch('capiq.capiq_client.requests.post', side_effect=mocked_gdsg_multi_data_requests_post)
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_gdsg_multi_data_requests_post)
     def test_gdshe_multi_data_with_name_collision(self, mocked_post):
         ciq_client = CapIQClient("username", "password")
         return_value = ciq_client.gdshe(["TRIP", "TRIP"], ["IQ_VWAP", "IQ_VWAP"], ["vwap1", "vwap2"], properties=[
@@ -68,19 +68,19 @@ def mocked_gdshv_no_data_requests_post(*args, **kwargs):
 
 class TestCapiqClientGdshv(unittest.TestCase):
 
-    @mock.patch('capiq.capiq_client.requests.post', side_effect=mocked_gdshv_data_requests_post)
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_gdshv_data_requests_post)
     def test_gdshv_data(self, mocked_post):
         ciq_client = CapIQClient("username", "password")
         return_value = ciq_client.gdshv(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], properties=[{}])
         self.assertEqual(return_value, {'TRIP:': {'close_price': '46.80'}})
 
-    @mock.patch('capiq.capiq_client.requests.post', side_effect=mocked_gdshv_no_data_requests_post)
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_gdshv_no_data_requests_post)
     def test_gdst_no_data(self, mocked_post):
         ciq_client = CapIQClient("username", "password")
         return_value = ciq_client.gdshv(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
         self.assertEqual(return_value, {'TRIP:': {'close_price': None}})
 
-    @mock.patch('capiq.capiq_client.requests.post', side_effect=mocked_gdshv_data_requests_post)
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_gdshv_data_requests_post)
     def test_gdst_data_no_properties(self, mocked_post):
         ciq_client = CapIQClient("username", "password")
         return_value = ciq_client.gdshv(
@@ -73,13 +73,13 @@ def mocked_gdsp_no_data_requests_post(*args, **kwargs):
 
 class TestCapiqClientGdsp(unittest.TestCase):
 
-    @mock.patch('capiq.capiq_client.requests.post', side_effect=mocked_gdsp_data_requests_post)
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_gdsp_data_requests_post)
     def test_gdsp_data(self, mocked_post):
         ciq_client = CapIQClient("username", "password")
         return_value = ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
         self.assertEqual(return_value, {'TRIP:': {'close_price': '46.80'}})
 
-    @mock.patch('capiq.capiq_client.requests.post', side_effect=mocked_gdsp_no_data_requests_post)
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_gdsp_no_data_requests_post)
     def test_gdsp_no_data(self, mocked_post):
         ciq_client = CapIQClient("username", "password")
         return_value = ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
@@ -76,13 +76,13 @@ def mocked_gdst_no_data_requests_post(*args, **kwargs):
 
 class TestCapiqClientGdst(unittest.TestCase):
 
-    @mock.patch('capiq.capiq_client.requests.post', side_effect=mocked_gdst_data_requests_post)
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_gdst_data_requests_post)
     def test_gdst_data(self, mocked_post):
         ciq_client = CapIQClient("username", "password")
         return_value = ciq_client.gdst(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], properties=[{}])
         self.assertEqual(return_value, {'TRIP:': {'close_price': [['46.80']]}})
 
-    @mock.patch('capiq.capiq_client.requests.post', side_effect=mocked_gdst_data_requests_post)
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_gdst_data_requests_post)
     def test_gdst_data_no_properties(self, mocked_post):
         ciq_client = CapIQClient("username", "password")
         return_value = ciq_client.gdst(
@@ -95,7 +95,7 @@ class TestCapiqClientGdst(unittest.TestCase):
         )
         self.assertEqual(return_value, {'TRIP:': {'close_price': [['46.80']]}})
 
-    @mock.patch('capiq.capiq_client.requests.post', side_effect=mocked_gdst_no_data_requests_post)
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_gdst_no_data_requests_post)
     def test_gdst_no_data(self, mocked_post):
         ciq_client = CapIQClient("username", "password")
         return_value = ciq_client.gdst(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
@@ -0,0 +1,138 @@
+import datetime
+import os
+import tempfile
+import threading
+import unittest
+
+import numpy
+from mock import mock
+
+from capiq.capiq_client import CapIQClient
+from capiq.history_store import HistoryStore
+from capiq.time_series_store import TimeSeriesStore
+from capiq.tests.unit.test_capiq_client_time_series import mocked_daily_requests_post, sent_properties
+
+HEADERS = ["IQ_CLOSEPRICE", "AsOfDate"]
+
+
+def mocked_no_data_requests_post(*args, **kwargs):
+    # entries for "EMPTY" come back without headers or an error, like Cap IQ answers securities without data
+    response = mocked_daily_requests_post(*args, **kwargs)
+    for ret in response.json_data["GDSSDKResponse"]:
+        if ret["Identifier"] == "EMPTY:":
+            ret.update({"Headers": [], "Rows": [], "NumCols": 0, "NumRows": 0})
+    return response
+
+
+class TestCapiqClientHistoryStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_daily_requests_post)
+    def test_only_missing_range_is_requested(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", time_series_store=HistoryStore(self.directory))
+        ciq_client.gdshe(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], start_date="01/01/2020", end_date="01/10/2020")
+        return_value = ciq_client.gdshe(["trip"], ["IQ_CLOSEPRICE"], ["close_price"], start_date="01/05/2020",
+                                        end_date="01/15/2020")
+        self.assertEqual(sent_properties(mocked_post)[1], [{"STARTDATE": "01/11/2020", "ENDDATE": "01/15/2020"}])
+        self.assertEqual(return_value, {'TRIP:': {'close_price': [
+            [str(day), "1/{}/2020".format(day)] for day in range(5, 16)
+        ]}})
+        # another process opening the same directory reads the same history
+        ciq_client = CapIQClient("username", "password", time_series_store=HistoryStore(self.directory))
+        return_value = ciq_client.gdshe(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], start_date="01/01/2020",
+                                        end_date="01/15/2020", columnar=True)
+        self.assertEqual(mocked_post.call_count, 2)
+        columns = return_value['TRIP:']['close_price']
+        self.assertEqual(columns["IQ_CLOSEPRICE"].tolist(), [float(day) for day in range(1, 16)])
+        self.assertEqual(str(columns["AsOfDate"][-1]), "2020-01-15")
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_daily_requests_post)
+    def test_errors_are_not_marked_as_covered(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", time_series_store=HistoryStore(self.directory))
+        for columnar in (False, True):
+            return_value = ciq_client.gdshe(["BAD"], ["IQ_CLOSEPRICE"], ["close_price"], start_date="01/01/2020",
+                                            end_date="01/10/2020", columnar=columnar)
+            self.assertEqual(return_value, {'BAD': {'close_price': None}})
+        self.assertEqual(mocked_post.call_count, 2)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_no_data_requests_post)
+    def test_columnar_series_without_data(self, mocked_post):
+        for store in (TimeSeriesStore(':memory:'), HistoryStore(tempfile.mkdtemp())):
+            ciq_client = CapIQClient("username", "password", time_series_store=store)
+            return_value = ciq_client.gdshe(["EMPTY"], ["IQ_CLOSEPRICE"], ["close_price"], start_date="01/01/2020",
+                                            end_date="01/10/2020", columnar=True)
+            self.assertEqual(return_value, {'EMPTY:': {'close_price': None}})
+            # a range that ends before it starts holds no dates and sends nothing
+            return_value = ciq_client.gdshe(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], start_date="01/10/2020",
+                                            end_date="01/01/2020", columnar=True)
+            self.assertEqual(return_value, {'TRIP': {'close_price': None}})
+        self.assertEqual(mocked_post.call_count, 2)
+
+    def test_rows_come_back_as_sent(self):
+        store = HistoryStore(self.directory)
+        key = store.build_series_key("GDSHE", "TRIP", "IQ_CLOSEPRICE", {})
+        rows = [["46.80", "1/2/2020"], ["Data Unavailable", "1/3/2020"], ["47.1", "1/6/2020"], [None, "01/07/2020"],
+                ["", "1/8/2020"], ["1e3", "1/9/2020"]]
+        store.add(key, "TRIP:", HEADERS, list(reversed(rows)), datetime.date(2020, 1, 1), datetime.date(2020, 1, 10))
+        self.assertEqual(store.get(key, datetime.date(2020, 1, 1), datetime.date(2020, 1, 10)),
+                         ("TRIP:", HEADERS, rows))
+        identifier, headers, columns = store.get_columns(key, datetime.date(2020, 1, 3), datetime.date(2020, 1, 6))
+        self.assertTrue(numpy.isnan(columns["IQ_CLOSEPRICE"][0]))
+        self.assertEqual(columns["IQ_CLOSEPRICE"][1], 47.1)
+        # a single segment is read in place
+        self.assertFalse(columns["IQ_CLOSEPRICE"].flags.writeable)
+        self.assertFalse(columns["IQ_CLOSEPRICE"].flags.owndata)
+        self.assertEqual(store.get_columns(key, datetime.date(2021, 1, 1), datetime.date(2021, 1, 2)),
+                         ("TRIP:", HEADERS, None))
+
+    def test_later_segments_win(self):
+        store = HistoryStore(self.directory)
+        key = store.build_series_key("GDSHE", "TRIP", "IQ_CLOSEPRICE", {})
+        store.add(key, "TRIP:", HEADERS, [["1.00", "1/1/2020"], ["2.00", "1/2/2020"]],
+                  datetime.date(2020, 1, 1), datetime.date(2020, 1, 2))
+        store.add(key, "TRIP:", HEADERS, [["5.00", "1/5/2020"]], datetime.date(2020, 1, 5), datetime.date(2020, 1, 5))
+        store.add(key, "TRIP:", HEADERS, [["2.50", "1/2/2020"], ["3.00", "1/3/2020"]],
+                  datetime.date(2020, 1, 2), datetime.date(2020, 1, 3))
+        start_date, end_date = datetime.date(2020, 1, 1), datetime.date(2020, 1, 31)
+        self.assertEqual(store.get(key, start_date, end_date)[2],
+                         [["1.00", "1/1/2020"], ["2.50", "1/2/2020"], ["3.00", "1/3/2020"], ["5.00", "1/5/2020"]])
+        columns = store.get_columns(key, start_date, end_date)[2]
+        self.assertEqual(columns["IQ_CLOSEPRICE"].tolist(), [1.0, 2.5, 3.0, 5.0])
+        self.assertEqual(store.get_missing_ranges(key, start_date, end_date), [(datetime.date(2020, 1, 4),
+                                                                               datetime.date(2020, 1, 4)),
+                                                                              (datetime.date(2020, 1, 6), end_date)])
+
+    def test_concurrent_ranges_are_all_covered(self):
+        directory = tempfile.mkdtemp()
+        for open_store in (lambda: TimeSeriesStore(os.path.join(directory, "capiq_time_series.sqlite")),
+                           lambda: HistoryStore(directory)):
+            key = TimeSeriesStore.build_series_key("GDSHE", "TRIP", "IQ_CLOSEPRICE", {})
+            start_date = datetime.date(2020, 1, 1)
+
+            # two processes filling alternate days of the same series
+            def add_days(store, first):
+                for day in range(first, 40, 2):
+                    date = start_date + datetime.timedelta(days=day)
+                    store.add(key, "TRIP:", HEADERS, [], date, date)
+
+            stores = [open_store(), open_store()]
+            threads = [threading.Thread(target=add_days, args=(store, first)) for first, store in enumerate(stores)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(stores[0].get_coverage(key), [(start_date, start_date + datetime.timedelta(days=39))])
+
+    def test_query(self):
+        store = HistoryStore(self.directory)
+        for identifier, price in (("TRIP", "1.5"), ("IBM", "2.5")):
+            store.add(store.build_series_key("GDST", identifier, "IQ_CLOSEPRICE", {"FREQUENCY": "D"}),
+                      identifier + ":", HEADERS, [[price, "1/2/2020"]], datetime.date(2020, 1, 1),
+                      datetime.date(2020, 1, 2))
+        result = store.query("GDST", ["TRIP", "IBM", "AAPL"], "IQ_CLOSEPRICE", datetime.date(2020, 1, 1),
+                             datetime.date(2020, 1, 31), {"FREQUENCY": "D"})
+        self.assertEqual(sorted(result), ["IBM", "TRIP"])
+        self.assertEqual(result["IBM"]["IQ_CLOSEPRICE"].tolist(), [2.5])
+        store.close()
@@ -0,0 +1,201 @@
+import asyncio
+import json
+import sqlite3
+import tempfile
+import unittest
+
+from mock import mock
+
+from capiq.async_capiq_client import AsyncCapIQClient
+from capiq.capiq_client import CapIQClient
+from capiq.datapoint_cache import DatapointCache
+from capiq.identifiers import IdentifierIndex
+
+# listings and share classes of one company have trading items of their own
+TRADING_ITEM_IDS = {"IBM:NYSE": "2630413", "US4592001014": "2630413", "AAPL:NASDAQGS": "2590360",
+                    "GOOGL:NASDAQGS": "IQT24742624", "GOOG:NASDAQGS": "IQT322398487"}
+
+
+def resolve_response(req):
+    response = []
+    for input_request in req['inputRequests']:
+        trading_item_id = TRADING_ITEM_IDS.get(input_request['identifier'])
+        if input_request['mnemonic'] == "IQ_TRADING_ITEM_CIQID":
+            value = trading_item_id
+        else:
+            value = input_request['identifier'] + "-" + input_request['mnemonic']
+        # EMPTY is answered without data and without an error
+        empty = input_request['identifier'] == "EMPTY"
+        response.append({
+            "Headers": [] if empty else [input_request['mnemonic']],
+            "Rows": [] if empty else [{"Row": [value]}],
+            "NumCols": 1,
+            "Seniority": "",
+            "Mnemonic": input_request['mnemonic'],
+            "Function": input_request['function'],
+            "ErrMsg": "Invalid Identifier" if value is None and not empty else None,
+            "Properties": {},
+            "NumRows": 1,
+            "CacheExpiryTime": "0",
+            # like Cap IQ, echo tickers without an exchange with a trailing ":"
+            "Identifier": input_request['identifier'] + ("" if ":" in input_request['identifier'] else ":"),
+            "Limit": ""
+        })
+    return {"GDSSDKResponse": response}
+
+
+class ResolvingPost:
+    # answers IQ_TRADING_ITEM_CIQID from TRADING_ITEM_IDS and echoes everything else, remembering what was sent
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, *args, **kwargs):
+        class MockResponse:
+            def __init__(self, json_data, status_code):
+                self.json_data = json_data
+                self.status_code = status_code
+
+            def json(self):
+                return self.json_data
+
+        req = json.loads(kwargs['data'])
+        self.requests.append([(input_request['identifier'], input_request['mnemonic'])
+                              for input_request in req['inputRequests']])
+        return MockResponse(resolve_response(req), 200)
+
+
+class TestCapiqClientIdentifiers(unittest.TestCase):
+
+    def test_identifier_index(self):
+        index = IdentifierIndex(':memory:')
+        index.add_many([("NYSE:IBM", "2630413"), ("US4592001014", "IQT2630413")])
+        self.assertEqual(index.get_many(["ibm:nyse", "US4592001014", "IQT2590360", "TRIP"]),
+                         {"ibm:nyse": "IQT2630413", "US4592001014": "IQT2630413", "IQT2590360": "IQT2590360"})
+        self.assertEqual(index.get_aliases("2630413"), ["IBM:NYSE", "US4592001014"])
+        index.add_unresolved(["BAD"])
+        self.assertEqual(index.get_unknown(["IBM:NYSE", "BAD", "TRIP", "TRIP"]), ["TRIP"])
+        self.assertEqual(index.get_unknown(["AAPL:NASDAQGS", "NASDAQGS:AAPL", "aapl:nasdaqgs"]), ["AAPL:NASDAQGS"])
+        self.assertTrue(IdentifierIndex.is_ciq_id("iqt2630413"))
+
+    def test_aliases_are_fetched_once_and_keyed_as_passed(self):
+        resolving_post = ResolvingPost()
+        index = IdentifierIndex(':memory:')
+        with mock.patch('capiq.capiq_client.requests.Session.post', side_effect=resolving_post):
+            ciq_client = CapIQClient("username", "password", identifier_index=index)
+            return_value = ciq_client.gdsp(["IBM:NYSE", "US4592001014", "BAD"], ["IQ_CLOSEPRICE"],
+                                           ["close_price"], [{}])
+            # identifiers Cap IQ could not resolve are not asked for again
+            ciq_client.gdsp(["BAD"], ["IQ_VOLUME"], ["volume"], [{}])
+        self.assertEqual(return_value, {
+            'IBM:NYSE': {'close_price': 'IQT2630413-IQ_CLOSEPRICE'},
+            'US4592001014': {'close_price': 'IQT2630413-IQ_CLOSEPRICE'},
+            'BAD': {'close_price': 'BAD-IQ_CLOSEPRICE'}
+        })
+        self.assertEqual(resolving_post.requests, [
+            [("IBM:NYSE", "IQ_TRADING_ITEM_CIQID"), ("US4592001014", "IQ_TRADING_ITEM_CIQID"),
+             ("BAD", "IQ_TRADING_ITEM_CIQID")],
+            [("IQT2630413", "IQ_CLOSEPRICE"), ("BAD", "IQ_CLOSEPRICE")],
+            [("BAD", "IQ_VOLUME")]
+        ])
+        self.assertEqual(ciq_client.get_datapoints_saved(), 1)
+
+    def test_aliases_of_one_identifier_are_resolved_once(self):
+        resolving_post = ResolvingPost()
+        with mock.patch('capiq.capiq_client.requests.Session.post', side_effect=resolving_post):
+            ciq_client = CapIQClient("username", "password", identifier_index=IdentifierIndex(':memory:'))
+            return_value = ciq_client.gdsp(["IBM:NYSE", "NYSE:IBM", "EMPTY"], ["IQ_CLOSEPRICE"], ["close_price"],
+                                           [{}])
+            # identifiers Cap IQ had no data for are not asked for again either
+            ciq_client.gdsp(["EMPTY"], ["IQ_VOLUME"], ["volume"], [{}])
+        self.assertEqual(return_value, {
+            'IBM:NYSE': {'close_price': 'IQT2630413-IQ_CLOSEPRICE'},
+            'NYSE:IBM': {'close_price': 'IQT2630413-IQ_CLOSEPRICE'},
+            'EMPTY': {}
+        })
+        self.assertEqual(resolving_post.requests, [
+            [("IBM:NYSE", "IQ_TRADING_ITEM_CIQID"), ("EMPTY", "IQ_TRADING_ITEM_CIQID")],
+            [("IQT2630413", "IQ_CLOSEPRICE"), ("EMPTY", "IQ_CLOSEPRICE")],
+            [("EMPTY", "IQ_VOLUME")]
+        ])
+
+    def test_share_classes_are_not_merged(self):
+        resolving_post = ResolvingPost()
+        index = IdentifierIndex(':memory:')
+        with mock.patch('capiq.capiq_client.requests.Session.post', side_effect=resolving_post):
+            ciq_client = CapIQClient("username", "password", identifier_index=index)
+            return_value = ciq_client.gdsp(["GOOGL:NASDAQGS", "GOOG:NASDAQGS"], ["IQ_CLOSEPRICE"], ["close_price"],
+                                           [{}])
+        self.assertEqual(return_value, {
+            'GOOGL:NASDAQGS': {'close_price': 'IQT24742624-IQ_CLOSEPRICE'},
+            'GOOG:NASDAQGS': {'close_price': 'IQT322398487-IQ_CLOSEPRICE'}
+        })
+        self.assertEqual(resolving_post.requests[1], [("IQT24742624", "IQ_CLOSEPRICE"),
+                                                      ("IQT322398487", "IQ_CLOSEPRICE")])
+        self.assertEqual(ciq_client.get_datapoints_saved(), 0)
+
+    def test_company_ids_of_earlier_versions_are_dropped(self):
+        path = tempfile.mkdtemp() + "/capiq_identifiers.sqlite"
+        connection = sqlite3.connect(path)
+        connection.execute("CREATE TABLE identifiers (alias TEXT PRIMARY KEY, ciq_id TEXT)")
+        connection.executemany("INSERT INTO identifiers VALUES (?, ?)",
+                               [("GOOG:NASDAQGS", "IQ29096"), ("GOOGL:NASDAQGS", "IQT24742624")])
+        connection.commit()
+        connection.close()
+        self.assertEqual(IdentifierIndex(path).get_many(["GOOG:NASDAQGS", "GOOGL:NASDAQGS"]),
+                         {"GOOGL:NASDAQGS": "IQT24742624"})
+
+    def test_cache_hits_with_any_alias(self):
+        resolving_post = ResolvingPost()
+        index = IdentifierIndex(':memory:')
+        with mock.patch('capiq.capiq_client.requests.Session.post', side_effect=resolving_post):
+            ciq_client = CapIQClient("username", "password", identifier_index=index,
+                                     cache=DatapointCache(':memory:'))
+            ciq_client.gdsp(["IBM:NYSE", "US4592001014"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+            return_value = ciq_client.gdsp(["NYSE:IBM"], ["IQ_CLOSEPRICE"], ["close_price"], [{}],
+                                           compact=True)
+        self.assertEqual(return_value, {'NYSE:IBM': {'close_price': 'IQT2630413-IQ_CLOSEPRICE'}})
+        self.assertEqual(len(resolving_post.requests), 2)
+
+    def test_streamed_aliases(self):
+        resolving_post = ResolvingPost()
+
+        def stream_batch(req_array, priority, deadline):
+            return iter(resolve_response({"inputRequests": req_array})["GDSSDKResponse"])
+
+        with mock.patch('capiq.capiq_client.requests.Session.post', side_effect=resolving_post):
+            ciq_client = CapIQClient("username", "password", identifier_index=IdentifierIndex(':memory:'))
+            ciq_client.stream_batch = stream_batch
+            records = list(ciq_client.stream_request(["AAPL:NASDAQGS", "NASDAQGS:AAPL"], ["IQ_CLOSEPRICE"],
+                                                     ["close_price"], [{}], "GDSP", False))
+        self.assertEqual(records, [("AAPL:NASDAQGS", "close_price", "IQT2590360-IQ_CLOSEPRICE"),
+                                   ("NASDAQGS:AAPL", "close_price", "IQT2590360-IQ_CLOSEPRICE")])
+
+    def test_async_resolution(self):
+        calls = []
+
+        async def mocked_post(req, timeout=None):
+            calls.append(req)
+            return resolve_response(req)
+
+        with mock.patch('capiq.async_capiq_client.AsyncCapIQClient.post', side_effect=mocked_post):
+            ciq_client = AsyncCapIQClient("username", "password", identifier_index=IdentifierIndex(':memory:'))
+            return_value = asyncio.run(ciq_client.gdsp(["IBM:NYSE"], ["IQ_CLOSEPRICE"], ["close_price"], [{}]))
+        self.assertEqual(return_value, {'IBM:NYSE': {'close_price': 'IQT2630413-IQ_CLOSEPRICE'}})
+        self.assertEqual(len(calls), 2)
+
+    def test_async_resolution_is_cached(self):
+        calls = []
+
+        async def mocked_post(req, timeout=None):
+            calls.append([input_request['mnemonic'] for input_request in req['inputRequests']])
+            return resolve_response(req)
+
+        cache = DatapointCache(':memory:')
+        with mock.patch('capiq.async_capiq_client.AsyncCapIQClient.post', side_effect=mocked_post):
+            for i in range(2):
+                # a new index every time, as in a new process, so only the cache saves the resolution
+                ciq_client = AsyncCapIQClient("username", "password", identifier_index=IdentifierIndex(':memory:'),
+                                              cache=cache)
+                return_value = asyncio.run(ciq_client.gdsp(["IBM:NYSE"], ["IQ_CLOSEPRICE"], ["close_price"], [{}]))
+                self.assertEqual(return_value, {'IBM:NYSE': {'close_price': 'IQT2630413-IQ_CLOSEPRICE'}})
+        self.assertEqual(calls, [["IQ_TRADING_ITEM_CIQID"], ["IQ_CLOSEPRICE"]])
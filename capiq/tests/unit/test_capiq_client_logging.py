@@ -0,0 +1,32 @@
+import logging
+import unittest
+
+from capiq.capiq_client import CapIQClient
+
+
+class TestCapiqClientLogging(unittest.TestCase):
+
+    def test_constructor_leaves_root_logger_alone(self):
+        root = logging.getLogger()
+        level = root.level
+        handlers = list(root.handlers)
+        CapIQClient("username", "password")
+        self.assertEqual(root.level, level)
+        self.assertEqual(root.handlers, handlers)
+
+    def test_entry_errors_are_logged_on_the_capiq_logger(self):
+        ciq_client = CapIQClient("username", "password")
+        index = CapIQClient.build_mnemonic_return_key_index(["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        with self.assertLogs("capiq", level="ERROR") as logs:
+            ciq_client.parse_response([{"Identifier": "TRIP:", "Mnemonic": "IQ_CLOSEPRICE", "ErrMsg": "Invalid",
+                                        "Headers": [], "Rows": []}], index, False, {})
+        self.assertEqual(logs.output, ["ERROR:capiq:Cap IQ error for TRIP: + IQ_CLOSEPRICE query: Invalid"])
+
+    def test_mapping_does_not_log(self):
+        ciq_client = CapIQClient("username", "password")
+        index = CapIQClient.build_mnemonic_return_key_index(["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        response_entries = [{"Identifier": "TRIP:", "Mnemonic": "IQ_CLOSEPRICE", "ErrMsg": None, "Properties": {},
+                             "Headers": ["IQ_CLOSEPRICE"], "Rows": [{"Row": ["46.80"]}]}]
+        with self.assertRaises(AssertionError):
+            with self.assertLogs(level="DEBUG"):
+                ciq_client.parse_response(response_entries, index, False, {})
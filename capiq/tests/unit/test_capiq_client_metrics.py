@@ -0,0 +1,103 @@
+import json
+import unittest
+
+import requests
+from mock import mock
+
+from capiq.capiq_client import CapIQClient
+from capiq.datapoint_cache import DatapointCache
+from capiq.metrics import InMemoryMetrics, no_timing
+
+
+def mocked_echo_requests_post(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+            self.content = json.dumps(json_data).encode()
+
+        def json(self):
+            return self.json_data
+
+    if args[0] is not None:
+        response = []
+        for input_request in json.loads(kwargs['data'])['inputRequests']:
+            response.append({
+                "Headers": [input_request['mnemonic']],
+                "Rows": [{"Row": [input_request['identifier'] + "-" + input_request['mnemonic']]}],
+                "NumCols": 1,
+                "Seniority": "",
+                "Mnemonic": input_request['mnemonic'],
+                "Function": input_request['function'],
+                "ErrMsg": "Invalid Identifier" if input_request['identifier'] == "BAD" else None,
+                "Properties": {},
+                "NumRows": 1,
+                "CacheExpiryTime": "0",
+                "Identifier": input_request['identifier'] + ":",
+                "Limit": ""
+            })
+        return MockResponse({"GDSSDKResponse": response}, 200)
+
+
+def get_histogram(metrics, name, **labels):
+    for histogram in metrics.snapshot()["histograms"]:
+        if histogram["name"] == name and histogram["labels"] == labels:
+            return histogram
+
+
+class TestCapiqClientMetrics(unittest.TestCase):
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_request_metrics(self, mocked_post):
+        metrics = InMemoryMetrics()
+        ciq_client = CapIQClient("username", "password", max_batch_size=2, metrics=metrics)
+        ciq_client.gdsp(["TRIP", "IBM", "BAD"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(metrics.get_counter("posts"), 2)
+        self.assertEqual(metrics.get_counter("datapoints"), 3)
+        self.assertEqual(metrics.get_counter("entry_errors", mnemonic="IQ_CLOSEPRICE"), 1)
+        for phase in ("serialize", "network", "decode", "map"):
+            self.assertEqual(get_histogram(metrics, "phase_seconds", phase=phase)["count"], 2)
+        batch_size = get_histogram(metrics, "batch_size")
+        self.assertEqual(batch_size["sum"], 3)
+        self.assertEqual(batch_size["buckets"][:2], [(1, 1), (5, 2)])
+        self.assertEqual(get_histogram(metrics, "request_bytes")["count"], 2)
+        self.assertEqual(get_histogram(metrics, "response_bytes")["count"], 2)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_cache_metrics(self, mocked_post):
+        metrics = InMemoryMetrics()
+        ciq_client = CapIQClient("username", "password", cache=DatapointCache(':memory:'), metrics=metrics)
+        ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        ciq_client.gdsp(["TRIP", "IBM"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(metrics.get_counter("cache_hits"), 1)
+        self.assertEqual(metrics.get_counter("cache_misses"), 2)
+        self.assertEqual(metrics.get_counter("datapoints"), 2)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=requests.exceptions.ConnectionError("down"))
+    def test_batch_errors(self, mocked_post):
+        metrics = InMemoryMetrics()
+        ciq_client = CapIQClient("username", "password", metrics=metrics)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(metrics.get_counter("batch_errors", error="ConnectionError"), 1)
+        self.assertEqual(metrics.get_counter("posts"), 0)
+
+    def test_disabled_metrics(self):
+        ciq_client = CapIQClient("username", "password")
+        self.assertIs(ciq_client.time_phase("network"), no_timing)
+
+    def test_prometheus_export(self):
+        metrics = InMemoryMetrics(buckets={"batch_size": (10, 100)})
+        metrics.increment("entry_errors", mnemonic="IQ_CLOSEPRICE")
+        metrics.observe("batch_size", 10)
+        metrics.observe("batch_size", 500)
+        self.assertEqual(metrics.to_prometheus().splitlines(), [
+            'capiq_entry_errors_total{mnemonic="IQ_CLOSEPRICE"} 1',
+            'capiq_batch_size_bucket{le="10"} 1',
+            'capiq_batch_size_bucket{le="100"} 1',
+            'capiq_batch_size_bucket{le="+Inf"} 2',
+            'capiq_batch_size_count 2',
+            'capiq_batch_size_sum 510'
+        ])
+        metrics.reset()
+        self.assertEqual(metrics.snapshot(), {"counters": [], "histograms": []})
@@ -0,0 +1,139 @@
+import json
+import unittest
+
+from mock import mock
+
+from capiq.capiq_client import CapIQClient
+from capiq.datapoint_cache import DatapointCache
+from capiq.metrics import InMemoryMetrics
+from capiq.planning import RequestPlan, canonicalize_identifier
+
+
+class EchoPost:
+    # answers every input request with its identifier and mnemonic, and remembers what was sent
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, *args, **kwargs):
+        class MockResponse:
+            def __init__(self, json_data, status_code):
+                self.json_data = json_data
+                self.status_code = status_code
+
+            def json(self):
+                return self.json_data
+
+            def iter_content(self, chunk_size=1):
+                yield json.dumps(self.json_data).encode()
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, exc_type, exc_value, traceback):
+                pass
+
+        input_requests = json.loads(kwargs['data'])['inputRequests']
+        self.requests.append([(input_request['identifier'], input_request['mnemonic'])
+                              for input_request in input_requests])
+        response = []
+        for input_request in input_requests:
+            response.append({
+                "Headers": [input_request['mnemonic']],
+                "Rows": [{"Row": [input_request['identifier'] + "-" + input_request['mnemonic']]}],
+                "NumCols": 1,
+                "Seniority": "",
+                "Mnemonic": input_request['mnemonic'],
+                "Function": input_request['function'],
+                "ErrMsg": None,
+                "Properties": input_request['properties'],
+                "NumRows": 1,
+                "CacheExpiryTime": "0",
+                "Identifier": input_request['identifier'],
+                "Limit": ""
+            })
+        return MockResponse({"GDSSDKResponse": response}, 200)
+
+
+class TestCapiqClientPlanning(unittest.TestCase):
+
+    def test_canonicalize_identifier(self):
+        self.assertEqual(canonicalize_identifier("NYSE:IBM"), "IBM:NYSE")
+        self.assertEqual(canonicalize_identifier(" ibm:nyse "), "IBM:NYSE")
+        self.assertEqual(canonicalize_identifier("IQ112350"), "IQ112350")
+        self.assertEqual(canonicalize_identifier("NYSE:TSX"), "NYSE:TSX")
+
+    def test_plan(self):
+        plan = RequestPlan([
+            {"function": "GDSP", "identifier": "IBM:NYSE", "mnemonic": "IQ_CLOSEPRICE", "properties": {}},
+            {"function": "GDSP", "identifier": "NYSE:IBM", "mnemonic": "iq_closeprice", "properties": {}},
+            {"function": "GDSP", "identifier": "IBM:NYSE", "mnemonic": "IQ_CLOSEPRICE",
+             "properties": {"currencyId": "USD"}},
+            {"function": "GDSP", "identifier": "IBM:NYSE", "mnemonic": "IQ_CLOSEPRICE",
+             "properties": {"CURRENCYID": "USD"}},
+        ])
+        self.assertEqual(plan.wire_indices, [0, 2])
+        self.assertEqual(plan.duplicates, [(1, 0), (3, 1)])
+        self.assertEqual(plan.saved, 2)
+
+    def test_duplicate_return_keys_are_sent_once(self):
+        echo_post = EchoPost()
+        metrics = InMemoryMetrics()
+        with mock.patch('capiq.capiq_client.requests.Session.post', side_effect=echo_post):
+            ciq_client = CapIQClient("username", "password", metrics=metrics)
+            return_value = ciq_client.gdsp(["TRIP", "IBM"], ["IQ_CLOSEPRICE", "IQ_CLOSEPRICE"],
+                                           ["close_price", "price"], [{}, {}])
+        self.assertEqual(echo_post.requests, [[("TRIP", "IQ_CLOSEPRICE"), ("IBM", "IQ_CLOSEPRICE")]])
+        self.assertEqual(return_value, {
+            'TRIP': {'close_price': 'TRIP-IQ_CLOSEPRICE', 'price': 'TRIP-IQ_CLOSEPRICE'},
+            'IBM': {'close_price': 'IBM-IQ_CLOSEPRICE', 'price': 'IBM-IQ_CLOSEPRICE'}
+        })
+        self.assertEqual(ciq_client.get_datapoints_saved(), 2)
+        self.assertEqual(metrics.get_counter("datapoints"), 2)
+        self.assertEqual(metrics.get_counter("datapoints_saved"), 2)
+
+    def test_identifier_aliases_are_sent_once(self):
+        echo_post = EchoPost()
+        with mock.patch('capiq.capiq_client.requests.Session.post', side_effect=echo_post):
+            ciq_client = CapIQClient("username", "password", cache=DatapointCache(':memory:'))
+            return_value = ciq_client.gdsp(["IBM:NYSE", "NYSE:IBM", "IBM:NYSE"], ["IQ_CLOSEPRICE"],
+                                           ["close_price"], [{}])
+            self.assertEqual(return_value, {
+                'IBM:NYSE': {'close_price': 'IBM:NYSE-IQ_CLOSEPRICE'},
+                'NYSE:IBM': {'close_price': 'IBM:NYSE-IQ_CLOSEPRICE'}
+            })
+            # the alias is cached under its own spelling
+            return_value = ciq_client.gdsp(["NYSE:IBM"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(return_value, {'NYSE:IBM': {'close_price': 'IBM:NYSE-IQ_CLOSEPRICE'}})
+        self.assertEqual(echo_post.requests, [[("IBM:NYSE", "IQ_CLOSEPRICE")]])
+
+    def test_case_only_duplicates_keep_the_cached_identifier(self):
+        echo_post = EchoPost()
+        with mock.patch('capiq.capiq_client.requests.Session.post', side_effect=echo_post):
+            ciq_client = CapIQClient("username", "password", cache=DatapointCache(':memory:'))
+            return_value = ciq_client.gdsp(["IBM", "ibm"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+            self.assertEqual(return_value, {
+                'IBM': {'close_price': 'IBM-IQ_CLOSEPRICE'},
+                'ibm': {'close_price': 'IBM-IQ_CLOSEPRICE'}
+            })
+            return_value = ciq_client.gdsp(["IBM"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(return_value, {'IBM': {'close_price': 'IBM-IQ_CLOSEPRICE'}})
+        self.assertEqual(len(echo_post.requests), 1)
+
+    def test_identical_time_series_properties_are_sent_once(self):
+        echo_post = EchoPost()
+        with mock.patch('capiq.capiq_client.requests.Session.post', side_effect=echo_post):
+            ciq_client = CapIQClient("username", "password")
+            return_value = ciq_client.gdst(["TRIP"], ["IQ_CLOSEPRICE", "IQ_CLOSEPRICE"], ["close", "last"],
+                                           start_date="01/01/2017", end_date="12/31/2017", frequency="Monthly")
+        self.assertEqual(len(echo_post.requests[0]), 1)
+        self.assertEqual(return_value['TRIP']['close'], return_value['TRIP']['last'])
+
+    def test_streamed_duplicates(self):
+        echo_post = EchoPost()
+        with mock.patch('capiq.capiq_client.requests.Session.post', side_effect=echo_post):
+            ciq_client = CapIQClient("username", "password")
+            records = list(ciq_client.stream_request(["TRIP", "trip"], ["IQ_CLOSEPRICE"], ["close_price"], [{}],
+                                                     "GDSP", False))
+        self.assertEqual(records, [("TRIP", "close_price", "TRIP-IQ_CLOSEPRICE"),
+                                   ("trip", "close_price", "TRIP-IQ_CLOSEPRICE")])
+        self.assertEqual(echo_post.requests, [[("TRIP", "IQ_CLOSEPRICE")]])
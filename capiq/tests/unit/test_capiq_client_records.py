@@ -0,0 +1,114 @@
+import json
+import math
+import unittest
+
+from mock import mock
+
+from capiq.capiq_client import CapIQClient
+from capiq.datapoint_cache import DatapointCache
+from capiq.records import CompactResult, Datapoint, SeriesRows
+
+
+def mocked_echo_requests_post(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+    if args[0] is not None:
+        response = []
+        for input_request in json.loads(kwargs['data'])['inputRequests']:
+            if input_request['function'] in ("GDST", "GDSHE"):
+                headers = [input_request['mnemonic'], "AsOfDate"]
+                rows = [{"Row": ["1.5", "5/23/2017"]}, {"Row": ["Data Unavailable", "5/24/2017"]},
+                        {"Row": ["2", "5/25/2017"]}]
+            elif input_request['mnemonic'] == "IQ_COMPANY_NAME":
+                headers = [input_request['mnemonic']]
+                rows = [{"Row": [input_request['identifier'] + " Inc."]}]
+            else:
+                headers = [input_request['mnemonic']]
+                rows = [{"Row": ["46.80"]}]
+            response.append({
+                "Headers": headers,
+                "Rows": rows,
+                "NumCols": len(headers),
+                "Seniority": "",
+                "Mnemonic": input_request['mnemonic'],
+                "Function": input_request['function'],
+                "ErrMsg": "SOME ERROR" if input_request['identifier'] == "BAD" else None,
+                "Properties": {},
+                "NumRows": len(rows),
+                "CacheExpiryTime": "0",
+                "Identifier": input_request['identifier'] + ":",
+                "Limit": ""
+            })
+        return MockResponse({"GDSSDKResponse": response}, 200)
+
+
+class TestCapiqClientRecords(unittest.TestCase):
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_gdsp_compact(self, mocked_post):
+        ciq_client = CapIQClient("username", "password")
+        result = ciq_client.gdsp(["TRIP", "BAD"], ["IQ_COMPANY_NAME", "IQ_CLOSEPRICE"], ["name", "close_price"],
+                                 [{}, {}], compact=True)
+        self.assertIsInstance(result, CompactResult)
+        self.assertEqual(result, {
+            'TRIP:': {'name': 'TRIP Inc.', 'close_price': 46.8},
+            'BAD:': {'name': None, 'close_price': None}
+        })
+        self.assertEqual(result.to_dict(), dict(result))
+        self.assertEqual(result["TRIP:"]["close_price"], 46.8)
+        # identifiers with the same return keys share them
+        self.assertIs(result["TRIP:"].fields, result["BAD:"].fields)
+        self.assertEqual(result.get("IBM:"), None)
+        self.assertEqual(sorted(result["TRIP:"].keys()), ["close_price", "name"])
+        datapoint = next(result.datapoints())
+        self.assertIsInstance(datapoint, Datapoint)
+        self.assertEqual((datapoint.identifier, datapoint.mnemonic, datapoint.return_key, datapoint.value),
+                         ("TRIP:", "IQ_COMPANY_NAME", "name", "TRIP Inc."))
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_gdshe_compact(self, mocked_post):
+        ciq_client = CapIQClient("username", "password")
+        result = ciq_client.gdshe(["TRIP", "IBM"], ["IQ_VWAP"], ["vwap"], start_date="05/23/2017",
+                                  end_date="05/25/2017", compact=True)
+        rows = result["IBM:"]["vwap"]
+        self.assertIsInstance(rows, SeriesRows)
+        self.assertEqual(rows.headers, ("IQ_VWAP", "AsOfDate"))
+        self.assertEqual(rows, [[1.5, "5/23/2017"], ["Data Unavailable", "5/24/2017"], [2.0, "5/25/2017"]])
+        self.assertEqual(rows[-1], [2.0, "5/25/2017"])
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(math.isnan(rows.column("IQ_VWAP")[1]))
+        self.assertEqual(rows.column("AsOfDate"), ("5/23/2017", "5/24/2017", "5/25/2017"))
+        # the same dates of every identifier share one string
+        self.assertIs(rows.column("AsOfDate")[0], result["TRIP:"]["vwap"].column("AsOfDate")[0])
+        self.assertEqual(result.to_dict()["IBM:"]["vwap"][0], [1.5, "5/23/2017"])
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_cached_compact(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", cache=DatapointCache(':memory:'))
+        ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        result = ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}], compact=True)
+        self.assertEqual(mocked_post.call_count, 1)
+        self.assertEqual(result, {'TRIP:': {'close_price': 46.8}})
+        self.assertEqual(next(result.datapoints()).mnemonic, "IQ_CLOSEPRICE")
+
+    def test_compact_values(self):
+        result = CompactResult()
+        result.add("TRIP:", "IQ_TICKER", "ticker", "NaN")
+        result.add("TRIP:", "IQ_CLOSEPRICE", "close_price", "")
+        result.add("TRIP:", "IQ_CLOSEPRICE", "close_price", "-1.5e3")
+        self.assertEqual(result, {'TRIP:': {'ticker': 'NaN', 'close_price': -1500.0}})
+        self.assertEqual(len(result["TRIP:"]), 2)
+
+    def test_zero_padded_codes_stay_text(self):
+        result = CompactResult()
+        result.add("AAPL:", "IQ_CUSIP", "cusip", "037833100")
+        result.add("AAPL:", "IQ_SIC_CODE", "sic", "0100")
+        result.add("AAPL:", "IQ_CLOSEPRICE", "close_price", "0.5")
+        result.add("AAPL:", "IQ_SHARESOUTSTANDING", "shares", "0")
+        self.assertEqual(result, {'AAPL:': {'cusip': '037833100', 'sic': '0100', 'close_price': 0.5, 'shares': 0.0}})
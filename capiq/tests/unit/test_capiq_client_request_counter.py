@@ -0,0 +1,159 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import mock
+
+from capiq.capiq_client import CapIQClient
+from capiq.request_counter import (BufferedRequestCounter, FileRequestCounter, LocalCounterStore,
+                                   RemoteRequestCounter, RequestCounter, SQLiteRequestCounter)
+from capiq.scheduler import QuotaExceededException, RequestScheduler
+
+
+def mocked_echo_requests_post(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+    if args[0] is not None:
+        response = []
+        for input_request in json.loads(kwargs['data'])['inputRequests']:
+            response.append({
+                "Headers": [input_request['mnemonic']],
+                "Rows": [{"Row": [input_request['identifier'] + "-" + input_request['mnemonic']]}],
+                "NumCols": 1,
+                "Seniority": "",
+                "Mnemonic": input_request['mnemonic'],
+                "Function": input_request['function'],
+                "ErrMsg": None,
+                "Properties": {},
+                "NumRows": 1,
+                "CacheExpiryTime": "0",
+                "Identifier": input_request['identifier'] + ":",
+                "Limit": ""
+            })
+        return MockResponse({"GDSSDKResponse": response}, 200)
+
+
+def increment_file_counter(path):
+    counter = FileRequestCounter(path)
+    for i in range(50):
+        counter.increment(1)
+
+
+def increment_sqlite_counter(path):
+    counter = SQLiteRequestCounter(path)
+    for i in range(50):
+        counter.increment(1)
+    counter.close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingCounter(RequestCounter):
+    def __init__(self):
+        self.total = 0
+        self.calls = 0
+
+    def increment(self, count):
+        self.calls += 1
+        self.total += count
+        return self.total
+
+
+class TestCapiqClientRequestCounter(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_processes(self, target, path):
+        processes = [multiprocessing.Process(target=target, args=(path,)) for i in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+    def test_file_counter_is_shared_by_processes(self):
+        path = os.path.join(self.directory, "request_count_cache")
+        self.run_processes(increment_file_counter, path)
+        self.assertEqual(FileRequestCounter(path).get(), 200)
+        with open(path) as cache_file:
+            self.assertEqual(cache_file.read(), "{},200".format(RequestCounter.today()))
+
+    def test_file_counter_starts_again_every_day(self):
+        path = os.path.join(self.directory, "request_count_cache")
+        with open(path, "w") as cache_file:
+            cache_file.write("2000-01-01,9000")
+        counter = FileRequestCounter(path)
+        self.assertEqual(counter.get(), 0)
+        self.assertEqual(counter.increment(3), 3)
+
+    def test_sqlite_counter_is_shared_by_processes(self):
+        path = os.path.join(self.directory, "request_count.sqlite")
+        self.run_processes(increment_sqlite_counter, path)
+        self.assertEqual(SQLiteRequestCounter(path).get(), 200)
+
+    def test_remote_counter(self):
+        store = LocalCounterStore()
+        first = RemoteRequestCounter(store)
+        second = RemoteRequestCounter(store)
+        self.assertEqual(first.increment(5), 5)
+        self.assertEqual(second.increment(2), 7)
+        self.assertEqual(first.get(), 7)
+        self.assertEqual(RemoteRequestCounter(store, key_prefix="other").get(), 0)
+
+    def test_buffered_counter(self):
+        clock = FakeClock()
+        backend = CountingCounter()
+        counter = BufferedRequestCounter(backend, flush_every=10, flush_interval=1.0, clock=clock)
+        self.assertEqual(counter.increment(1), 1)
+        for i in range(9):
+            counter.increment(1)
+        self.assertEqual(counter.get(), 10)
+        self.assertEqual(backend.total, 1)
+        counter.increment(1)
+        self.assertEqual(backend.total, 11)
+        counter.increment(1)
+        clock.now = 1.0
+        counter.get()
+        self.assertEqual(backend.total, 12)
+        self.assertEqual(backend.calls, 3)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_client_counts_requests(self, mocked_post):
+        store = LocalCounterStore()
+        first = CapIQClient("username", "password", request_counter=RemoteRequestCounter(store))
+        second = CapIQClient("username", "password", request_counter=RemoteRequestCounter(store))
+        first.gdsp(["TRIP", "IBM"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        second.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(second.get_request_count(), 3)
+        self.assertEqual(first.get_cached_request_count(), 3)
+
+    def test_schedulers_share_a_budget(self):
+        store = LocalCounterStore()
+        first = RequestScheduler(daily_budget=10, reserve=0, counter=RemoteRequestCounter(store))
+        second = RequestScheduler(daily_budget=10, reserve=0, counter=RemoteRequestCounter(store))
+        first.acquire(6)
+        with self.assertRaises(QuotaExceededException):
+            second.acquire(5)
+        second.acquire(4)
+        self.assertEqual(first.get_remaining(), 0)
+        first.release(6)
+        self.assertEqual(second.get_used(), 4)
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import unittest
+
+import requests
+from mock import mock
+
+from capiq.async_capiq_client import AsyncCapIQClient
+from capiq.capiq_client import CapIQClient, CiqServiceException
+from capiq.metrics import InMemoryMetrics
+from capiq.retry import CircuitBreaker, CircuitOpenException, RetryPolicy
+
+
+class MockResponse:
+    def __init__(self, json_data, status_code):
+        self.json_data = json_data
+        self.status_code = status_code
+
+    def json(self):
+        return self.json_data
+
+
+def echo_response(req, errors=None):
+    response = []
+    for input_request in req['inputRequests']:
+        response.append({
+            "Headers": [input_request['mnemonic']],
+            "Rows": [{"Row": [input_request['identifier'] + "-" + input_request['mnemonic']]}],
+            "NumCols": 1,
+            "Seniority": "",
+            "Mnemonic": input_request['mnemonic'],
+            "Function": input_request['function'],
+            "ErrMsg": (errors or {}).get(input_request['identifier']),
+            "Properties": {},
+            "NumRows": 1,
+            "CacheExpiryTime": "0",
+            "Identifier": input_request['identifier'] + ":",
+            "Limit": ""
+        })
+    return {"GDSSDKResponse": response}
+
+
+class FlakyPost:
+    # fails the first calls with each of failures in turn, then echoes the request
+    def __init__(self, failures, errors=None):
+        self.failures = list(failures)
+        self.errors = errors
+        self.requests = []
+
+    def __call__(self, *args, **kwargs):
+        req = json.loads(kwargs['data'])
+        self.requests.append([input_request['identifier'] for input_request in req['inputRequests']])
+        if self.failures:
+            failure = self.failures.pop(0)
+            if isinstance(failure, Exception):
+                raise failure
+            if isinstance(failure, int):
+                return MockResponse(None, failure)
+            return MockResponse(echo_response(req, failure), 200)
+        return MockResponse(echo_response(req), 200)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def no_wait_policy(max_attempts=3):
+    return RetryPolicy(max_attempts=max_attempts, sleep=lambda seconds: None)
+
+
+class TestCapiqClientRetry(unittest.TestCase):
+
+    def test_transport_failures_are_retried(self):
+        flaky_post = FlakyPost([requests.exceptions.ConnectionError("reset"), 503])
+        with mock.patch('capiq.capiq_client.requests.Session.post', side_effect=flaky_post):
+            metrics = InMemoryMetrics()
+            ciq_client = CapIQClient("username", "password", retry_policy=no_wait_policy(), metrics=metrics)
+            return_value = ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(return_value, {'TRIP:': {'close_price': 'TRIP-IQ_CLOSEPRICE'}})
+        self.assertEqual(len(flaky_post.requests), 3)
+        self.assertEqual(metrics.get_counter("retries"), 2)
+
+    def test_gives_up_after_max_attempts(self):
+        flaky_post = FlakyPost([requests.exceptions.Timeout("timeout")] * 3)
+        with mock.patch('capiq.capiq_client.requests.Session.post', side_effect=flaky_post):
+            ciq_client = CapIQClient("username", "password", retry_policy=no_wait_policy(max_attempts=2))
+            with self.assertRaises(requests.exceptions.Timeout):
+                ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(len(flaky_post.requests), 2)
+
+    def test_other_failures_are_not_retried(self):
+        flaky_post = FlakyPost([ValueError("bad json"), 400])
+        with mock.patch('capiq.capiq_client.requests.Session.post', side_effect=flaky_post):
+            ciq_client = CapIQClient("username", "password", retry_policy=no_wait_policy())
+            with self.assertRaises(ValueError):
+                ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(len(flaky_post.requests), 1)
+
+    def test_only_transient_entries_are_resubmitted(self):
+        flaky_post = FlakyPost([{"IBM": "Request timed out", "AAPL": "Invalid Identifier"},
+                                {"IBM": "Service temporarily unavailable"}])
+        with mock.patch('capiq.capiq_client.requests.Session.post', side_effect=flaky_post):
+            ciq_client = CapIQClient("username", "password", retry_policy=no_wait_policy())
+            return_value = ciq_client.gdsp(["TRIP", "IBM", "AAPL"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(return_value, {
+            'TRIP:': {'close_price': 'TRIP-IQ_CLOSEPRICE'},
+            'IBM:': {'close_price': 'IBM-IQ_CLOSEPRICE'},
+            'AAPL:': {'close_price': None}
+        })
+        self.assertEqual(flaky_post.requests, [["TRIP", "IBM", "AAPL"], ["IBM"], ["IBM"]])
+
+    def test_succeeded_entries_are_kept_when_retries_fail(self):
+        flaky_post = FlakyPost([{"IBM": "Request timed out"}, requests.exceptions.ConnectionError("reset")])
+        with mock.patch('capiq.capiq_client.requests.Session.post', side_effect=flaky_post):
+            ciq_client = CapIQClient("username", "password", retry_policy=no_wait_policy(max_attempts=2))
+            return_value = ciq_client.gdsp(["TRIP", "IBM", "AAPL"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(return_value, {
+            'TRIP:': {'close_price': 'TRIP-IQ_CLOSEPRICE'},
+            'IBM:': {'close_price': None},
+            'AAPL:': {'close_price': 'AAPL-IQ_CLOSEPRICE'}
+        })
+        self.assertEqual(flaky_post.requests, [["TRIP", "IBM", "AAPL"], ["IBM"]])
+
+    def test_backoff(self):
+        policy = RetryPolicy(backoff=1, max_backoff=5, jitter=False)
+        self.assertEqual([policy.get_backoff(attempt) for attempt in range(5)], [1, 2, 4, 5, 5])
+        policy = RetryPolicy(backoff=1, max_backoff=5)
+        for attempt in range(5):
+            self.assertTrue(0 <= policy.get_backoff(attempt) <= min(5, 2 ** attempt))
+
+    def test_circuit_breaker(self):
+        clock = FakeClock()
+        flaky_post = FlakyPost([requests.exceptions.ConnectionError("down")] * 3)
+        with mock.patch('capiq.capiq_client.requests.Session.post', side_effect=flaky_post):
+            ciq_client = CapIQClient("username", "password",
+                                     circuit_breaker=CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock))
+            for i in range(2):
+                with self.assertRaises(requests.exceptions.ConnectionError):
+                    ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+            with self.assertRaises(CircuitOpenException):
+                ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+            self.assertEqual(len(flaky_post.requests), 2)
+            # the trial batch fails, so the circuit stays open
+            clock.now = 30
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+            with self.assertRaises(CircuitOpenException):
+                ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+            clock.now = 60
+            return_value = ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+            self.assertEqual(return_value, {'TRIP:': {'close_price': 'TRIP-IQ_CLOSEPRICE'}})
+            ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(len(flaky_post.requests), 5)
+
+    def test_open_circuit_is_not_retried(self):
+        breaker = CircuitBreaker(failure_threshold=1)
+        breaker.record_failure()
+        ciq_client = CapIQClient("username", "password", retry_policy=no_wait_policy(), circuit_breaker=breaker)
+        with mock.patch('capiq.capiq_client.requests.Session.post') as mocked_post:
+            with self.assertRaises(CircuitOpenException):
+                ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(mocked_post.call_count, 0)
+        self.assertIsInstance(CircuitOpenException("open"), CiqServiceException)
+
+    def test_async_retry(self):
+        calls = []
+
+        async def flaky_post(req, timeout=None):
+            calls.append([input_request['identifier'] for input_request in req['inputRequests']])
+            if len(calls) == 1:
+                raise ConnectionResetError("reset")
+            if len(calls) == 2:
+                return echo_response(req, {"IBM": "Request timed out"})
+            return echo_response(req)
+
+        with mock.patch('capiq.async_capiq_client.AsyncCapIQClient.post', side_effect=flaky_post):
+            metrics = InMemoryMetrics()
+            ciq_client = AsyncCapIQClient("username", "password",
+                                          retry_policy=RetryPolicy(max_attempts=3, backoff=0), metrics=metrics)
+            return_value = asyncio.run(ciq_client.gdsp(["TRIP", "IBM"], ["IQ_CLOSEPRICE"], ["close_price"], [{}]))
+        self.assertEqual(return_value, {
+            'TRIP:': {'close_price': 'TRIP-IQ_CLOSEPRICE'},
+            'IBM:': {'close_price': 'IBM-IQ_CLOSEPRICE'}
+        })
+        self.assertEqual(calls, [["TRIP", "IBM"], ["TRIP", "IBM"], ["IBM"]])
+        self.assertEqual(metrics.get_counter("retries"), 2)
+
+    def test_async_succeeded_entries_are_kept_when_retries_fail(self):
+        calls = []
+
+        async def flaky_post(req, timeout=None):
+            calls.append(req)
+            if len(calls) == 1:
+                return echo_response(req, {"IBM": "Request timed out"})
+            raise ConnectionResetError("reset")
+
+        with mock.patch('capiq.async_capiq_client.AsyncCapIQClient.post', side_effect=flaky_post):
+            ciq_client = AsyncCapIQClient("username", "password",
+                                          retry_policy=RetryPolicy(max_attempts=2, backoff=0))
+            return_value = asyncio.run(ciq_client.gdsp(["TRIP", "IBM"], ["IQ_CLOSEPRICE"], ["close_price"], [{}]))
+        self.assertEqual(return_value, {'TRIP:': {'close_price': 'TRIP-IQ_CLOSEPRICE'}, 'IBM:': {'close_price': None}})
@@ -0,0 +1,42 @@
+import unittest
+
+from capiq.capiq_client import CapIQClient, ReturnKeyIndex
+
+
+class TestCapiqClientReturnKeys(unittest.TestCase):
+
+    def test_single_return_key(self):
+        index = CapIQClient.build_mnemonic_return_key_index(["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(CapIQClient.get_return_key("IQ_CLOSEPRICE", {"anything": "1"}, index), "close_price")
+
+    def test_period_variants(self):
+        properties = [{"PERIODTYPE": "IQ_FQ-{}".format(i)} for i in range(150)]
+        return_keys = ["revenue_{}".format(i) for i in range(150)]
+        index = ReturnKeyIndex(["IQ_TOTAL_REV"] * 150, return_keys, properties)
+        for i in range(150):
+            self.assertEqual(index.get_return_key("IQ_TOTAL_REV", {"periodtype": "IQ_FQ-{}".format(i)}),
+                             "revenue_{}".format(i))
+
+    def test_returned_properties_are_canonicalized(self):
+        index = ReturnKeyIndex(
+            ["IQ_CLOSEPRICE_ADJ", "IQ_CLOSEPRICE_ADJ"],
+            ["one_month", "three_month"],
+            [{"PERIODTYPE": "-1M", "MULTIPLYING_FACTOR": 0.01}, {"periodtype": "-3M", "MULTIPLYING_FACTOR": 0.01}]
+        )
+        self.assertEqual(index.get_return_key("IQ_CLOSEPRICE_ADJ", {"PeriodType": "-3M", "multiplying_factor": "0.01"}),
+                         "three_month")
+        index = ReturnKeyIndex(["IQ_SEGMENT", "IQ_SEGMENT"], ["a", "b"], [{"SEGMENT": "A B"}, {"SEGMENT": "C D"}])
+        self.assertEqual(index.get_return_key("IQ_SEGMENT", {"segment": "C D"}), "b")
+
+    def test_partial_returned_properties(self):
+        index = ReturnKeyIndex(
+            ["IQ_VWAP", "IQ_VWAP"],
+            ["vwap1", "vwap2"],
+            [{"STARTDATE": "05/23/2017", "ENDDATE": "05/29/2017", "FREQUENCY": "D"},
+             {"STARTDATE": "05/16/2017", "ENDDATE": "05/22/2017", "FREQUENCY": "D"}]
+        )
+        for i in range(2):
+            self.assertEqual(index.get_return_key("IQ_VWAP", {"startdate": "05/16/2017", "enddate": "05/22/2017"}),
+                             "vwap2")
+        self.assertEqual(index.get_return_key("IQ_VWAP", {}), "vwap1")
+        self.assertIsNone(index.get_return_key("IQ_VWAP", {"startdate": "01/01/2000"}))
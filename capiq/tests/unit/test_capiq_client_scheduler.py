@@ -0,0 +1,148 @@
+import json
+import threading
+import unittest
+
+from mock import mock
+
+from capiq.capiq_client import CapIQClient
+from capiq.request_counter import LocalCounterStore, RemoteRequestCounter
+from capiq.scheduler import (HIGH_PRIORITY, LOW_PRIORITY, NORMAL_PRIORITY, QuotaExceededException, RequestScheduler,
+                             get_request_priority, request_priority)
+
+
+def mocked_echo_requests_post(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+    if args[0] is not None:
+        response = []
+        for input_request in json.loads(kwargs['data'])['inputRequests']:
+            response.append({
+                "Headers": [input_request['mnemonic']],
+                "Rows": [{"Row": [input_request['identifier'] + "-" + input_request['mnemonic']]}],
+                "NumCols": 1,
+                "Seniority": "",
+                "Mnemonic": input_request['mnemonic'],
+                "Function": input_request['function'],
+                "ErrMsg": None,
+                "Properties": {},
+                "NumRows": 1,
+                "CacheExpiryTime": "0",
+                "Identifier": input_request['identifier'] + ":",
+                "Limit": ""
+            })
+        return MockResponse({"GDSSDKResponse": response}, 200)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRequestScheduler(unittest.TestCase):
+
+    def test_budget(self):
+        scheduler = RequestScheduler(daily_budget=100, reserve=0)
+        scheduler.acquire(60)
+        self.assertEqual(scheduler.get_remaining(), 40)
+        with self.assertRaises(QuotaExceededException):
+            scheduler.acquire(41)
+        scheduler.release(60)
+        scheduler.acquire(100)
+        self.assertEqual(scheduler.get_used(), 100)
+
+    def test_reserve_is_kept_for_high_priority(self):
+        scheduler = RequestScheduler(daily_budget=100, reserve=0.2)
+        scheduler.acquire(80, LOW_PRIORITY)
+        with self.assertRaises(QuotaExceededException):
+            scheduler.acquire(1, LOW_PRIORITY)
+        with self.assertRaises(QuotaExceededException):
+            scheduler.acquire(1, NORMAL_PRIORITY)
+        scheduler.acquire(20, HIGH_PRIORITY)
+        self.assertEqual(scheduler.get_remaining(), 0)
+
+    def test_token_bucket(self):
+        clock = FakeClock()
+        scheduler = RequestScheduler(requests_per_second=2, burst=2, clock=clock)
+        scheduler.acquire(1)
+        scheduler.acquire(1)
+        with self.assertRaises(QuotaExceededException):
+            scheduler.acquire(1, timeout=0)
+        clock.now = 0.5
+        scheduler.acquire(1, timeout=0)
+
+    def test_waiting_batches_are_admitted_by_priority(self):
+        scheduler = RequestScheduler(requests_per_second=5, burst=1)
+        scheduler.acquire(1)
+        admitted = []
+
+        def acquire(priority):
+            scheduler.acquire(1, priority)
+            admitted.append(priority)
+
+        threads = [threading.Thread(target=acquire, args=(priority,)) for priority in (LOW_PRIORITY, HIGH_PRIORITY)]
+        # hold the lock so that both batches are queued before either one can be admitted
+        with scheduler._condition:
+            for thread in threads:
+                thread.start()
+            while len(scheduler._waiting) < 2:
+                scheduler._condition.wait(0.01)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(admitted, [HIGH_PRIORITY, LOW_PRIORITY])
+
+    def test_request_priority(self):
+        self.assertEqual(get_request_priority(), NORMAL_PRIORITY)
+        with request_priority(HIGH_PRIORITY):
+            self.assertEqual(get_request_priority(), HIGH_PRIORITY)
+        self.assertEqual(get_request_priority(), NORMAL_PRIORITY)
+
+
+class TestCapiqClientScheduler(unittest.TestCase):
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_batches_are_admitted(self, mocked_post):
+        scheduler = RequestScheduler(daily_budget=100, reserve=0.5)
+        ciq_client = CapIQClient("username", "password", max_batch_size=2, scheduler=scheduler)
+        ciq_client.gdsp(["TRIP", "IBM", "AAPL"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(scheduler.get_used(), 3)
+        self.assertEqual(mocked_post.call_count, 2)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_low_priority_is_refused_before_sending(self, mocked_post):
+        scheduler = RequestScheduler(daily_budget=10, reserve=0.5)
+        ciq_client = CapIQClient("username", "password", scheduler=scheduler)
+        identifiers = ["TRIP", "IBM", "AAPL", "MSFT", "GOOG", "AMZN"]
+        with request_priority(LOW_PRIORITY):
+            with self.assertRaises(QuotaExceededException):
+                ciq_client.gdsp(identifiers, ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(mocked_post.call_count, 0)
+        with request_priority(HIGH_PRIORITY):
+            ciq_client.gdsp(identifiers, ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(mocked_post.call_count, 1)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_shared_counter_is_counted_once(self, mocked_post):
+        counter = RemoteRequestCounter(LocalCounterStore())
+        scheduler = RequestScheduler(daily_budget=100, counter=counter)
+        ciq_client = CapIQClient("username", "password", request_counter=counter, scheduler=scheduler)
+        ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(counter.get(), 1)
+        self.assertEqual(ciq_client.get_request_count(), 1)
+        self.assertEqual(scheduler.get_remaining(), 99)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=ConnectionError("unreachable"))
+    def test_failed_batches_are_released(self, mocked_post):
+        scheduler = RequestScheduler(daily_budget=10)
+        ciq_client = CapIQClient("username", "password", scheduler=scheduler)
+        with self.assertRaises(ConnectionError):
+            ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(scheduler.get_used(), 0)
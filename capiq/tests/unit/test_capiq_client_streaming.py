@@ -0,0 +1,119 @@
+import json
+import unittest
+
+from mock import mock
+
+from capiq.capiq_client import CapIQClient, CiqServiceException
+from capiq.datapoint_cache import DatapointCache
+from capiq.streaming import iter_response_entries
+
+
+def echo_response(req):
+    response = []
+    for input_request in req['inputRequests']:
+        response.append({
+            "Headers": [input_request['mnemonic']],
+            "Rows": [{"Row": [input_request['identifier'] + "-" + input_request['mnemonic'] + " é"]}],
+            "NumCols": 1,
+            "Seniority": "",
+            "Mnemonic": input_request['mnemonic'],
+            "Function": input_request['function'],
+            "ErrMsg": None,
+            "Properties": {},
+            "NumRows": 1,
+            "CacheExpiryTime": "0",
+            "Identifier": input_request['identifier'] + ":",
+            "Limit": ""
+        })
+    return {"GDSSDKResponse": response}
+
+
+class MockStreamingResponse:
+    def __init__(self, body, status_code):
+        self.body = body
+        self.status_code = status_code
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.body), 7):
+            yield self.body[i:i + 7]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+def mocked_streaming_requests_post(*args, **kwargs):
+    if args[0] is not None:
+        body = json.dumps(echo_response(json.loads(kwargs['data'])), ensure_ascii=False)
+        return MockStreamingResponse(body.encode(), 200)
+
+
+def mocked_streaming_limit_requests_post(*args, **kwargs):
+    if args[0] is not None:
+        body = '{"GDSSDKResponse": [{"ErrMsg": "Daily Request Limit of 10000 Exceeded"}]}'
+        return MockStreamingResponse(body.encode(), 200)
+
+
+class TestCapiqClientStreaming(unittest.TestCase):
+
+    def test_iter_response_entries_any_chunking(self):
+        response = echo_response({"inputRequests": [
+            {"function": "GDSP", "identifier": "TRIP", "mnemonic": "IQ_CLOSEPRICE", "properties": {}},
+            {"function": "GDSP", "identifier": "IBM", "mnemonic": "IQ_VOLUME", "properties": {}}
+        ]})
+        body = json.dumps(response, indent=2, ensure_ascii=False).encode()
+        for chunk_size in range(1, 20):
+            chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+            self.assertEqual(list(iter_response_entries(chunks)), response["GDSSDKResponse"])
+
+    def test_iter_response_entries_spanning_many_chunks(self):
+        entry = {
+            "Headers": ["IQ_CLOSEPRICE", "AsOfDate"],
+            "Rows": [{"Row": ["{}.5".format(i), "1/2/2020"]} for i in range(30000)],
+            "ErrMsg": None,
+            # brackets, quotes and escapes inside strings do not open or close anything
+            "Identifier": 'A] "B" {C} \\ [D:'
+        }
+        body = json.dumps({"GDSSDKResponse": [entry, entry]}).encode()
+        chunks = [body[i:i + 1000] for i in range(0, len(body), 1000)]
+        self.assertGreater(len(chunks), 1000)
+        self.assertEqual(list(iter_response_entries(chunks)), [entry, entry])
+
+    def test_iter_response_entries_empty(self):
+        self.assertEqual(list(iter_response_entries([b'{"GDSSDKResponse"', b': [ ]}'])), [])
+
+    def test_iter_response_entries_truncated(self):
+        with self.assertRaises(ValueError):
+            list(iter_response_entries([b'{"GDSSDKResponse": [{"ErrMsg": null}, {"Err']))
+        with self.assertRaises(ValueError):
+            list(iter_response_entries([b'{"Other": 1}']))
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_streaming_requests_post)
+    def test_stream_request(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", max_batch_size=2)
+        records = ciq_client.stream_request(["TRIP", "IBM"], ["IQ_CLOSEPRICE", "IQ_VOLUME"],
+                                            ["close_price", "volume"], [{}, {}], "GDSP", False)
+        self.assertEqual(list(records), [
+            ("TRIP:", "close_price", "TRIP-IQ_CLOSEPRICE é"),
+            ("TRIP:", "volume", "TRIP-IQ_VOLUME é"),
+            ("IBM:", "close_price", "IBM-IQ_CLOSEPRICE é"),
+            ("IBM:", "volume", "IBM-IQ_VOLUME é")
+        ])
+        self.assertEqual(mocked_post.call_count, 2)
+        self.assertTrue(mocked_post.call_args[1]['stream'])
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_streaming_requests_post)
+    def test_stream_request_uses_cache(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", cache=DatapointCache(':memory:'))
+        list(ciq_client.stream_request(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}], "GDSP", False))
+        records = ciq_client.stream_request(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}], "GDSP", False)
+        self.assertEqual(list(records), [("TRIP:", "close_price", "TRIP-IQ_CLOSEPRICE é")])
+        self.assertEqual(mocked_post.call_count, 1)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_streaming_limit_requests_post)
+    def test_stream_request_service_error(self, mocked_post):
+        ciq_client = CapIQClient("username", "password")
+        with self.assertRaises(CiqServiceException):
+            list(ciq_client.stream_request(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}], "GDSP", False))
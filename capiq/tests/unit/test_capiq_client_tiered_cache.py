@@ -0,0 +1,130 @@
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from mock import mock
+
+from capiq.capiq_client import CapIQClient
+from capiq.datapoint_cache import DatapointCache
+from capiq.tiered_cache import MemoryCache, TieredCache, estimate_size
+
+
+def mocked_echo_requests_post(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+    if args[0] is not None:
+        response = []
+        for input_request in json.loads(kwargs['data'])['inputRequests']:
+            response.append({
+                "Headers": [input_request['mnemonic']],
+                "Rows": [{"Row": [input_request['identifier'] + "-" + input_request['mnemonic']]}],
+                "NumCols": 1,
+                "Seniority": "",
+                "Mnemonic": input_request['mnemonic'],
+                "Function": input_request['function'],
+                "ErrMsg": None,
+                "Properties": {},
+                "NumRows": 1,
+                "CacheExpiryTime": "0",
+                "Identifier": input_request['identifier'] + ":",
+                "Limit": ""
+            })
+        return MockResponse({"GDSSDKResponse": response}, 200)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCapiqClientTieredCache(unittest.TestCase):
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_tiers(self, mocked_post):
+        store = DatapointCache(':memory:')
+        cache = TieredCache(store)
+        ciq_client = CapIQClient("username", "password", cache=cache)
+        ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        with mock.patch.object(store, 'get_entries') as store_get_entries:
+            return_value = ciq_client.gdsp(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        self.assertEqual(return_value, {'TRIP:': {'close_price': 'TRIP-IQ_CLOSEPRICE'}})
+        self.assertEqual(store_get_entries.call_count, 0)
+        self.assertEqual(mocked_post.call_count, 1)
+        # a new process starts with an empty L1 and fills it from L2
+        cache = TieredCache(store)
+        ciq_client = CapIQClient("username", "password", cache=cache)
+        ciq_client.gdsp(["TRIP", "IBM"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        ciq_client.gdsp(["TRIP", "IBM"], ["IQ_CLOSEPRICE"], ["close_price"], [{}])
+        stats = cache.get_stats()
+        self.assertEqual(stats["l1"], {"hits": 2, "misses": 2, "hit_ratio": 0.5})
+        self.assertEqual(stats["l2"], {"hits": 1, "misses": 1, "hit_ratio": 0.5})
+        self.assertEqual(stats["total"], {"hits": 3, "misses": 1, "hit_ratio": 0.75})
+        self.assertEqual(stats["l1_entries"], 2)
+
+    def test_memory_cache_lru_and_ttl(self):
+        clock = FakeClock()
+        cache = MemoryCache(max_entries=2, ttl=10, clock=clock)
+        cache.set_entries([("a", "A:", 1, clock.now + 100), ("b", "B:", 2, clock.now + 5)])
+        cache.get_entries(["a"])
+        cache.set_entries([("c", "C:", 3, clock.now + 100), ("d", "D:", 4, clock.now)])
+        self.assertEqual(sorted(cache.get_entries(["a", "b", "c", "d"])), ["a", "c"])
+        clock.now += 10
+        self.assertEqual(cache.get_entries(["a", "c"]), {})
+        self.assertEqual(len(cache), 0)
+
+    def test_memory_cache_is_bounded_by_bytes(self):
+        rows = {"Headers": ["IQ_CLOSEPRICE", "AsOfDate"], "Rows": [{"Row": ["46.80", "1/2/2020"]}] * 100}
+        size = estimate_size(rows)
+        cache = MemoryCache(max_bytes=size * 2)
+        cache.set_entries([(key, "A:", rows, time.time() + 60) for key in ("a", "b", "c")])
+        self.assertEqual(sorted(cache.get_entries(["a", "b", "c"])), ["b", "c"])
+        self.assertEqual(cache.get_bytes(), size * 2)
+        cache.set_entries([("huge", "A:", {"Rows": rows["Rows"] * 3}, time.time() + 60)])
+        self.assertEqual(len(cache), 2)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_echo_requests_post)
+    def test_results_do_not_share_cached_values(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", cache=TieredCache(DatapointCache(':memory:')))
+        for i in range(3):
+            return_value = ciq_client.gdshe(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], start_date="01/01/2020",
+                                            end_date="01/02/2020")
+            self.assertEqual(return_value, {'TRIP:': {'close_price': [['TRIP-IQ_CLOSEPRICE']]}})
+            return_value['TRIP:']['close_price'][0].append("changed")
+        self.assertEqual(mocked_post.call_count, 1)
+
+    def test_store_eviction(self):
+        cache = DatapointCache(':memory:', max_entries=10)
+        cache.set_many(("key{}".format(i), "ID{}:".format(i), i, 60) for i in range(10))
+        time.sleep(0.01)
+        cache.get_many(["key0", "key1"])
+        cache.set_many([("key10", "ID10:", 10, 60), ("expired", "X:", 0, -1)])
+        self.assertEqual(cache.get_size(), 9)
+        self.assertEqual(sorted(cache.get_many(["key0", "key1", "key10"])), ["key0", "key1", "key10"])
+        self.assertEqual(cache.get_many(["key2", "key3", "expired"]), {})
+        cache.compact()
+        self.assertEqual(cache.get_stats()["hits"], 5)
+
+    def test_store_upgrade(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "capiq_cache.sqlite")
+        connection = sqlite3.connect(path)
+        connection.execute("CREATE TABLE datapoints (key TEXT PRIMARY KEY, identifier TEXT, value TEXT, expires REAL)")
+        connection.execute("INSERT INTO datapoints VALUES ('key', 'TRIP:', '1', ?)", (time.time() + 60,))
+        connection.commit()
+        connection.close()
+        cache = DatapointCache(path, max_entries=5, compact_interval=0.01)
+        self.assertEqual(cache.get_many(["key"]), {"key": ("TRIP:", 1)})
+        time.sleep(0.05)
+        cache.close()
@@ -0,0 +1,118 @@
+import datetime
+import json
+import unittest
+
+from mock import mock
+
+from capiq.capiq_client import CapIQClient
+from capiq.time_series_store import TimeSeriesStore
+
+
+def mocked_daily_requests_post(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+    if args[0] is not None:
+        response = []
+        for input_request in json.loads(kwargs['data'])['inputRequests']:
+            start_date = datetime.datetime.strptime(input_request['properties']['STARTDATE'], "%m/%d/%Y").date()
+            end_date = datetime.datetime.strptime(input_request['properties']['ENDDATE'], "%m/%d/%Y").date()
+            rows = []
+            while start_date <= end_date:
+                rows.append({"Row": [str(start_date.day), "{d.month}/{d.day}/{d.year}".format(d=start_date)]})
+                start_date += datetime.timedelta(days=1)
+            response.append({
+                "Headers": [input_request['mnemonic'], "AsOfDate"],
+                "Rows": rows,
+                "NumCols": 2,
+                "Seniority": "",
+                "Mnemonic": input_request['mnemonic'],
+                "Function": input_request['function'],
+                "ErrMsg": "SOME ERROR" if input_request['identifier'] == "BAD" else "",
+                "Properties": input_request['properties'],
+                "NumRows": len(rows),
+                "CacheExpiryTime": "0",
+                "Identifier": input_request['identifier'].upper() + ":",
+                "Limit": ""
+            })
+        return MockResponse({"GDSSDKResponse": response}, 200)
+
+
+def sent_properties(mocked_post):
+    return [[r['properties'] for r in json.loads(call[1]['data'])['inputRequests']]
+            for call in mocked_post.call_args_list]
+
+
+class TestCapiqClientTimeSeries(unittest.TestCase):
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_daily_requests_post)
+    def test_only_missing_range_is_requested(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", time_series_store=TimeSeriesStore(':memory:'))
+        ciq_client.gdshe(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], start_date="01/01/2020", end_date="01/10/2020")
+        return_value = ciq_client.gdshe(["trip"], ["IQ_CLOSEPRICE"], ["close_price"], start_date="01/05/2020",
+                                        end_date="01/15/2020")
+        self.assertEqual(sent_properties(mocked_post)[1], [{"STARTDATE": "01/11/2020", "ENDDATE": "01/15/2020"}])
+        self.assertEqual(return_value, {'TRIP:': {'close_price': [
+            [str(day), "1/{}/2020".format(day)] for day in range(5, 16)
+        ]}})
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_daily_requests_post)
+    def test_covered_range_sends_nothing(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", time_series_store=TimeSeriesStore(':memory:'))
+        ciq_client.gdst(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], start_date="01/01/2020", end_date="01/31/2020",
+                        frequency="D")
+        return_value = ciq_client.gdst(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], start_date="01/02/2020",
+                                       end_date="01/03/2020", frequency="D")
+        self.assertEqual(mocked_post.call_count, 1)
+        self.assertEqual(return_value, {'TRIP:': {'close_price': [["2", "1/2/2020"], ["3", "1/3/2020"]]}})
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_daily_requests_post)
+    def test_frequency_is_part_of_the_series(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", time_series_store=TimeSeriesStore(':memory:'))
+        ciq_client.gdst(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], start_date="01/01/2020", end_date="01/31/2020",
+                        frequency="D")
+        ciq_client.gdst(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"], start_date="01/01/2020", end_date="01/31/2020",
+                        frequency="M")
+        self.assertEqual(mocked_post.call_count, 2)
+
+    @mock.patch('capiq.capiq_client.requests.Session.post', side_effect=mocked_daily_requests_post)
+    def test_errors_are_not_marked_as_covered(self, mocked_post):
+        ciq_client = CapIQClient("username", "password", time_series_store=TimeSeriesStore(':memory:'))
+        for i in range(2):
+            return_value = ciq_client.gdshe(["BAD"], ["IQ_CLOSEPRICE"], ["close_price"], start_date="01/01/2020",
+                                            end_date="01/10/2020")
+            self.assertEqual(return_value, {'BAD': {'close_price': None}})
+        self.assertEqual(mocked_post.call_count, 2)
+
+    def test_requests_without_date_range_are_not_rewritten(self):
+        ciq_client = CapIQClient("username", "password", time_series_store=TimeSeriesStore(':memory:'))
+        request = ciq_client.prepare_request(["TRIP"], ["IQ_CLOSEPRICE"], ["close_price"],
+                                             [{"STARTDATE": "01/01/2020"}], "GDSHE", True)
+        self.assertIsNone(request.series)
+        self.assertEqual(request.batches, [[{"function": "GDSHE", "identifier": "TRIP", "mnemonic": "IQ_CLOSEPRICE",
+                                             "properties": {"STARTDATE": "01/01/2020"}}]])
+
+    def test_get_missing_ranges(self):
+        store = TimeSeriesStore(':memory:')
+        self.assertEqual(
+            store.merge_ranges([(datetime.date(2020, 1, 1), datetime.date(2020, 1, 5)),
+                                (datetime.date(2020, 1, 6), datetime.date(2020, 1, 8)),
+                                (datetime.date(2020, 1, 20), datetime.date(2020, 1, 25))]),
+            [(datetime.date(2020, 1, 1), datetime.date(2020, 1, 8)),
+             (datetime.date(2020, 1, 20), datetime.date(2020, 1, 25))]
+        )
+        store.add("series", "TRIP:", ["IQ_CLOSEPRICE", "AsOfDate"], [],
+                  datetime.date(2020, 1, 5), datetime.date(2020, 1, 10))
+        store.add("series", "TRIP:", ["IQ_CLOSEPRICE", "AsOfDate"], [],
+                  datetime.date(2020, 1, 20), datetime.date(2020, 1, 25))
+        self.assertEqual(
+            store.get_missing_ranges("series", datetime.date(2020, 1, 1), datetime.date(2020, 1, 31)),
+            [(datetime.date(2020, 1, 1), datetime.date(2020, 1, 4)),
+             (datetime.date(2020, 1, 11), datetime.date(2020, 1, 19)),
+             (datetime.date(2020, 1, 26), datetime.date(2020, 1, 31))]
+        )
@@ -0,0 +1,167 @@
+import collections
+import sys
+import threading
+import time
+
+from capiq.datapoint_cache import get_hit_ratio
+
+
+# An in-process LRU of decoded datapoints, bounded by the approximate memory their values take (max_bytes) and
+# optionally by their number (max_entries). Every datapoint expires when it would in the store it came from, or
+# ttl seconds after it was added here if that is sooner. Values are copied on the way in and on the way out, so
+# results built from them can be changed without changing the cache.
+class MemoryCache:
+    def __init__(self, max_bytes=64 * 2 ** 20, max_entries=None, ttl=None, clock=time.time):
+        assert max_bytes > 0
+        assert max_entries is None or max_entries > 0
+        assert ttl is None or ttl > 0
+        self._max_bytes = max_bytes
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # key -> (identifier, value, expires, size), least recent first
+        self._bytes = 0
+
+    # Returns a dictionary of key to (identifier, value, expires) of every key held that has not expired
+    def get_entries(self, keys):
+        found = {}
+        now = self._clock()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[2] <= now:
+                    self.remove(key)
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[:3]
+        return {key: (identifier, copy_value(value), expires) for key, (identifier, value, expires) in found.items()}
+
+    # items is an iterable of (key, identifier, value, expires), expires is a time.time() timestamp
+    def set_entries(self, items):
+        now = self._clock()
+        with self._lock:
+            for key, identifier, value, expires in items:
+                if self._ttl is not None:
+                    expires = min(expires, now + self._ttl)
+                self.remove(key)
+                size = estimate_size(value)
+                if expires <= now or size > self._max_bytes:
+                    continue
+                self._entries[key] = (identifier, copy_value(value), expires, size)
+                self._bytes += size
+            while self._bytes > self._max_bytes or \
+                    (self._max_entries is not None and len(self._entries) > self._max_entries):
+                key, entry = self._entries.popitem(last=False)
+                self._bytes -= entry[3]
+
+    # Called with the lock held
+    def remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[3]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_bytes(self):
+        return self._bytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+# Copies the dictionaries and lists of a decoded JSON value, strings and numbers are immutable and shared
+def copy_value(value):
+    if isinstance(value, list):
+        return [copy_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: copy_value(item) for key, item in value.items()}
+    return value
+
+
+# Bytes a decoded JSON value takes, containers and strings included, the keys of dictionaries excepted since they
+# repeat and are shared
+def estimate_size(value):
+    if isinstance(value, list):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value.values())
+    return sys.getsizeof(value)
+
+
+# A MemoryCache (L1) in front of a persistent store (L2), usually a DatapointCache, and used by CapIQClient
+# in its place. Hits in L1 skip SQLite and JSON decoding, L2 hits are copied into L1 and writes go to both.
+#
+# get_stats() reports the hits and misses of every tier, to size L1 to the universe that is read repeatedly.
+class TieredCache:
+    def __init__(self, store, max_bytes=64 * 2 ** 20, max_entries=None, ttl=None, clock=time.time):
+        self._store = store
+        self._memory = MemoryCache(max_bytes, max_entries, ttl, clock)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stats = {"l1": [0, 0], "l2": [0, 0]}  # tier -> [hits, misses]
+
+    def get_many(self, keys):
+        return {key: (identifier, value) for key, (identifier, value, expires) in self.get_entries(keys).items()}
+
+    def get_entries(self, keys):
+        keys = list(keys)
+        found = self._memory.get_entries(keys)
+        missing = [key for key in keys if key not in found]
+        stored = self._store.get_entries(missing) if missing else {}
+        if stored:
+            self._memory.set_entries((key, identifier, value, expires)
+                                     for key, (identifier, value, expires) in stored.items())
+            found.update(stored)
+        with self._lock:
+            self.count("l1", len(keys) - len(missing), len(missing))
+            self.count("l2", len(stored), len(missing) - len(stored))
+        return found
+
+    def set_many(self, items):
+        items = list(items)
+        now = self._clock()
+        self._store.set_many(items)
+        self._memory.set_entries((key, identifier, value, now + expire_after)
+                                 for key, identifier, value, expire_after in items)
+
+    def get_expire_after(self, api_function_identifier, mnemonic, cache_expiry_time=None):
+        return self._store.get_expire_after(api_function_identifier, mnemonic, cache_expiry_time)
+
+    # Every datapoint L1 holds is in the store too, see capiq.cache_snapshot.export_snapshot
+    def iter_rows(self):
+        return self._store.iter_rows()
+
+    def count(self, tier, hits, misses):
+        self._stats[tier][0] += hits
+        self._stats[tier][1] += misses
+
+    # {"l1": {"hits", "misses", "hit_ratio"}, "l2": {...}, "total": {...}, "l1_entries": n, "l1_bytes": n}. The
+    # L2 counts only include the lookups L1 missed, and hit_ratio is None before any lookup.
+    def get_stats(self):
+        with self._lock:
+            stats = {}
+            for tier, (hits, misses) in self._stats.items():
+                stats[tier] = {"hits": hits, "misses": misses, "hit_ratio": get_hit_ratio(hits, misses)}
+            hits = self._stats["l1"][0] + self._stats["l2"][0]
+            misses = self._stats["l2"][1]
+            stats["total"] = {"hits": hits, "misses": misses, "hit_ratio": get_hit_ratio(hits, misses)}
+            stats["l1_entries"] = len(self._memory)
+            stats["l1_bytes"] = self._memory.get_bytes()
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {"l1": [0, 0], "l2": [0, 0]}
+
+    def clear(self):
+        self._memory.clear()
+        self._store.clear()
+
+    def close(self):
+        self._store.close()
@@ -0,0 +1,173 @@
+import datetime
+import json
+import sqlite3
+import threading
+
+from capiq.datapoint_cache import DatapointCache
+
+
+# Local store for GDST/GDSHE rows that remembers which date ranges it holds for every series, so that
+# repeated history requests only have to fetch the dates that are missing. A series is one identifier,
+# mnemonic and set of properties (FREQUENCY included) without the STARTDATE/ENDDATE range.
+class TimeSeriesStore:
+    _date_format = "%m/%d/%Y"
+    _date_headers = ("ASOFDATE", "DATE", "PRICINGDATE")
+
+    def __init__(self, path='capiq_time_series.sqlite'):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(
+            "CREATE TABLE IF NOT EXISTS series (series_key TEXT PRIMARY KEY, identifier TEXT, headers TEXT);"
+            "CREATE TABLE IF NOT EXISTS coverage (series_key TEXT, start_date TEXT, end_date TEXT);"
+            "CREATE INDEX IF NOT EXISTS coverage_series ON coverage (series_key);"
+            "CREATE TABLE IF NOT EXISTS rows "
+            "(series_key TEXT, date TEXT, row TEXT, PRIMARY KEY (series_key, date));"
+        )
+        self._connection.commit()
+
+    # Splits properties into (start_date, end_date, remaining properties), or returns None if the properties
+    # do not hold a complete date range
+    @classmethod
+    def split_date_range(cls, properties):
+        start_date = end_date = None
+        remaining = {}
+        for name, value in (properties or {}).items():
+            if name.upper() == "STARTDATE":
+                start_date = cls.parse_date(value)
+            elif name.upper() == "ENDDATE":
+                end_date = cls.parse_date(value)
+            else:
+                remaining[name] = value
+        if start_date is None or end_date is None:
+            return None
+        return start_date, end_date, remaining
+
+    @classmethod
+    def parse_date(cls, value):
+        try:
+            return datetime.datetime.strptime(str(value), cls._date_format).date()
+        except ValueError:
+            return None
+
+    @classmethod
+    def format_date(cls, value):
+        return value.strftime(cls._date_format)
+
+    @staticmethod
+    def build_series_key(api_function_identifier, identifier, mnemonic, properties):
+        return DatapointCache.build_key(api_function_identifier, identifier, mnemonic, properties)
+
+    # The (start_date, end_date) ranges between start_date and end_date that the store does not hold yet
+    def get_missing_ranges(self, series_key, start_date, end_date):
+        missing = []
+        cursor = start_date
+        for covered_start, covered_end in self.get_coverage(series_key):
+            if covered_end < cursor:
+                continue
+            if covered_start > end_date:
+                break
+            if covered_start > cursor:
+                missing.append((cursor, covered_start - datetime.timedelta(days=1)))
+            cursor = covered_end + datetime.timedelta(days=1)
+            if cursor > end_date:
+                break
+        if cursor <= end_date:
+            missing.append((cursor, end_date))
+        return missing
+
+    def get_coverage(self, series_key):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT start_date, end_date FROM coverage WHERE series_key = ? ORDER BY start_date", (series_key,)
+            ).fetchall()
+        return [(datetime.date.fromisoformat(start), datetime.date.fromisoformat(end)) for start, end in rows]
+
+    # Stores the rows of one GDSSDKResponse entry and marks start_date to end_date as covered. Returns False
+    # without storing anything when the rows have no date column to index them by. The current day is never
+    # marked as covered since its data can still change.
+    def add(self, series_key, identifier, headers, rows, start_date, end_date):
+        date_index = self.get_date_index(headers)
+        if date_index is None:
+            return False
+        dated_rows = []
+        for row in rows:
+            date = self.parse_date(row[date_index])
+            if date is not None:
+                dated_rows.append((series_key, date.isoformat(), json.dumps(row)))
+        end_date = min(end_date, datetime.date.today() - datetime.timedelta(days=1))
+        with self._lock:
+            # the coverage is read in the transaction that writes it, so that a range another process adds to the
+            # series at the same time is not lost
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO series (series_key, identifier, headers) VALUES (?, ?, ?)",
+                    (series_key, identifier, json.dumps(headers))
+                )
+                self._connection.executemany("INSERT OR REPLACE INTO rows (series_key, date, row) VALUES (?, ?, ?)",
+                                             dated_rows)
+                self.add_coverage(series_key, start_date, end_date)
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return True
+
+    # Merges start_date to end_date into the ranges covered for the series. Called with the lock held, inside the
+    # transaction that stores the rows of the range.
+    def add_coverage(self, series_key, start_date, end_date):
+        if start_date > end_date:
+            return
+        coverage = [(datetime.date.fromisoformat(start), datetime.date.fromisoformat(end)) for start, end in
+                    self._connection.execute("SELECT start_date, end_date FROM coverage WHERE series_key = ?",
+                                             (series_key,))]
+        self._connection.execute("DELETE FROM coverage WHERE series_key = ?", (series_key,))
+        self._connection.executemany(
+            "INSERT INTO coverage (series_key, start_date, end_date) VALUES (?, ?, ?)",
+            [(series_key, start.isoformat(), end.isoformat())
+             for start, end in self.merge_ranges(coverage + [(start_date, end_date)])]
+        )
+
+    # Returns (identifier, headers, rows) for the series between start_date and end_date, identifier and headers
+    # are None for series that were never stored
+    def get(self, series_key, start_date, end_date):
+        with self._lock:
+            series = self._connection.execute(
+                "SELECT identifier, headers FROM series WHERE series_key = ?", (series_key,)
+            ).fetchone()
+            rows = self._connection.execute(
+                "SELECT row FROM rows WHERE series_key = ? AND date >= ? AND date <= ? ORDER BY date",
+                (series_key, start_date.isoformat(), end_date.isoformat())
+            ).fetchall()
+        if series is None:
+            return None, None, []
+        return series[0], json.loads(series[1]), [json.loads(row) for row, in rows]
+
+    # Like get, with the rows as typed columns, see capiq.columnar.rows_to_columns. The columns are None when
+    # the store holds no rows between start_date and end_date.
+    def get_columns(self, series_key, start_date, end_date):
+        # imported here since capiq.columnar depends on this module
+        from capiq.columnar import rows_to_columns
+        identifier, headers, rows = self.get(series_key, start_date, end_date)
+        return identifier, headers, rows_to_columns(headers, rows) if rows else None
+
+    @classmethod
+    def get_date_index(cls, headers):
+        for index, header in enumerate(headers):
+            if str(header).upper() in cls._date_headers:
+                return index
+        return None
+
+    @staticmethod
+    def merge_ranges(ranges):
+        merged = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1] + datetime.timedelta(days=1):
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def close(self):
+        with self._lock:
+            self._connection.close()